@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+灵犀校对平台 - 校对历史全文检索基准测试
+
+在临时 SQLite 文件中为 N 条模拟校对历史（默认 10 万条、分属 20 个用户）建立 FTS5 索引，
+测量常见查询取第一页结果（10 条）的耗时：常见双字词、较长短语、多词同时出现、
+单字前缀、罕见词，以及翻到靠后位置的游标分页。
+
+用法：
+    python benchmarks/bench_history_search.py [--rows 100000] [--repeat 5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+
+from lingxi.search import SQLiteSearchIndex, parse_query
+
+USERS = 20
+
+SENTENCES = [
+    '今天天气很好，我们去公园散步。', '会议改到下周三下午两点召开。', '请在月底之前提交季度报告。',
+    '这款产品的用户体验还有提升空间。', '他在文章中详细介绍了项目背景。', '校对时要注意标点符号的使用。',
+    '数据显示销售额同比增长了百分之十五。', '我们需要重新评估市场推广策略。', '图书馆周末开放时间有所调整。',
+    '新版本修复了若干已知问题。', '老师建议学生多读经典名著。', '本次活动吸引了数百名志愿者参加。',
+]
+
+QUERIES = {
+    '常见双字词': '我们',
+    '较长短语': '季度报告',
+    '多词同时出现': '公园 散步',
+    '单字前缀': '馆',
+    '罕见词': '量子纠缠',
+}
+
+
+def make_document(rng: random.Random) -> str:
+    return ''.join(rng.choice(SENTENCES) for _ in range(rng.randint(3, 30)))
+
+
+def build_index(engine, index: SQLiteSearchIndex, rows: int):
+    rng = random.Random(42)
+    with engine.begin() as connection:
+        index.ensure(connection)
+        for history_id in range(1, rows + 1):
+            text = make_document(rng)
+            if history_id % 1000 == 0:
+                text += '这里提到了量子纠缠。'
+            index.add(connection, history_id, history_id % USERS + 1, text, text)
+
+
+def measure(engine, index: SQLiteSearchIndex, query: str, before_id, repeat: int) -> float:
+    terms = parse_query(query)
+    best = float('inf')
+    with engine.connect() as connection:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            index.match(connection, 1, terms, before_id, 11)
+            best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='校对历史全文检索基准测试')
+    parser.add_argument('--rows', type=int, default=100000, help='模拟的历史记录条数')
+    parser.add_argument('--repeat', type=int, default=5, help='每个查询重复次数，取最短耗时')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        index = SQLiteSearchIndex()
+
+        started = time.perf_counter()
+        build_index(engine, index, args.rows)
+        size = os.path.getsize(os.path.join(directory, 'bench.db'))
+        print(f"建立索引：{args.rows} 条，{time.perf_counter() - started:.1f}s，{size / 1024 / 1024:.1f} MB")
+
+        print(f"{'查询':<10}{'第一页(ms)':>12}{'靠后一页(ms)':>14}")
+        for name, query in QUERIES.items():
+            first_ms = measure(engine, index, query, None, args.repeat)
+            deep_ms = measure(engine, index, query, args.rows // 10, args.repeat)
+            print(f"{name:<10}{first_ms:>12.2f}{deep_ms:>14.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+灵犀校对平台 - 模型输出JSON提取基准测试
+
+对比原先的贪婪正则（re.search(r'\{.*\}', DOTALL) 后 json.loads）与单遍扫描提取器，
+语料为 1 KB 到 1 MB 的模拟模型输出，覆盖常见形态：纯JSON、代码块加说明文字、
+输出多个对象、尾逗号、被截断的输出，以及被截断且正文含大量未闭合 { 的输出
+（贪婪正则在每个 { 处都回溯到末尾，耗时随长度平方增长，1 MB 时不再运行正则）。
+
+用法：
+    python benchmarks/bench_json_extract.py [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lingxi.ai_services.json_extract import extract_json_object
+
+SIZES = [1 << 10, 10 << 10, 100 << 10, 1 << 20]
+
+ISSUE = {
+    'type': '错别字',
+    'original': '天器',
+    'corrected': '天气',
+    'position': '第{n}段',
+    'explanation': '"天器"应为"天气"；原文中的 {{占位符}} 与 [注释] 保持不变',
+}
+
+
+def make_payload(size: int) -> str:
+    """生成约 size 字节的校对结果JSON"""
+    issues = []
+    corrected = []
+    length = 0
+    n = 0
+    while length < size:
+        n += 1
+        issue = dict(ISSUE, position=f'第{n}段')
+        issues.append(issue)
+        corrected.append(f'第{n}段：今天天气很好，我们去公园散步。')
+        length += len(json.dumps(issue, ensure_ascii=False).encode('utf-8')) + 60
+    return json.dumps({'corrected_text': '\n'.join(corrected), 'issues': issues}, ensure_ascii=False, indent=2)
+
+
+def make_corpus(size: int):
+    payload = make_payload(size)
+    return {
+        '纯JSON': payload,
+        '代码块+说明': f'好的，以下是校对结果：\n```json\n{payload}\n```\n如需进一步修改 {{例如语气}} 请告诉我。',
+        '多个对象': f'{payload}\n\n补充说明：{{"note": "以上为全部问题"}}',
+        '尾逗号': payload.replace('\n  ]', ',\n  ]').replace('\n    }', ',\n    }'),
+        '被截断': payload[: len(payload) * 2 // 3],
+        '截断含{': '{"corrected_text": "' + 'if (ready) { run(); ' * (size // 20),
+    }
+
+
+# 正则耗时随长度平方增长的形态，超过该大小不再运行正则
+QUADRATIC_SHAPES = {'截断含{'}
+QUADRATIC_LIMIT = 100 << 10
+
+
+def regex_extract(text: str):
+    """原先 _parse_response 中的做法"""
+    match = re.search(r'\{.*\}', text, re.DOTALL)
+    if match:
+        text = match.group()
+    return json.loads(text)
+
+
+def measure(func, text: str, repeat: int):
+    """返回 (最短耗时毫秒, 是否成功解析)"""
+    best = float('inf')
+    ok = True
+    for _ in range(repeat):
+        started = time.perf_counter()
+        try:
+            func(text)
+        except ValueError:
+            ok = False
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='模型输出JSON提取基准测试')
+    parser.add_argument('--repeat', type=int, default=5, help='每个样本重复次数，取最短耗时')
+    args = parser.parse_args()
+
+    print(f"{'大小':>8}  {'形态':<10}{'正则(ms)':>10} {'结果':<6}{'扫描(ms)':>10} {'结果':<6}")
+    for size in SIZES:
+        for shape, text in make_corpus(size).items():
+            scan_ms, scan_ok = measure(extract_json_object, text, args.repeat)
+            if shape in QUADRATIC_SHAPES and size > QUADRATIC_LIMIT:
+                regex_column = f"{'跳过':>10} {'':<6}"
+            else:
+                regex_ms, regex_ok = measure(regex_extract, text, args.repeat)
+                regex_column = f"{regex_ms:>10.2f} {'成功' if regex_ok else '失败':<6}"
+            print(f"{len(text.encode('utf-8')) // 1024:>6}KB  {shape:<10}{regex_column}"
+                  f"{scan_ms:>10.2f} {'成功' if scan_ok else '失败':<6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,12 @@ from .deepseek_service import DeepSeekService
 from .qwen_service import QwenService
 from .zhipu_service import ZhipuService
 from .custom_openai_service import CustomOpenAIService
+from .async_transport import AsyncHTTPTransport, configure_async_transport, get_async_transport
+from .budget import OutputBudget, OutputTruncatedError, PromptTooLongError, configure_output_budget, get_output_budget
+from .breaker import CircuitBreaker, CircuitOpenError, circuit_breaker_states, configure_circuit_breakers, get_circuit_breaker
+from .ratelimit import RateLimiter, RateLimitTimeout, configure_rate_limiter, get_rate_limiter
+from .registry import ClientRegistry, configure_client_registry, get_client_registry
+from .transport import HTTPTransport, configure_transport, get_transport
 from typing import Optional
 
 # AI服务工厂
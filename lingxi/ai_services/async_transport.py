@@ -0,0 +1,117 @@
+"""
+异步HTTP传输层
+
+aproofread() 等协程共用的 httpx.AsyncClient：一个事件循环内的所有上游请求共享同一个连接池，
+安装了 h2 时启用 HTTP/2，同一主机的大量并发请求复用少量连接多路传输。
+超时、429/5xx 退避重试与 Retry-After 的处理与同步传输层一致。
+"""
+
+import asyncio
+import importlib.util
+import logging
+import threading
+import weakref
+from typing import Any, Dict, Optional
+
+import httpx
+
+from .ratelimit import areport_throttle
+from .transport import RETRY_STATUS_CODES, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 需要可选依赖 h2（pip install "httpx[http2]"），未安装时退回 HTTP/1.1
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+
+class AsyncHTTPTransport:
+    """绑定到单个事件循环的异步HTTP传输"""
+
+    def __init__(self, connect_timeout: float = 5.0, read_timeout: float = 60.0,
+                 read_timeouts: Optional[Dict[str, float]] = None, max_retries: int = 2,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 max_connections: int = 256, http2: bool = True):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.read_timeouts = dict(read_timeouts or {})
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.http2 = http2 and HTTP2_AVAILABLE
+
+        self.client = httpx.AsyncClient(
+            http2=self.http2,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+        self._requests = 0
+        self._retries = 0
+
+    def timeout_for(self, provider: str, read_timeout: Optional[float] = None) -> httpx.Timeout:
+        """提供商的超时设置；给出 read_timeout（按预计输出长度估算）时取两者中较小的读超时"""
+        read = self.read_timeouts.get(provider, self.read_timeout)
+        if read_timeout is not None:
+            read = min(read, read_timeout)
+        return httpx.Timeout(read, connect=self.connect_timeout)
+
+    async def post_json(self, provider: str, url: str, headers: Dict[str, str],
+                        data: Dict[str, Any], read_timeout: Optional[float] = None) -> Dict[str, Any]:
+        """发送 JSON POST 请求并返回解析后的响应体"""
+        timeout = self.timeout_for(provider, read_timeout)
+        attempt = 0
+        while True:
+            self._requests += 1
+            try:
+                response = await self.client.post(url, headers=headers, json=data, timeout=timeout)
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                # 与同步传输层相同：只重试连接阶段的失败
+                if attempt >= self.max_retries:
+                    raise
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                logger.warning(f"{provider} request failed ({e}), retrying in {delay:.2f}s")
+            else:
+                if response.status_code == 429:
+                    await areport_throttle(response.headers.get('Retry-After'))
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response.json()
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max,
+                                      response.headers.get('Retry-After'))
+                logger.warning(f"{provider} returned HTTP {response.status_code}, retrying in {delay:.2f}s")
+
+            self._retries += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'requests': self._requests, 'retries': self._retries, 'http2': self.http2}
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_settings: Dict[str, Any] = {}
+_transports: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncHTTPTransport]' = weakref.WeakKeyDictionary()
+_transports_lock = threading.Lock()
+
+
+def configure_async_transport(**settings):
+    """设置异步传输参数（通常在应用启动时根据配置调用一次）；此后新建的传输使用新参数"""
+    global _settings
+    with _transports_lock:
+        _settings = dict(settings)
+        _transports.clear()
+
+
+def get_async_transport() -> AsyncHTTPTransport:
+    """
+    获取当前事件循环共享的 AsyncHTTPTransport
+
+    httpx 的连接不能跨事件循环使用，因此每个事件循环各有一个传输实例，循环结束后随之回收。
+    """
+    loop = asyncio.get_running_loop()
+    with _transports_lock:
+        transport = _transports.get(loop)
+        if transport is None:
+            transport = AsyncHTTPTransport(**_settings)
+            _transports[loop] = transport
+        return transport
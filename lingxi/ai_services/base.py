@@ -1,23 +1,154 @@
-from abc import ABC, abstractmethod
-from typing import Dict, List, Any, Optional
-import requests
+from abc import ABC
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+import asyncio
+import hashlib
 import json
+import logging
+import time
+
+from .budget import (CONTINUATION_MAX_OVERLAP, Completion, CompletionPlan, OutputTruncatedError,
+                     PromptTooLongError, get_output_budget, join_continuation)
+from .edits import apply_edits, edit_issue
+from .json_extract import extract_json_object
+from .breaker import CircuitBreaker, CircuitOpenError, get_circuit_breaker
+from .ratelimit import get_rate_limiter, parse_retry_after
+from .stream_parser import IncrementalIssueParser
+from .async_transport import get_async_transport
+from .transport import get_transport
+
+logger = logging.getLogger(__name__)
 
 class ProofreadingResult:
     """校对结果数据类"""
-    def __init__(self, corrected_text: str, issues: List[Dict[str, Any]]):
+    def __init__(self, corrected_text: str, issues: List[Dict[str, Any]], is_error: bool = False):
         self.corrected_text = corrected_text
         self.issues = issues
+        self.is_error = is_error  # AI调用失败时为 True，此时 corrected_text 为原文
+        self.from_cache = False
+        self.reused_paragraphs = 0  # 增量校对时复用历史结果的段落数
+        self.hedged = False  # 是否发出过对冲请求
+        self.served_by = None  # (提供商, 模型)：实际给出该结果的模型
+
+def upstream_status(error: Exception) -> Optional[int]:
+    """异常对应的上游 HTTP 状态码（requests、OpenAI SDK 的异常均可）；无法确定时返回 None"""
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status if isinstance(status, int) else None
+
+
+def upstream_retry_after(error: Exception) -> Optional[float]:
+    """异常响应中的 Retry-After 秒数"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    return parse_retry_after(headers.get('Retry-After')) if headers is not None else None
+
+
+def is_upstream_failure(error: Exception) -> bool:
+    """
+    异常是否说明上游不健康
+    
+    认证失败、参数错误等 4xx 错误由调用方引起，不计入熔断统计；限流（429）与超时（408）计入。
+    输出超出 max_tokens 被截断说明输入规模过大，同样不计入。
+    """
+    if isinstance(error, (PromptTooLongError, OutputTruncatedError)):
+        return False
+    status = upstream_status(error)
+    if status is not None and 400 <= status < 500:
+        return status in (408, 429)
+    return True
+
 
 class BaseAIService(ABC):
     """AI服务基类"""
     
+    PROOFREADING_PROMPT = """
+请对以下文本进行校对，找出语法错误、错别字、标点符号问题等，并提供修正建议。
+
+请按照以下JSON格式返回结果：
+{{
+    "corrected_text": "修正后的完整文本",
+    "issues": [
+        {{
+            "type": "错误类型（如：语法错误、错别字、标点符号等）",
+            "original": "原始错误内容",
+            "corrected": "修正后内容",
+            "position": "错误位置描述",
+            "explanation": "修正说明"
+        }}
+    ]
+}}
+
+待校对文本：
+{text}
+"""
+    
+    BATCH_PROMPT = """
+请逐条校对以下JSON数组中的文本（各条文本相互独立），找出语法错误、错别字、标点符号问题等，并提供修正建议。
+
+请按照以下JSON格式返回结果，items 中每个元素对应一条输入文本，id 与输入一致：
+{{
+    "items": [
+        {{
+            "id": 输入文本的id,
+            "corrected_text": "该条修正后的完整文本",
+            "issues": [
+                {{
+                    "type": "错误类型（如：语法错误、错别字、标点符号等）",
+                    "original": "原始错误内容",
+                    "corrected": "修正后内容",
+                    "position": "错误位置描述",
+                    "explanation": "修正说明"
+                }}
+            ]
+        }}
+    ]
+}}
+
+待校对文本：
+{items}
+"""
+    
+    EDITS_PROMPT = """
+请对以下文本进行校对，找出语法错误、错别字、标点符号问题等。只返回需要修改的地方，不要复述全文。
+
+请按照以下JSON格式返回结果，没有问题时 edits 为空数组：
+{{
+    "edits": [
+        {{
+            "before": "原文中紧挨在该片段之前的最多8个字（用于定位重复出现的片段）",
+            "original": "原文中需要修改的片段，必须逐字摘录且不能为空",
+            "corrected": "替换后的内容",
+            "type": "错误类型（如：语法错误、错别字、标点符号等）",
+            "explanation": "简短的修正说明"
+        }}
+    ]
+}}
+
+待校对文本：
+{text}
+"""
+    
+    SYSTEM_MESSAGE = "你是一个专业的文本校对助手。请仔细检查文本中的语法、拼写、标点符号等问题，并按照指定格式返回结果。"
+    
+    # 输出因 max_tokens 截断后的续写请求
+    CONTINUATION_PROMPT = "上面的输出因长度限制被截断了。请从中断处紧接着继续输出剩余内容，不要重复已输出的部分，不要添加任何说明。"
+    
+    # 提供商标识，用于选择传输层的超时配置
+    PROVIDER = None
+    
+    # 支持原生 JSON 输出模式（response_format=json_object）的模型，输出保证是合法JSON
+    JSON_MODE_MODELS: Tuple[str, ...] = ()
+    
+    # 响应格式：'full' 返回完整修正文本与问题列表；'edits' 只返回修改列表，由服务端重建修正文本
+    RESPONSE_FORMATS = ('full', 'edits')
+    
     def __init__(self, api_key: str, base_url: Optional[str] = None, model: Optional[str] = None):
         self.api_key = api_key
         self.base_url = base_url
         self.model = model
+        self.response_format = 'full'
     
-    @abstractmethod
     def proofread(self, text: str) -> ProofreadingResult:
         """
         执行文本校对
@@ -28,7 +159,356 @@ class BaseAIService(ABC):
         Returns:
             ProofreadingResult: 包含校对结果和问题列表
         """
-        pass
+        try:
+            prompt = self._get_proofreading_prompt(text)
+            return self._parse_response(self._call_upstream(prompt), text)
+        except PromptTooLongError as e:
+            return self._create_error_result(text, "输入过长", str(e))
+        except Exception as e:
+            return self._create_error_result(text, "API错误", str(e))
+    
+    async def aproofread(self, text: str) -> ProofreadingResult:
+        """
+        proofread() 的协程版本
+        
+        经共享的异步传输发起请求，一个事件循环即可同时保持大量在途调用；
+        熔断、限流与结果解析与同步版本一致。
+        """
+        try:
+            prompt = self._get_proofreading_prompt(text)
+            return self._parse_response(await self._acall_upstream(prompt), text)
+        except PromptTooLongError as e:
+            return self._create_error_result(text, "输入过长", str(e))
+        except Exception as e:
+            return self._create_error_result(text, "API错误", str(e))
+    
+    def proofread_many(self, texts: List[str]) -> List[Optional[ProofreadingResult]]:
+        """
+        在一次请求中校对多条短文本
+        
+        返回与输入等长的列表；模型输出中缺失或格式不正确的条目为 None，
+        由调用方单独重试。请求本身失败时抛出异常。
+        """
+        items = [{"id": i + 1, "text": text} for i, text in enumerate(texts)]
+        prompt = self.BATCH_PROMPT.format(items=json.dumps(items, ensure_ascii=False, indent=2))
+        response_text = self._call_upstream(prompt)
+        
+        results: List[Optional[ProofreadingResult]] = [None] * len(texts)
+        try:
+            data = extract_json_object(response_text)
+        except ValueError:
+            return results
+        
+        for item in data.get('items') or []:
+            if not isinstance(item, dict):
+                continue
+            index = item.get('id')
+            if not isinstance(index, int) or not 1 <= index <= len(texts):
+                continue
+            corrected_text = item.get('corrected_text')
+            issues = item.get('issues', [])
+            if isinstance(corrected_text, str) and isinstance(issues, list):
+                results[index - 1] = ProofreadingResult(corrected_text, issues)
+        return results
+    
+    def get_circuit_breaker(self) -> CircuitBreaker:
+        """当前上游 (提供商, base_url) 的熔断器"""
+        return get_circuit_breaker(self.PROVIDER, self.base_url)
+    
+    def _call_upstream(self, prompt: str) -> str:
+        """
+        经熔断器调用 _complete
+        
+        熔断期间直接抛出 CircuitOpenError；调用结果与耗时计入熔断统计。
+        输入放不进模型的上下文窗口时，在占用熔断与限流额度之前抛出 PromptTooLongError。
+        """
+        self._plan_completion(self._build_messages(prompt))
+        with self._guarded_call():
+            return self._complete(prompt)
+    
+    @contextmanager
+    def _guarded_call(self):
+        """
+        占用限流额度与熔断名额，并把调用结果计入熔断统计
+        
+        先排队取得限流额度再占用熔断名额：半开状态只有少量探测名额，不能在排队期间被占着。
+        熔断中的上游在排队前就直接失败。调用正常结束或抛出 Exception 时记录结果；
+        限流器出错、流式响应被放弃（GeneratorExit）等没有产生结果的退出，归还探测名额，
+        否则熔断器会一直停在半开状态。
+        """
+        breaker = self.get_circuit_breaker()
+        if not breaker.available():
+            raise CircuitOpenError(f"{self.PROVIDER} 暂时不可用（已熔断）")
+        
+        with self._rate_limited():
+            if not breaker.allow():
+                raise CircuitOpenError(f"{self.PROVIDER} 暂时不可用（已熔断）")
+            started = time.monotonic()
+            recorded = False
+            try:
+                yield
+                recorded = True
+                breaker.record(True, time.monotonic() - started)
+            except Exception as e:
+                recorded = True
+                breaker.record(not is_upstream_failure(e), time.monotonic() - started)
+                raise
+            finally:
+                if not recorded:
+                    breaker.release()
+    
+    @contextmanager
+    def _rate_limited(self):
+        """
+        在跨进程限流器中占用一次调用额度
+        
+        额度不足时排队等待；SDK 抛出的 429 在这里上报，基于 requests 的服务由传输层在每次 429 时上报。
+        """
+        limiter = get_rate_limiter()
+        if limiter is None:
+            yield
+            return
+        
+        with limiter.slot(self.PROVIDER or '', self.api_key) as lease:
+            try:
+                yield
+            except Exception as e:
+                if upstream_status(e) == 429 and not lease.throttled:
+                    lease.throttle(upstream_retry_after(e))
+                raise
+    
+    async def _acall_upstream(self, prompt: str) -> str:
+        """_call_upstream 的协程版本"""
+        self._plan_completion(self._build_messages(prompt))
+        async with self._aguarded_call():
+            return await self._acomplete(prompt)
+    
+    @asynccontextmanager
+    async def _aguarded_call(self):
+        """_guarded_call 的协程版本（任务被取消时的 CancelledError 同样归还探测名额）"""
+        breaker = self.get_circuit_breaker()
+        if not breaker.available():
+            raise CircuitOpenError(f"{self.PROVIDER} 暂时不可用（已熔断）")
+        
+        async with self._arate_limited():
+            if not breaker.allow():
+                raise CircuitOpenError(f"{self.PROVIDER} 暂时不可用（已熔断）")
+            started = time.monotonic()
+            recorded = False
+            try:
+                yield
+                recorded = True
+                breaker.record(True, time.monotonic() - started)
+            except Exception as e:
+                recorded = True
+                breaker.record(not is_upstream_failure(e), time.monotonic() - started)
+                raise
+            finally:
+                if not recorded:
+                    breaker.release()
+    
+    @asynccontextmanager
+    async def _arate_limited(self):
+        """_rate_limited 的协程版本"""
+        limiter = get_rate_limiter()
+        if limiter is None:
+            yield
+            return
+        
+        async with limiter.aslot(self.PROVIDER or '', self.api_key) as lease:
+            try:
+                yield
+            except Exception as e:
+                if upstream_status(e) == 429 and not lease.throttled:
+                    await lease.athrottle(upstream_retry_after(e))
+                raise
+    
+    async def _acomplete(self, prompt: str) -> str:
+        """
+        _complete 的协程版本
+        
+        内置提供商均基于异步传输实现 _arequest；未实现的子类退回在线程中调用 _complete。
+        """
+        if type(self)._arequest is BaseAIService._arequest:
+            return await asyncio.to_thread(self._complete, prompt)
+        
+        messages = self._build_messages(prompt)
+        output = ''
+        for _ in range(get_output_budget().max_continuations + 1):
+            request_messages = self._continuation_messages(messages, output)
+            completion = await self._arequest(request_messages, self._plan_completion(request_messages, bool(output)))
+            output = join_continuation(output, completion.content)
+            if not completion.truncated:
+                return output
+            logger.info(f"{self.PROVIDER} output truncated at {len(output)} chars, continuing")
+        raise self._truncated_error()
+    
+    def _complete(self, prompt: str) -> str:
+        """
+        发送提示词并返回模型输出全文
+        
+        按输出预算调用 _request；输出因 max_tokens 截断时带上已输出的内容续写，拼接为完整输出。
+        子类可以直接重写本方法。
+        
+        Args:
+            prompt: 完整的用户提示词
+            
+        Returns:
+            str: 模型输出文本
+        """
+        messages = self._build_messages(prompt)
+        output = ''
+        for _ in range(get_output_budget().max_continuations + 1):
+            request_messages = self._continuation_messages(messages, output)
+            completion = self._request(request_messages, self._plan_completion(request_messages, bool(output)))
+            output = join_continuation(output, completion.content)
+            if not completion.truncated:
+                return output
+            logger.info(f"{self.PROVIDER} output truncated at {len(output)} chars, continuing")
+        raise self._truncated_error()
+    
+    def _request(self, messages: List[Dict[str, str]], plan: CompletionPlan) -> Completion:
+        """
+        发出一次请求（子类实现）
+        
+        Args:
+            messages: Chat Completions 格式的消息列表
+            plan: max_tokens、读超时与是否启用 JSON 模式
+        """
+        raise NotImplementedError
+    
+    async def _arequest(self, messages: List[Dict[str, str]], plan: CompletionPlan) -> Completion:
+        """_request 的协程版本（子类实现）"""
+        raise NotImplementedError
+    
+    def _plan_completion(self, messages: List[Dict[str, str]], continuation: bool = False) -> CompletionPlan:
+        """
+        按输入规模与当前模型的上下文窗口确定输出参数
+        
+        Raises:
+            PromptTooLongError: 输入放不进上下文窗口
+        """
+        json_mode = self.supports_json_mode() and not continuation
+        return get_output_budget().plan(self.get_model(), messages, self.response_format, json_mode)
+    
+    def _continuation_messages(self, messages: List[Dict[str, str]], output: str) -> List[Dict[str, str]]:
+        """续写请求的消息列表：原消息之后附上已输出的内容与续写要求；尚无输出时即原消息"""
+        if not output:
+            return messages
+        return messages + [
+            {"role": "assistant", "content": output},
+            {"role": "user", "content": self.CONTINUATION_PROMPT}
+        ]
+    
+    def _truncated_error(self) -> OutputTruncatedError:
+        return OutputTruncatedError(
+            f"{self.get_model()} 的输出在续写 {get_output_budget().max_continuations} 次后仍被截断，请缩短文本后重试"
+        )
+    
+    def _build_messages(self, prompt: str) -> List[Dict[str, str]]:
+        """构造 Chat Completions 格式的消息列表"""
+        return [
+            {"role": "system", "content": self._get_system_message()},
+            {"role": "user", "content": prompt}
+        ]
+    
+    def supports_streaming(self) -> bool:
+        """是否支持流式输出（子类实现 _stream_completion 后应返回 True）"""
+        return False
+    
+    def _stream_completion(self, prompt: str) -> Iterator[str]:
+        """
+        流式获取模型输出（子类可重写）
+        
+        按输出预算调用 _stream_request；输出被截断时续写，续写内容紧接着产出。
+        
+        Args:
+            prompt: 校对提示词
+            
+        Returns:
+            Iterator[str]: 逐段产出的模型输出文本
+        """
+        messages = self._build_messages(prompt)
+        output = ''
+        for _ in range(get_output_budget().max_continuations + 1):
+            request_messages = self._continuation_messages(messages, output)
+            stream = self._stream_request(request_messages, self._plan_completion(request_messages, bool(output)))
+            output, truncated = yield from self._relay_stream(stream, output)
+            if not truncated:
+                return
+            logger.info(f"{self.PROVIDER} output truncated at {len(output)} chars, continuing")
+        raise self._truncated_error()
+    
+    def _stream_request(self, messages: List[Dict[str, str]], plan: CompletionPlan) -> Iterator[str]:
+        """
+        发出一次流式请求（子类实现）：逐段产出输出文本，结束时返回是否因 max_tokens 截断
+        """
+        raise NotImplementedError
+    
+    @staticmethod
+    def _relay_stream(stream: Iterator[str], output: str):
+        """
+        转发一轮流式输出，返回 (拼接后的完整输出, 是否截断)
+        
+        续写的一轮先缓存开头一段，去掉与已有输出重叠的部分后再转发。
+        """
+        pending = '' if output else None
+        while True:
+            try:
+                chunk = next(stream)
+            except StopIteration as stop:
+                truncated = bool(stop.value)
+                break
+            if pending is None:
+                output += chunk
+                yield chunk
+                continue
+            pending += chunk
+            if len(pending) > CONTINUATION_MAX_OVERLAP + 16:
+                joined = join_continuation(output, pending)
+                yield joined[len(output):]
+                output, pending = joined, None
+        if pending:
+            joined = join_continuation(output, pending)
+            yield joined[len(output):]
+            output = joined
+        return output, truncated
+    
+    def proofread_stream(self, text: str) -> Iterator[Tuple[str, Any]]:
+        """
+        流式执行文本校对
+        
+        每当模型输出中 issues 数组里的一个问题对象完整闭合，就产出 ('issue', dict)；
+        全部输出结束后产出 ('result', ProofreadingResult)，以完整解析的结果为准。
+        不支持流式的服务会退化为一次性校对后再逐个产出问题。
+        """
+        if not self.supports_streaming():
+            result = self.proofread(text)
+            if not result.is_error:
+                for issue in result.issues:
+                    yield 'issue', issue
+            yield 'result', result
+            return
+        
+        parser = IncrementalIssueParser()
+        to_issue = edit_issue if self.response_format == 'edits' else dict
+        chunks = []
+        try:
+            prompt = self._get_proofreading_prompt(text)
+            self._plan_completion(self._build_messages(prompt))
+            with self._guarded_call():
+                for chunk in self._stream_completion(prompt):
+                    chunks.append(chunk)
+                    for issue in parser.feed(chunk):
+                        yield 'issue', to_issue(issue)
+        except PromptTooLongError as e:
+            yield 'result', self._create_error_result(text, "输入过长", str(e))
+            return
+        except Exception as e:
+            yield 'result', self._create_error_result(text, "API错误", str(e))
+            return
+        
+        yield 'result', self._parse_response(''.join(chunks), text)
     
     def get_model(self) -> str:
         """获取当前使用的模型"""
@@ -38,32 +518,30 @@ class BaseAIService(ABC):
         """获取默认模型（子类应重写此方法）"""
         return "default-model"
     
+    def supports_json_mode(self) -> bool:
+        """当前模型是否支持原生 JSON 输出模式"""
+        return self.get_model() in self.JSON_MODE_MODELS
+    
     def _get_proofreading_prompt(self, text: str) -> str:
         """获取校对提示词"""
-        return f"""
-请对以下文本进行校对，找出语法错误、错别字、标点符号问题等，并提供修正建议。
-
-请按照以下JSON格式返回结果：
-{{
-    "corrected_text": "修正后的完整文本",
-    "issues": [
-        {{
-            "type": "错误类型（如：语法错误、错别字、标点符号等）",
-            "original": "原始错误内容",
-            "corrected": "修正后内容",
-            "position": "错误位置描述",
-            "explanation": "修正说明"
-        }}
-    ]
-}}
-
-待校对文本：
-{text}
-"""
+        if self.response_format == 'edits':
+            return self.EDITS_PROMPT.format(text=text)
+        return self.PROOFREADING_PROMPT.format(text=text)
     
     def _get_system_message(self) -> str:
         """获取系统消息"""
-        return "你是一个专业的文本校对助手。请仔细检查文本中的语法、拼写、标点符号等问题，并按照指定格式返回结果。"
+        return self.SYSTEM_MESSAGE
+    
+    @classmethod
+    def get_prompt_version(cls) -> str:
+        """
+        获取提示词版本
+        
+        取提示词模板与系统消息的摘要，提示词一旦修改版本即随之变化，
+        依赖提示词的缓存结果会自动失效。
+        """
+        digest = hashlib.sha256((cls.PROOFREADING_PROMPT + cls.EDITS_PROMPT + cls.BATCH_PROMPT + cls.SYSTEM_MESSAGE).encode('utf-8'))
+        return digest.hexdigest()[:12]
     
     def _create_error_result(self, text: str, error_type: str, error_msg: str) -> ProofreadingResult:
         """创建错误结果"""
@@ -75,33 +553,57 @@ class BaseAIService(ABC):
                 "corrected": "",
                 "position": "",
                 "explanation": f"错误信息: {error_msg}"
-            }]
+            }],
+            is_error=True
         )
     
-    def _make_http_request(self, url: str, headers: Dict[str, str], data: Dict[str, Any]) -> Dict[str, Any]:
-        """发起HTTP请求"""
-        response = requests.post(url, headers=headers, json=data, timeout=30)
-        response.raise_for_status()
-        return response.json()
+    def _make_http_request(self, url: str, headers: Dict[str, str], data: Dict[str, Any],
+                           read_timeout: Optional[float] = None) -> Dict[str, Any]:
+        """通过共享传输层发起HTTP请求"""
+        return get_transport().post_json(self.PROVIDER, url, headers, data, read_timeout)
     
-    def _parse_response(self, response_text: str) -> ProofreadingResult:
-        """解析AI返回的结果"""
-        import re
+    async def _amake_http_request(self, url: str, headers: Dict[str, str], data: Dict[str, Any],
+                                  read_timeout: Optional[float] = None) -> Dict[str, Any]:
+        """通过当前事件循环共享的异步传输发起HTTP请求"""
+        return await get_async_transport().post_json(self.PROVIDER, url, headers, data, read_timeout)
+    
+    def _stream_http_request(self, url: str, headers: Dict[str, str], data: Dict[str, Any],
+                             read_timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """发起流式HTTP请求，逐个产出 SSE 中 data 字段解析后的JSON"""
+        with get_transport().stream(self.PROVIDER, url, headers, data, read_timeout) as response:
+            # text/event-stream 通常不声明 charset，requests 会默认按 ISO-8859-1 解码
+            response.encoding = 'utf-8'
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                payload = line[len('data:'):].strip()
+                if payload == '[DONE]':
+                    break
+                yield json.loads(payload)
+    
+    def _parse_response(self, response_text: str, text: Optional[str] = None) -> ProofreadingResult:
+        """
+        解析AI返回的结果
         
+        Args:
+            response_text: 模型输出
+            text: 原文；模型按修改列表格式返回时用于重建修正文本
+        """
         try:
-            # 尝试从响应中提取JSON
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                response_text = json_match.group()
+            # 从响应中提取第一个完整的JSON对象（容忍代码块、前后说明文字与尾逗号）
+            result = extract_json_object(response_text)
             
-            result = json.loads(response_text)
+            edits = result.get('edits')
+            if text is not None and isinstance(edits, list) and 'corrected_text' not in result:
+                corrected_text, issues, _ = apply_edits(text, edits)
+                return ProofreadingResult(corrected_text, issues)
             
             corrected_text = result.get('corrected_text', '')
             issues = result.get('issues', [])
             
             return ProofreadingResult(corrected_text, issues)
             
-        except (json.JSONDecodeError, AttributeError) as e:
+        except ValueError as e:
             # 如果无法解析JSON，返回原文本和空问题列表
             return ProofreadingResult(
                 corrected_text=response_text,
@@ -111,5 +613,6 @@ class BaseAIService(ABC):
                     "corrected": "",
                     "position": "",
                     "explanation": f"AI返回格式不正确: {str(e)}"
-                }]
+                }],
+                is_error=True
             ) 
\ No newline at end of file
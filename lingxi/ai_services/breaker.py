@@ -0,0 +1,159 @@
+"""
+熔断器
+
+按 (提供商, base_url) 统计最近一段时间内的调用错误率与慢调用比例，超过阈值即熔断：
+熔断期间直接失败而不再等待上游超时；冷却时间过后进入半开状态，放行少量探测请求，
+探测成功则恢复，失败则重新熔断。
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+
+class CircuitBreaker:
+    """单个上游的熔断器"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, window_seconds: float = 60, min_calls: int = 10, error_rate: float = 0.5,
+                 slow_call_seconds: float = 30, slow_call_rate: float = 0.8,
+                 open_seconds: float = 30, half_open_calls: int = 1):
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self._probes = 0
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()  # (时间, 是否成功, 是否慢调用)
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """是否放行一次调用；半开状态下只放行有限个探测请求"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.open_seconds:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probes = 0
+            if self.state == self.HALF_OPEN:
+                if self._probes >= self.half_open_calls:
+                    return False
+                self._probes += 1
+            return True
+
+    def available(self) -> bool:
+        """不占用探测名额地判断当前是否可能放行"""
+        with self._lock:
+            if self.state == self.OPEN:
+                return time.monotonic() - self.opened_at >= self.open_seconds
+            if self.state == self.HALF_OPEN:
+                return self._probes < self.half_open_calls
+            return True
+
+    def release(self):
+        """归还 allow() 占用、但没有产生调用结果的探测名额（调用在发出前失败或被中途放弃）"""
+        with self._lock:
+            if self.state == self.HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record(self, success: bool, seconds: float):
+        """记录一次调用结果"""
+        now = time.monotonic()
+        slow = seconds >= self.slow_call_seconds
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                if success and not slow:
+                    self._close()
+                else:
+                    self._open(now)
+                return
+
+            self._calls.append((now, success, slow))
+            self._prune(now)
+            if self.state == self.CLOSED and self._should_trip():
+                self._open(now)
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            self._prune(time.monotonic())
+            calls = len(self._calls)
+            errors = sum(1 for _, success, _ in self._calls if not success)
+            slow = sum(1 for _, _, is_slow in self._calls if is_slow)
+            retry_in = None
+            if self.state == self.OPEN:
+                retry_in = max(self.open_seconds - (time.monotonic() - self.opened_at), 0)
+            return {
+                'state': self.state,
+                'calls': calls,
+                'error_rate': errors / calls if calls else 0.0,
+                'slow_call_rate': slow / calls if calls else 0.0,
+                'retry_in_seconds': retry_in,
+            }
+
+    def _should_trip(self) -> bool:
+        calls = len(self._calls)
+        if calls < self.min_calls:
+            return False
+        errors = sum(1 for _, success, _ in self._calls if not success)
+        slow = sum(1 for _, _, is_slow in self._calls if is_slow)
+        return errors / calls >= self.error_rate or slow / calls >= self.slow_call_rate
+
+    def _open(self, now: float):
+        self.state = self.OPEN
+        self.opened_at = now
+        self._calls.clear()
+
+    def _close(self):
+        self.state = self.CLOSED
+        self._calls.clear()
+
+    def _prune(self, now: float):
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+
+class CircuitOpenError(Exception):
+    """上游处于熔断状态"""
+
+
+_settings: Dict[str, float] = {}
+_breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def configure_circuit_breakers(**settings):
+    """设置熔断参数（通常在应用启动时根据配置调用一次），并清空已有熔断器"""
+    global _settings
+    with _breakers_lock:
+        _settings = dict(settings)
+        _breakers.clear()
+
+
+def get_circuit_breaker(provider: Optional[str], base_url: Optional[str]) -> CircuitBreaker:
+    """获取 (提供商, base_url) 对应的熔断器"""
+    key = (provider or '', base_url or '')
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(**_settings)
+            _breakers[key] = breaker
+        return breaker
+
+
+def circuit_breaker_states() -> Dict[str, Dict[str, object]]:
+    """全部熔断器的当前状态，键为 "提供商 base_url" """
+    with _breakers_lock:
+        items = list(_breakers.items())
+    return {
+        f'{provider} {base_url}'.strip(): breaker.snapshot()
+        for (provider, base_url), breaker in items
+    }
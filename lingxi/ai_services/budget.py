@@ -0,0 +1,142 @@
+"""
+输出预算
+
+按输入长度与模型的上下文窗口确定每次请求的 max_tokens 与读超时，而不是固定 2000：
+短文本不再为用不到的输出预留额度、等待过长的超时；长文本不会因上限过低被悄悄截断。
+输入加上最低输出预算放不进上下文窗口时，在发出请求前直接报错。
+
+模型仍因 max_tokens 截断输出（finish_reason == "length"）时，由 BaseAIService 带上已输出的内容发出续写请求，
+把各段拼接为完整输出；续写次数达到上限仍未结束则抛出 OutputTruncatedError。
+"""
+
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .tokens import ModelLimits, estimate_tokens, get_model_limits
+
+# 每条消息的格式开销（角色标记等）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# 续写内容开头与已有输出重叠时，最多比对的字符数；重叠短于 CONTINUATION_MIN_OVERLAP 视为巧合不去除
+CONTINUATION_MAX_OVERLAP = 200
+CONTINUATION_MIN_OVERLAP = 6
+
+_JSON_FENCE = re.compile(r'^\s*```json\s*\n')
+
+
+class PromptTooLongError(ValueError):
+    """输入放不进模型的上下文窗口"""
+
+
+class OutputTruncatedError(Exception):
+    """续写次数用完后模型输出仍被截断"""
+
+
+class CompletionPlan(NamedTuple):
+    """单次请求的输出参数"""
+    max_tokens: int
+    read_timeout: float  # 秒；传输层取它与按提供商配置的读超时中较小的一个
+    json_mode: bool  # 续写请求的输出是前一段的延续，不是独立的JSON对象，不能启用 JSON 模式
+
+
+class Completion(NamedTuple):
+    """单次请求的输出"""
+    content: str
+    truncated: bool  # 因 max_tokens 截断（finish_reason 为 "length" / "MAX_TOKENS"）
+
+
+class OutputBudget:
+    """按输入估算输出规模，给出 max_tokens 与读超时"""
+
+    def __init__(self, output_ratios: Optional[Dict[str, float]] = None, base_tokens: int = 256,
+                 min_output_tokens: int = 256, tokens_per_second: float = 25.0, timeout_base: float = 10.0,
+                 max_continuations: int = 2, model_limits: Optional[Dict[str, Tuple[int, int]]] = None):
+        """
+        Args:
+            output_ratios: 响应格式 -> 输出 token 相对输入的倍数（full 要复述全文，edits 只列修改）
+            base_tokens: 输出中与输入长度无关的部分（JSON 结构、问题说明）
+            min_output_tokens: 上下文窗口至少要为输出留出的 token 数，不足时拒绝请求
+            tokens_per_second: 估算读超时时假定的生成速度
+            timeout_base: 读超时中与输出长度无关的部分（排队与首个 token 的延迟），秒
+            max_continuations: 输出被截断后最多续写的次数
+            model_limits: 模型ID -> (上下文窗口, 输出上限)，覆盖内置表
+        """
+        self.output_ratios = dict(output_ratios or {'full': 2.0, 'edits': 1.0})
+        self.base_tokens = base_tokens
+        self.min_output_tokens = min_output_tokens
+        self.tokens_per_second = tokens_per_second
+        self.timeout_base = timeout_base
+        self.max_continuations = max_continuations
+        self.model_limits = {model: ModelLimits(*limits) for model, limits in (model_limits or {}).items()}
+
+    def limits_for(self, model: str) -> ModelLimits:
+        return get_model_limits(model, self.model_limits)
+
+    def plan(self, model: str, messages: List[Dict[str, str]], response_format: str = 'full',
+             json_mode: bool = False) -> CompletionPlan:
+        """
+        为一次请求确定输出参数
+
+        输出规模按第一条用户消息（校对提示词）估算，续写请求沿用同样的规模；
+        实际 max_tokens 不超过模型的输出上限与上下文窗口的剩余空间。
+
+        Raises:
+            PromptTooLongError: 上下文窗口的剩余空间不足 min_output_tokens
+        """
+        limits = self.limits_for(model)
+        prompt_tokens = sum(estimate_tokens(message['content'], limits.cjk_tokens_per_char) + MESSAGE_OVERHEAD_TOKENS
+                            for message in messages)
+        available = limits.context_window - prompt_tokens
+        if available < self.min_output_tokens:
+            raise PromptTooLongError(
+                f"输入约 {prompt_tokens} tokens，模型 {model} 的上下文窗口为 {limits.context_window} tokens，"
+                f"放不下输入与至少 {self.min_output_tokens} tokens 的输出，请缩短文本或换用上下文更大的模型"
+            )
+
+        prompt = next((message['content'] for message in messages if message['role'] == 'user'), '')
+        ratio = self.output_ratios.get(response_format, max(self.output_ratios.values()))
+        wanted = int(estimate_tokens(prompt, limits.cjk_tokens_per_char) * ratio) + self.base_tokens + limits.reasoning_tokens
+        max_tokens = min(max(wanted, self.min_output_tokens), limits.max_output, available)
+        return CompletionPlan(max_tokens, self.read_timeout(max_tokens), json_mode)
+
+    def read_timeout(self, max_tokens: int) -> float:
+        """生成 max_tokens 个 token 预计需要的读超时"""
+        return self.timeout_base + max_tokens / self.tokens_per_second
+
+
+def join_continuation(output: str, addition: str) -> str:
+    """
+    把续写内容接到已有输出之后
+
+    模型有时会重新打开 ```json 代码块，或把中断处的最后一小段重复一遍，拼接时去掉。
+    """
+    if not output:
+        return addition
+    addition = _JSON_FENCE.sub('', addition, count=1)
+    for size in range(min(len(output), len(addition), CONTINUATION_MAX_OVERLAP), CONTINUATION_MIN_OVERLAP - 1, -1):
+        if output.endswith(addition[:size]):
+            return output + addition[size:]
+    return output + addition
+
+
+_budget = None
+_budget_lock = threading.Lock()
+
+
+def configure_output_budget(**settings) -> OutputBudget:
+    """按给定参数重建共享的输出预算（通常在应用启动时根据配置调用一次）"""
+    global _budget
+    with _budget_lock:
+        _budget = OutputBudget(**settings)
+    return _budget
+
+
+def get_output_budget() -> OutputBudget:
+    """获取当前进程共享的 OutputBudget（未配置时使用默认参数）"""
+    global _budget
+    if _budget is None:
+        with _budget_lock:
+            if _budget is None:
+                _budget = OutputBudget()
+    return _budget
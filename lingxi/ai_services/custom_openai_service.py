@@ -1,41 +1,69 @@
-from .base import BaseAIService, ProofreadingResult
+from .base import BaseAIService
+from .budget import Completion, CompletionPlan
+from .registry import get_client_registry
+from .transport import get_transport
 from openai import OpenAI
+from typing import Dict, Iterator, List, Optional
 
 class CustomOpenAIService(BaseAIService):
     """自定义OpenAI服务实现（支持自定义base_url）"""
     
-    def __init__(self, api_key: str, base_url: str = None):
-        super().__init__(api_key)
+    PROVIDER = 'custom_openai'
+    
+    def __init__(self, api_key: str, base_url: str = None, model: Optional[str] = None):
+        super().__init__(api_key, base_url, model)
         if not base_url:
             raise ValueError("Custom OpenAI service requires a base_url")
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
-    
-    def proofread(self, text: str) -> ProofreadingResult:
-        """使用自定义OpenAI兼容API进行文本校对"""
-        try:
-            prompt = self._get_proofreading_prompt(text)
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",  # 模型名称可能需要根据实际API调整
-                messages=[
-                    {"role": "system", "content": "你是一个专业的文本校对助手。请仔细检查文本中的语法、拼写、标点符号等问题，并按照指定格式返回结果。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=2000
-            )
-            
-            result_text = response.choices[0].message.content
-            return self._parse_response(result_text)
-            
-        except Exception as e:
-            return ProofreadingResult(
-                corrected_text=text,
-                issues=[{
-                    "type": "API错误",
-                    "original": "Custom OpenAI API调用失败",
-                    "corrected": "",
-                    "position": "",
-                    "explanation": f"错误信息: {str(e)}"
-                }]
-            ) 
\ No newline at end of file
+        self.client = get_client_registry().get(
+            self.PROVIDER, api_key, base_url, lambda: OpenAI(api_key=api_key, base_url=base_url)
+        )
+    
+    def get_default_model(self) -> str:
+        """获取默认模型（模型名称可能需要根据实际API调整）"""
+        return "gpt-3.5-turbo"
+    
+    def supports_streaming(self) -> bool:
+        """OpenAI兼容API支持流式输出"""
+        return True
+    
+    def _completion_params(self, messages: List[Dict[str, str]], plan: CompletionPlan) -> dict:
+        """Chat Completions 请求参数"""
+        return {
+            'model': self.get_model(),
+            'messages': messages,
+            'temperature': 0.1,
+            'max_tokens': plan.max_tokens
+        }
+    
+    def _sdk_timeout(self, plan: CompletionPlan) -> float:
+        """SDK 请求的超时：与共享传输层相同的规则（按输出估算，不超过配置的读超时）"""
+        return get_transport().timeout_for(self.PROVIDER, plan.read_timeout)[1]
+    
+    def _request(self, messages: List[Dict[str, str]], plan: CompletionPlan) -> Completion:
+        """通过 Chat Completions 接口获取模型输出"""
+        response = self.client.chat.completions.create(**self._completion_params(messages, plan),
+                                                       timeout=self._sdk_timeout(plan))
+        choice = response.choices[0]
+        return Completion(choice.message.content or '', choice.finish_reason == 'length')
+    
+    async def _arequest(self, messages: List[Dict[str, str]], plan: CompletionPlan) -> Completion:
+        """直接通过异步传输请求兼容接口的 /chat/completions"""
+        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+        url = self.base_url.rstrip('/') + '/chat/completions'
+        result = await self._amake_http_request(url, headers, self._completion_params(messages, plan), plan.read_timeout)
+        choice = result['choices'][0]
+        return Completion(choice['message']['content'] or '', choice.get('finish_reason') == 'length')
+    
+    def _stream_request(self, messages: List[Dict[str, str]], plan: CompletionPlan) -> Iterator[str]:
+        """使用 stream=True 逐段获取输出"""
+        stream = self.client.chat.completions.create(**self._completion_params(messages, plan), stream=True,
+                                                     timeout=self._sdk_timeout(plan))
+        
+        truncated = False
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            if chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            truncated = truncated or chunk.choices[0].finish_reason == 'length'
+        return truncated
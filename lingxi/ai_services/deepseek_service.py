@@ -5,6 +5,9 @@ from typing import Optional
 class DeepSeekService(HTTPAIService):
     """DeepSeek服务实现"""
     
+    PROVIDER = 'deepseek'
+    JSON_MODE_MODELS = ('deepseek-chat', 'deepseek-v3')
+    
     def __init__(self, api_key: str, model: Optional[str] = None):
         super().__init__(
             api_key=api_key,
@@ -0,0 +1,105 @@
+"""
+修改列表格式的校对结果
+
+紧凑格式下模型只返回需要修改的片段（原文片段、替换内容、定位用的前文、错误类型），
+不再复述整篇修正文本，输出 token 大致与修改量成正比。服务端在原文中定位每处修改、
+校验后拼接出修正文本，并为每个问题给出准确的字符偏移。
+"""
+
+import bisect
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def edit_issue(edit: Dict[str, Any], offset: Optional[int] = None) -> Dict[str, Any]:
+    """把一条修改转换为与完整格式一致的问题字典"""
+    issue = {
+        'type': edit.get('type') or '其他',
+        'original': edit.get('original') or '',
+        'corrected': edit.get('corrected') or '',
+        'position': f'第{offset + 1}字' if offset is not None else '',
+        'explanation': edit.get('explanation') or '',
+    }
+    if offset is not None:
+        issue['offset'] = offset
+    return issue
+
+
+def apply_edits(text: str, edits: List[Any]) -> Tuple[str, List[Dict[str, Any]], int]:
+    """
+    把修改列表应用到原文
+
+    修改按出现顺序在原文中定位：优先匹配“前文 + 原文片段”，其次从上一处修改之后查找原文片段，
+    最后在全文中查找。原文片段为空、与替换内容相同、找不到或与已接受的修改重叠的条目被丢弃。
+
+    Args:
+        text: 原文
+        edits: 模型返回的 edits 数组
+
+    Returns:
+        tuple: (修正后文本, 按位置排序且带 offset 的问题列表, 被丢弃的修改数)
+    """
+    starts: List[int] = []
+    accepted: List[Tuple[int, int, Dict[str, Any]]] = []
+    rejected = 0
+    cursor = 0
+    for edit in edits:
+        if not _is_valid(edit):
+            rejected += 1
+            continue
+        original = edit['original']
+        start = _locate(text, original, edit.get('before'), cursor)
+        end = start + len(original) if start is not None else None
+        if start is None or _overlaps(starts, accepted, start, end):
+            rejected += 1
+            continue
+        index = bisect.bisect(starts, start)
+        starts.insert(index, start)
+        accepted.insert(index, (start, end, edit))
+        cursor = end
+
+    if rejected:
+        logger.warning(f"Dropped {rejected} of {len(edits)} edits that could not be applied")
+
+    parts = []
+    issues = []
+    pos = 0
+    for start, end, edit in accepted:
+        parts.append(text[pos:start])
+        parts.append(edit['corrected'])
+        issues.append(edit_issue(edit, start))
+        pos = end
+    parts.append(text[pos:])
+    return ''.join(parts), issues, rejected
+
+
+def _is_valid(edit: Any) -> bool:
+    return (isinstance(edit, dict)
+            and isinstance(edit.get('original'), str) and edit['original'] != ''
+            and isinstance(edit.get('corrected'), str)
+            and edit['original'] != edit['corrected'])
+
+
+def _locate(text: str, original: str, before: Any, cursor: int) -> Optional[int]:
+    """原文片段在 text 中的起点"""
+    if isinstance(before, str) and before:
+        anchored = before + original
+        index = text.find(anchored, cursor)
+        if index < 0:
+            index = text.find(anchored)
+        if index >= 0:
+            return index + len(before)
+    index = text.find(original, cursor)
+    if index < 0:
+        index = text.find(original)
+    return index if index >= 0 else None
+
+
+def _overlaps(starts: List[int], accepted: List[Tuple[int, int, Dict[str, Any]]], start: int, end: int) -> bool:
+    """[start, end) 是否与已接受的修改区间重叠"""
+    index = bisect.bisect(starts, start)
+    if index > 0 and accepted[index - 1][1] > start:
+        return True
+    return index < len(accepted) and accepted[index][0] < end
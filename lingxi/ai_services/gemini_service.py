@@ -1,38 +1,64 @@
-from .base import BaseAIService, ProofreadingResult
+from .base import BaseAIService
+from .budget import Completion, CompletionPlan
+from .registry import get_client_registry
+from typing import Any, Dict, List, Optional
 import google.generativeai as genai
+from google.ai import generativelanguage as glm
+
+
+def _create_client(api_key: str) -> glm.GenerativeServiceClient:
+    """为单个密钥创建独立的 Gemini 客户端"""
+    return glm.GenerativeServiceClient(client_options={'api_key': api_key})
+
 
 class GeminiService(BaseAIService):
     """Google Gemini服务实现"""
     
-    def __init__(self, api_key: str):
-        super().__init__(api_key)
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-pro')
+    PROVIDER = 'gemini'
+    API_URL = 'https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent'
+    
+    def __init__(self, api_key: str, model: Optional[str] = None):
+        super().__init__(api_key, model=model)
+        # 不使用进程全局的 genai.configure()：多个用户的密钥在多线程下会互相覆盖。
+        # 每个密钥使用独立的客户端，并直接注入 GenerativeModel。
+        client = get_client_registry().get(self.PROVIDER, api_key, None, lambda: _create_client(api_key))
+        self.generative_model = genai.GenerativeModel(self.get_model())
+        self.generative_model._client = client
     
-    def proofread(self, text: str) -> ProofreadingResult:
-        """使用Gemini进行文本校对"""
-        try:
-            prompt = self._get_proofreading_prompt(text)
-            
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.1,
-                    max_output_tokens=2000
-                )
+    def get_default_model(self) -> str:
+        """获取默认模型"""
+        return "gemini-pro"
+    
+    @staticmethod
+    def _contents(messages: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """把消息列表转换为 Gemini 的 contents（与此前一致不发送系统消息；续写时模型输出的角色为 model）"""
+        return [
+            {"role": "model" if message['role'] == 'assistant' else "user", "parts": [{"text": message['content']}]}
+            for message in messages if message['role'] != 'system'
+        ]
+    
+    def _request(self, messages: List[Dict[str, str]], plan: CompletionPlan) -> Completion:
+        """使用Gemini生成校对结果"""
+        response = self.generative_model.generate_content(
+            self._contents(messages),
+            generation_config=genai.types.GenerationConfig(
+                temperature=0.1,
+                max_output_tokens=plan.max_tokens
             )
-            
-            result_text = response.text
-            return self._parse_response(result_text)
-            
-        except Exception as e:
-            return ProofreadingResult(
-                corrected_text=text,
-                issues=[{
-                    "type": "API错误",
-                    "original": "Gemini API调用失败",
-                    "corrected": "",
-                    "position": "",
-                    "explanation": f"错误信息: {str(e)}"
-                }]
-            ) 
\ No newline at end of file
+        )
+        candidate = response.candidates[0]
+        content = ''.join(part.text for part in candidate.content.parts)
+        return Completion(content, candidate.finish_reason == glm.Candidate.FinishReason.MAX_TOKENS)
+    
+    async def _arequest(self, messages: List[Dict[str, str]], plan: CompletionPlan) -> Completion:
+        """通过异步传输调用 generateContent REST 接口"""
+        headers = {"x-goog-api-key": self.api_key, "Content-Type": "application/json"}
+        data = {
+            "contents": self._contents(messages),
+            "generationConfig": {"temperature": 0.1, "maxOutputTokens": plan.max_tokens}
+        }
+        result = await self._amake_http_request(self.API_URL.format(model=self.get_model()), headers, data,
+                                                plan.read_timeout)
+        candidate = result['candidates'][0]
+        parts = candidate.get('content', {}).get('parts', [])
+        return Completion(''.join(part.get('text', '') for part in parts), candidate.get('finishReason') == 'MAX_TOKENS')
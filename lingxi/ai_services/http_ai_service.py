@@ -1,5 +1,6 @@
-from .base import BaseAIService, ProofreadingResult
-from typing import Dict, Any, Optional
+from .base import BaseAIService
+from .budget import Completion, CompletionPlan
+from typing import Dict, Any, Iterator, List, Optional
 
 
 class HTTPAIService(BaseAIService):
@@ -14,21 +15,34 @@ class HTTPAIService(BaseAIService):
         """获取默认模型"""
         return self.default_model
     
-    def proofread(self, text: str) -> ProofreadingResult:
-        """使用HTTP API进行文本校对"""
-        try:
-            prompt = self._get_proofreading_prompt(text)
-            
-            headers = self._get_headers()
-            data = self._get_request_data(prompt)
-            
-            result = self._make_http_request(self.base_url, headers, data)
-            result_text = self._extract_content_from_response(result)
-            
-            return self._parse_response(result_text)
-            
-        except Exception as e:
-            return self._create_error_result(text, "API错误", str(e))
+    def _request(self, messages: List[Dict[str, str]], plan: CompletionPlan) -> Completion:
+        """通过HTTP API获取模型输出"""
+        data = self._get_request_data(messages, plan)
+        result = self._make_http_request(self.base_url, self._get_headers(), data, plan.read_timeout)
+        return Completion(self._extract_content_from_response(result), self._is_truncated(result))
+    
+    async def _arequest(self, messages: List[Dict[str, str]], plan: CompletionPlan) -> Completion:
+        """通过异步传输获取模型输出"""
+        data = self._get_request_data(messages, plan)
+        result = await self._amake_http_request(self.base_url, self._get_headers(), data, plan.read_timeout)
+        return Completion(self._extract_content_from_response(result), self._is_truncated(result))
+    
+    def supports_streaming(self) -> bool:
+        """OpenAI兼容的HTTP接口均支持 SSE 流式输出"""
+        return True
+    
+    def _stream_request(self, messages: List[Dict[str, str]], plan: CompletionPlan) -> Iterator[str]:
+        """以 stream=True 请求接口并分块读取 SSE 响应，最后一个数据块带有 finish_reason"""
+        data = self._get_request_data(messages, plan)
+        data['stream'] = True
+        
+        truncated = False
+        for chunk in self._stream_http_request(self.base_url, self._get_headers(), data, plan.read_timeout):
+            content = self._extract_delta_from_chunk(chunk)
+            if content:
+                yield content
+            truncated = truncated or self._is_truncated(chunk)
+        return truncated
     
     def _get_headers(self) -> Dict[str, str]:
         """获取请求头"""
@@ -37,18 +51,30 @@ class HTTPAIService(BaseAIService):
             "Content-Type": "application/json"
         }
     
-    def _get_request_data(self, prompt: str) -> Dict[str, Any]:
+    def _get_request_data(self, messages: List[Dict[str, str]], plan: CompletionPlan) -> Dict[str, Any]:
         """获取请求数据"""
-        return {
+        data = {
             "model": self.get_model(),
-            "messages": [
-                {"role": "system", "content": self._get_system_message()},
-                {"role": "user", "content": prompt}
-            ],
+            "messages": messages,
             "temperature": 0.1,
-            "max_tokens": 2000
+            "max_tokens": plan.max_tokens
         }
+        if plan.json_mode:
+            data["response_format"] = {"type": "json_object"}
+        return data
     
     def _extract_content_from_response(self, response: Dict[str, Any]) -> str:
         """从响应中提取内容"""
-        return response['choices'][0]['message']['content'] 
\ No newline at end of file
+        return response['choices'][0]['message']['content'] 
+    
+    def _is_truncated(self, response: Dict[str, Any]) -> bool:
+        """响应（或流式数据块）的 finish_reason 是否为 length"""
+        choices = response.get('choices') or []
+        return bool(choices) and choices[0].get('finish_reason') == 'length'
+    
+    def _extract_delta_from_chunk(self, chunk: Dict[str, Any]) -> Optional[str]:
+        """从流式响应的单个数据块中提取增量内容"""
+        choices = chunk.get('choices') or []
+        if not choices:
+            return None
+        return choices[0].get('delta', {}).get('content')
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""
+从模型输出中提取JSON对象
+
+模型常在JSON前后附带说明文字、用 ```json 代码块包裹，或输出多余的尾逗号。
+这里从第一个 { 起直接用 JSONDecoder.raw_decode 解码第一个完整对象，之后的内容一概忽略；
+解码失败时用单遍扫描定出对象边界（整体跳过字符串，字符串中的括号不干扰配对）后修复再解码。
+两者耗时都与输出长度成线性关系，不存在正则回溯。
+"""
+
+import json
+import re
+from typing import Any, Dict, Optional
+
+# 扫描时关心的记号：完整的字符串（整体跳过）与花括号
+_OBJECT_TOKENS = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[{}]')
+_FENCE_OPEN = re.compile(r'```[ \t]*(?:json|JSON)?[ \t]*\r?\n')
+# 字符串或紧跟 } / ] 的逗号；前者原样保留，后者去掉逗号
+_TRAILING_COMMA = re.compile(r'("[^"\\]*(?:\\.[^"\\]*)*")|,(\s*[}\]])')
+
+# strict=False 允许字符串中出现未转义的换行等控制字符，这是模型常见的输出
+_DECODER = json.JSONDecoder(strict=False)
+
+# 最多尝试的候选对象数：说明文字中偶尔出现的花括号不会让解析退化
+MAX_CANDIDATES = 8
+
+
+def extract_json_object(text: str) -> Dict[str, Any]:
+    """
+    解析模型输出中的第一个JSON对象
+
+    优先从 ```json 代码块中取。依次尝试各个顶层候选对象：先直接解码（忽略对象之后的内容），
+    失败时用扫描器定出对象边界，去掉尾逗号后再解码，仍失败则跳过整个对象换下一个；
+    对象未闭合（输出被截断）时其后的内容都属于它，不再继续尝试。
+
+    Raises:
+        ValueError: 找不到可解析的JSON对象（json.JSONDecodeError 也是 ValueError）
+    """
+    starts = [0]
+    fence = _FENCE_OPEN.search(text)
+    if fence is not None:
+        starts.insert(0, fence.end())
+
+    error: Optional[ValueError] = None
+    tried = set()
+    for start in starts:
+        begin = text.find('{', start)
+        while begin >= 0 and begin not in tried and len(tried) < MAX_CANDIDATES:
+            tried.add(begin)
+            try:
+                data, _ = _DECODER.raw_decode(text, begin)
+                return data
+            except ValueError as e:
+                error = error or e
+            span = _object_span(text, begin)
+            if span is None:
+                break
+            data = _repair(text[begin:span])
+            if data is not None:
+                return data
+            begin = text.find('{', span)
+    raise error or ValueError("响应中没有JSON对象")
+
+
+def _repair(candidate: str) -> Optional[Dict[str, Any]]:
+    """去掉尾逗号后解码；无需修复或仍无法解码时返回 None"""
+    repaired = _TRAILING_COMMA.sub(lambda m: m.group(1) or m.group(2), candidate)
+    if repaired == candidate:
+        return None
+    try:
+        return _DECODER.decode(repaired)
+    except ValueError:
+        return None
+
+
+def _object_span(text: str, begin: int) -> Optional[int]:
+    """从 text[begin] 处的 { 开始，返回与之配对的 } 之后的位置；对象未闭合时返回 None"""
+    depth = 0
+    for match in _OBJECT_TOKENS.finditer(text, begin):
+        token = match.group()
+        if token == '{':
+            depth += 1
+        elif token == '}':
+            depth -= 1
+            if depth == 0:
+                return match.end()
+    return None
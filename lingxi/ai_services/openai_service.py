@@ -1,36 +1,71 @@
-from .base import BaseAIService, ProofreadingResult
+from .base import BaseAIService
+from .budget import Completion, CompletionPlan
+from .registry import get_client_registry
+from .transport import get_transport
 from openai import OpenAI
-from typing import Optional
+from typing import Dict, Iterator, List, Optional
 
 
 class OpenAIService(BaseAIService):
     """OpenAI服务实现"""
     
+    PROVIDER = 'openai'
+    API_URL = 'https://api.openai.com/v1/chat/completions'
+    JSON_MODE_MODELS = ('gpt-4o', 'gpt-4-turbo', 'gpt-3.5-turbo', 'o3-mini', 'o3')
+    
     def __init__(self, api_key: str, model: Optional[str] = None):
         super().__init__(api_key, model=model)
-        self.client = OpenAI(api_key=api_key)
+        self.client = get_client_registry().get(self.PROVIDER, api_key, None, lambda: OpenAI(api_key=api_key))
     
     def get_default_model(self) -> str:
         """获取默认模型"""
         return "gpt-3.5-turbo"
     
-    def proofread(self, text: str) -> ProofreadingResult:
-        """使用OpenAI进行文本校对"""
-        try:
-            prompt = self._get_proofreading_prompt(text)
-            
-            response = self.client.chat.completions.create(
-                model=self.get_model(),
-                messages=[
-                    {"role": "system", "content": self._get_system_message()},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=2000
-            )
-            
-            result_text = response.choices[0].message.content
-            return self._parse_response(result_text)
-            
-        except Exception as e:
-            return self._create_error_result(text, "API错误", str(e)) 
\ No newline at end of file
+    def supports_streaming(self) -> bool:
+        """OpenAI SDK 支持流式输出"""
+        return True
+    
+    def _completion_params(self, messages: List[Dict[str, str]], plan: CompletionPlan) -> dict:
+        """Chat Completions 请求参数；模型支持时启用 JSON 输出模式"""
+        params = {
+            'model': self.get_model(),
+            'messages': messages,
+            'temperature': 0.1,
+            'max_tokens': plan.max_tokens
+        }
+        if plan.json_mode:
+            params['response_format'] = {'type': 'json_object'}
+        return params
+    
+    def _sdk_timeout(self, plan: CompletionPlan) -> float:
+        """SDK 请求的超时：与共享传输层相同的规则（按输出估算，不超过配置的读超时）"""
+        return get_transport().timeout_for(self.PROVIDER, plan.read_timeout)[1]
+    
+    def _request(self, messages: List[Dict[str, str]], plan: CompletionPlan) -> Completion:
+        """通过 Chat Completions 接口获取模型输出"""
+        response = self.client.chat.completions.create(**self._completion_params(messages, plan),
+                                                       timeout=self._sdk_timeout(plan))
+        choice = response.choices[0]
+        return Completion(choice.message.content or '', choice.finish_reason == 'length')
+    
+    async def _arequest(self, messages: List[Dict[str, str]], plan: CompletionPlan) -> Completion:
+        """直接通过异步传输请求 Chat Completions 接口（与 SDK 使用相同的请求参数）"""
+        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+        url = self.API_URL
+        result = await self._amake_http_request(url, headers, self._completion_params(messages, plan), plan.read_timeout)
+        choice = result['choices'][0]
+        return Completion(choice['message']['content'] or '', choice.get('finish_reason') == 'length')
+    
+    def _stream_request(self, messages: List[Dict[str, str]], plan: CompletionPlan) -> Iterator[str]:
+        """使用 stream=True 逐段获取OpenAI输出"""
+        stream = self.client.chat.completions.create(**self._completion_params(messages, plan), stream=True,
+                                                     timeout=self._sdk_timeout(plan))
+        
+        truncated = False
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            if chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            truncated = truncated or chunk.choices[0].finish_reason == 'length'
+        return truncated
@@ -1,53 +1,47 @@
-from .base import BaseAIService, ProofreadingResult
-from typing import Dict, Any
+from .budget import CompletionPlan
+from .http_ai_service import HTTPAIService
+from typing import Dict, Any, List, Optional
 
 
-class QwenService(BaseAIService):
+class QwenService(HTTPAIService):
     """阿里云通义千问服务实现"""
     
-    def __init__(self, api_key: str):
-        super().__init__(api_key)
-        self.base_url = "https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation"
+    PROVIDER = 'qwen'
+    JSON_MODE_MODELS = ('qwen-max', 'qwen-plus', 'qwen-turbo')
     
-    def proofread(self, text: str) -> ProofreadingResult:
-        """使用Qwen进行文本校对"""
-        try:
-            prompt = self._get_proofreading_prompt(text)
-            
-            headers = self._get_headers()
-            data = self._get_request_data(prompt)
-            
-            result = self._make_http_request(self.base_url, headers, data)
-            result_text = self._extract_content_from_response(result)
-            
-            return self._parse_response(result_text)
-            
-        except Exception as e:
-            return self._create_error_result(text, "API错误", str(e))
+    def __init__(self, api_key: str, model: Optional[str] = None):
+        super().__init__(
+            api_key=api_key,
+            base_url="https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation",
+            default_model="qwen-turbo",
+            model=model
+        )
     
-    def _get_headers(self) -> Dict[str, str]:
-        """获取Qwen专用请求头"""
-        return {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+    def supports_streaming(self) -> bool:
+        """DashScope 原生接口的流式格式与 OpenAI 不兼容，暂按一次性校对处理"""
+        return False
     
-    def _get_request_data(self, prompt: str) -> Dict[str, Any]:
+    def _get_request_data(self, messages: List[Dict[str, str]], plan: CompletionPlan) -> Dict[str, Any]:
         """获取Qwen专用请求数据"""
-        return {
-            "model": "qwen-turbo",
+        data = {
+            "model": self.get_model(),
             "input": {
-                "messages": [
-                    {"role": "system", "content": self._get_system_message()},
-                    {"role": "user", "content": prompt}
-                ]
+                "messages": messages
             },
             "parameters": {
                 "temperature": 0.1,
-                "max_tokens": 2000
+                "max_tokens": plan.max_tokens,
+                "result_format": "message"
             }
         }
+        if plan.json_mode:
+            data["parameters"]["response_format"] = {"type": "json_object"}
+        return data
     
     def _extract_content_from_response(self, response: Dict[str, Any]) -> str:
         """从Qwen响应中提取内容"""
-        return response['output']['choices'][0]['message']['content'] 
\ No newline at end of file
+        return response['output']['choices'][0]['message']['content']
+    
+    def _is_truncated(self, response: Dict[str, Any]) -> bool:
+        """DashScope 的 finish_reason 位于 output.choices 中"""
+        return super()._is_truncated(response.get('output') or {})
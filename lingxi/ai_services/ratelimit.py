@@ -0,0 +1,313 @@
+"""
+跨进程上游限流
+
+按 (提供商, API密钥) 维护令牌桶与自适应并发上限，状态保存在本机共享的 SQLite 文件中，
+同一主机上的所有 Gunicorn worker 共用一份额度，无需外部服务：
+
+- 令牌桶限制请求速率，额度不足时调用方短暂排队而不是直接失败；
+- 并发上限按 AIMD 调整：成功时加性增长，收到 429 时乘性减小；
+- 上游返回 Retry-After 时，在该时间内暂停向这把密钥发出新请求。
+
+在途请求以带过期时间的租约记录，worker 异常退出也不会永久占用并发名额。
+"""
+
+import asyncio
+import contextvars
+import logging
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+from .registry import key_fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitTimeout(Exception):
+    """排队等待超过上限仍未获得调用额度"""
+
+
+class RateLimitLease:
+    """一次已获准的上游调用"""
+
+    def __init__(self, limiter: 'RateLimiter', key: str, lease_id: int):
+        self.limiter = limiter
+        self.key = key
+        self.lease_id = lease_id
+        self.throttled = False
+
+    def throttle(self, retry_after: Optional[float] = None):
+        """上游返回了 429：缩小并发上限，并在 Retry-After 期间暂停该密钥的新请求"""
+        self.throttled = True
+        self.limiter._throttle(self.key, retry_after)
+
+    async def athrottle(self, retry_after: Optional[float] = None):
+        """throttle() 的协程版本：写入在线程中执行，不阻塞事件循环"""
+        self.throttled = True
+        await asyncio.to_thread(self.limiter._throttle, self.key, retry_after)
+
+
+_active_lease: contextvars.ContextVar[Optional[RateLimitLease]] = contextvars.ContextVar(
+    'lingxi_rate_limit_lease', default=None
+)
+
+
+class RateLimiter:
+    """基于 SQLite 的跨进程令牌桶与 AIMD 并发控制"""
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS buckets ('
+        ' key TEXT PRIMARY KEY, tokens REAL NOT NULL, refilled_at REAL NOT NULL,'
+        ' concurrency REAL NOT NULL, blocked_until REAL NOT NULL DEFAULT 0)',
+        'CREATE TABLE IF NOT EXISTS leases ('
+        ' id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, expires_at REAL NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS ix_leases_key ON leases (key, expires_at)',
+    )
+
+    def __init__(self, path: str, rate: float = 5.0, burst: float = 10.0,
+                 rates: Optional[Dict[str, float]] = None,
+                 initial_concurrency: float = 4, min_concurrency: float = 1, max_concurrency: float = 32,
+                 increase: float = 1.0, decrease: float = 0.5,
+                 max_wait: float = 30.0, lease_seconds: float = 300.0, poll_interval: float = 0.05):
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+        self.rates = dict(rates or {})
+        self.initial_concurrency = initial_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.increase = increase
+        self.decrease = decrease
+        self.max_wait = max_wait
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+
+        self._local = threading.local()
+        with self._transaction() as conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    @contextmanager
+    def slot(self, provider: str, api_key: str) -> Iterator[RateLimitLease]:
+        """
+        获取一次调用额度，上下文结束时归还
+
+        额度不足时阻塞排队，超过 max_wait 抛出 RateLimitTimeout。上下文正常结束视为成功，
+        按加性增长放宽并发上限；期间收到的 429 通过 lease.throttle() 或 report_throttle() 上报。
+        """
+        key = f'{provider}:{key_fingerprint(api_key)}'
+        lease = RateLimitLease(self, key, self._acquire(key, provider))
+        previous = _active_lease.get()
+        _active_lease.set(lease)
+        success = False
+        try:
+            yield lease
+            success = not lease.throttled
+        finally:
+            # 流式响应中途被放弃（GeneratorExit）时同样立即归还名额
+            self._release(lease, success)
+            # 流式调用时上下文可能跨越多次 next()，这里不用 reset(token)，直接恢复原值
+            _active_lease.set(previous)
+
+    @asynccontextmanager
+    async def aslot(self, provider: str, api_key: str) -> AsyncIterator[RateLimitLease]:
+        """
+        slot() 的协程版本：排队时让出事件循环而不是阻塞线程
+
+        获取与归还都是 BEGIN IMMEDIATE 写事务，其他进程持有写锁时最多等待 busy timeout，
+        因此放到线程中执行，共享事件循环上的其他请求不受影响。
+        """
+        key = f'{provider}:{key_fingerprint(api_key)}'
+        lease = RateLimitLease(self, key, await self._aacquire(key, provider))
+        # 每个 asyncio 任务运行在各自的上下文副本中，这里设置的值只对当前任务可见
+        previous = _active_lease.get()
+        _active_lease.set(lease)
+        success = False
+        try:
+            yield lease
+            success = not lease.throttled
+        finally:
+            _active_lease.set(previous)
+            # 任务在等待期间被取消时，线程中的归还仍会完成
+            await asyncio.to_thread(self._release, lease, success)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """各密钥当前的令牌数、并发上限、在途数与剩余暂停时间（键中只含密钥指纹）"""
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute('SELECT key, tokens, concurrency, blocked_until FROM buckets').fetchall()
+            in_flight = dict(conn.execute(
+                'SELECT key, COUNT(*) FROM leases WHERE expires_at > ? GROUP BY key', (now,)
+            ).fetchall())
+        return {
+            key: {
+                'tokens': round(tokens, 2),
+                'concurrency': round(concurrency, 2),
+                'in_flight': in_flight.get(key, 0),
+                'blocked_seconds': round(max(blocked_until - now, 0), 2),
+            }
+            for key, tokens, concurrency, blocked_until in rows
+        }
+
+    def _acquire(self, key: str, provider: str) -> int:
+        deadline = time.monotonic() + self.max_wait
+        rate = self.rates.get(provider, self.rate)
+        while True:
+            lease_id, wait = self._try_acquire(key, rate)
+            if lease_id is not None:
+                return lease_id
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RateLimitTimeout(f"{provider} 请求排队超时，请稍后重试")
+            # 加少量抖动，避免多个 worker 同时醒来争抢同一个令牌
+            time.sleep(min(wait, remaining) + random.uniform(0, self.poll_interval))
+
+    async def _aacquire(self, key: str, provider: str) -> int:
+        deadline = time.monotonic() + self.max_wait
+        rate = self.rates.get(provider, self.rate)
+        while True:
+            attempt = asyncio.ensure_future(asyncio.to_thread(self._try_acquire, key, rate))
+            try:
+                lease_id, wait = await asyncio.shield(attempt)
+            except asyncio.CancelledError:
+                # 取消时线程中的获取可能随后成功，届时归还租约，避免占着并发名额直到过期
+                attempt.add_done_callback(lambda done: self._release_abandoned(done, key))
+                raise
+            if lease_id is not None:
+                return lease_id
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RateLimitTimeout(f"{provider} 请求排队超时，请稍后重试")
+            await asyncio.sleep(min(wait, remaining) + random.uniform(0, self.poll_interval))
+
+    def _release_abandoned(self, attempt: 'asyncio.Future', key: str):
+        if attempt.cancelled() or attempt.exception() is not None:
+            return
+        lease_id, _ = attempt.result()
+        if lease_id is not None:
+            asyncio.get_running_loop().run_in_executor(None, self._release, RateLimitLease(self, key, lease_id), False)
+
+    def _try_acquire(self, key: str, rate: float):
+        """尝试获取额度：成功返回 (租约ID, 0)，否则返回 (None, 建议等待秒数)"""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM leases WHERE key = ? AND expires_at <= ?', (key, now))
+            tokens, concurrency, blocked_until = self._load(conn, key, now, rate)
+            in_flight = conn.execute('SELECT COUNT(*) FROM leases WHERE key = ?', (key,)).fetchone()[0]
+
+            if blocked_until > now:
+                wait = blocked_until - now
+            elif in_flight >= max(math.floor(concurrency), 1):
+                wait = self.poll_interval
+            elif tokens < 1:
+                wait = (1 - tokens) / rate
+            else:
+                conn.execute('UPDATE buckets SET tokens = ?, refilled_at = ? WHERE key = ?',
+                             (tokens - 1, now, key))
+                cursor = conn.execute('INSERT INTO leases (key, expires_at) VALUES (?, ?)',
+                                      (key, now + self.lease_seconds))
+                return cursor.lastrowid, 0
+            conn.execute('UPDATE buckets SET tokens = ?, refilled_at = ? WHERE key = ?', (tokens, now, key))
+            return None, wait
+
+    def _load(self, conn: sqlite3.Connection, key: str, now: float, rate: float):
+        """读取（必要时创建）令牌桶，并按流逝时间补充令牌"""
+        row = conn.execute('SELECT tokens, refilled_at, concurrency, blocked_until FROM buckets WHERE key = ?',
+                           (key,)).fetchone()
+        if row is None:
+            conn.execute('INSERT INTO buckets (key, tokens, refilled_at, concurrency) VALUES (?, ?, ?, ?)',
+                         (key, self.burst, now, self.initial_concurrency))
+            return self.burst, self.initial_concurrency, 0.0
+        tokens, refilled_at, concurrency, blocked_until = row
+        tokens = min(self.burst, tokens + max(now - refilled_at, 0) * rate)
+        return tokens, concurrency, blocked_until
+
+    def _release(self, lease: RateLimitLease, success: bool):
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM leases WHERE id = ?', (lease.lease_id,))
+            if success:
+                # 加性增长：大约每完成“当前上限”个成功调用，上限加 increase
+                conn.execute(
+                    'UPDATE buckets SET concurrency = MIN(?, concurrency + ? / concurrency) WHERE key = ?',
+                    (self.max_concurrency, self.increase, lease.key)
+                )
+
+    def _throttle(self, key: str, retry_after: Optional[float]):
+        now = time.time()
+        blocked_until = now + retry_after if retry_after else 0
+        with self._transaction() as conn:
+            conn.execute(
+                'UPDATE buckets SET concurrency = MAX(?, concurrency * ?), tokens = 0, refilled_at = ?,'
+                ' blocked_until = MAX(blocked_until, ?) WHERE key = ?',
+                (self.min_concurrency, self.decrease, now, blocked_until, key)
+            )
+        logger.warning(f"Upstream {key.split(':')[0]} throttled, retry after {retry_after or 0:.1f}s")
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        # BEGIN IMMEDIATE 在读取前就取得写锁，保证多个进程的“读取-判断-扣减”互斥
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        else:
+            conn.execute('COMMIT')
+
+
+def parse_retry_after(value) -> Optional[float]:
+    """解析 Retry-After（秒数形式）；无法解析时返回 None"""
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def report_throttle(retry_after=None):
+    """在当前调用的限流上下文中上报一次 429（由传输层等下层调用）"""
+    lease = _active_lease.get()
+    if lease is not None:
+        lease.throttle(parse_retry_after(retry_after))
+
+
+async def areport_throttle(retry_after=None):
+    """report_throttle() 的协程版本（由异步传输层调用）"""
+    lease = _active_lease.get()
+    if lease is not None:
+        await lease.athrottle(parse_retry_after(retry_after))
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def configure_rate_limiter(enabled: bool = True, **settings) -> Optional[RateLimiter]:
+    """按给定参数创建共享限流器（通常在应用启动时根据配置调用一次）；enabled 为假时关闭限流"""
+    global _limiter
+    with _limiter_lock:
+        if enabled:
+            directory = os.path.dirname(settings['path'])
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            _limiter = RateLimiter(**settings)
+        else:
+            _limiter = None
+    return _limiter
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    """获取当前进程的限流器；未配置时返回 None，即不限流"""
+    return _limiter
@@ -0,0 +1,155 @@
+"""
+SDK 客户端注册表
+
+OpenAI、Gemini 等 SDK 客户端内部持有连接池，构造成本较高。注册表按
+(提供商, 密钥指纹, base_url) 缓存已就绪的客户端，同一密钥的后续请求直接复用；
+数量超过上限时淘汰最久未使用的客户端；被淘汰的客户端可能仍在其他线程的请求中使用，
+不立即关闭，与登记中的客户端一样在空闲超时后关闭。
+"""
+
+import atexit
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def key_fingerprint(api_key: str) -> str:
+    """API密钥指纹（注册表中不保存明文密钥）"""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+
+
+class ClientRegistry:
+    """有上限的 LRU 客户端注册表，支持空闲淘汰与统一关闭"""
+
+    def __init__(self, max_size: int = 128, idle_seconds: float = 900):
+        self.max_size = max_size
+        self.idle_seconds = idle_seconds
+        self._clients: 'OrderedDict[Tuple[str, str, str], Tuple[Any, float]]' = OrderedDict()
+        # 因超出上限被淘汰、尚未空闲超时的 (客户端, 最后使用时间)
+        self._retired: List[Tuple[Any, float]] = []
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._last_sweep = time.monotonic()
+
+    def get(self, provider: str, api_key: str, base_url: Optional[str], factory: Callable[[], Any]) -> Any:
+        """
+        获取客户端，不存在时调用 factory 创建并登记
+
+        客户端在锁外创建，并发创建同一客户端时保留先登记的那个，其余的立即关闭。
+        """
+        key = (provider, key_fingerprint(api_key), base_url or '')
+        now = time.monotonic()
+        if now - self._last_sweep > min(self.idle_seconds, 60):
+            self._last_sweep = now
+            self.evict_idle()
+
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is not None and now - entry[1] <= self.idle_seconds:
+                self._clients[key] = (entry[0], now)
+                self._clients.move_to_end(key)
+                self._hits += 1
+                return entry[0]
+            self._misses += 1
+
+        client = factory()
+
+        evicted = []
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is not None and now - entry[1] <= self.idle_seconds:
+                evicted.append(client)
+                client = entry[0]
+            elif entry is not None:
+                evicted.append(entry[0])
+            self._clients[key] = (client, now)
+            self._clients.move_to_end(key)
+            evicted.extend(self._pop_expired(now))
+            while len(self._clients) > self.max_size:
+                self._retired.append(self._clients.popitem(last=False)[1])
+
+        for stale in evicted:
+            _close_client(stale)
+        return client
+
+    def evict_idle(self) -> int:
+        """关闭空闲超时的客户端（包括已被淘汰的），返回关闭的数量"""
+        with self._lock:
+            expired = self._pop_expired(time.monotonic())
+        for client in expired:
+            _close_client(client)
+        return len(expired)
+
+    def shutdown(self):
+        """关闭全部客户端"""
+        with self._lock:
+            clients = [client for client, _ in self._clients.values()]
+            clients.extend(client for client, _ in self._retired)
+            self._clients.clear()
+            self._retired.clear()
+        for client in clients:
+            _close_client(client)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'size': len(self._clients), 'hits': self._hits, 'misses': self._misses}
+
+    def _pop_expired(self, now: float) -> list:
+        expired = [key for key, (_, last_used) in self._clients.items() if now - last_used > self.idle_seconds]
+        clients = [self._clients.pop(key)[0] for key in expired]
+        retired = []
+        for client, last_used in self._retired:
+            if now - last_used > self.idle_seconds:
+                clients.append(client)
+            else:
+                retired.append((client, last_used))
+        self._retired = retired
+        return clients
+
+
+def _close_client(client: Any):
+    """关闭客户端持有的连接（OpenAI 客户端有 close()，gRPC 客户端通过 transport 关闭）"""
+    close = getattr(client, 'close', None) or getattr(getattr(client, 'transport', None), 'close', None)
+    if close is None:
+        return
+    try:
+        close()
+    except Exception as e:
+        logger.warning(f"Failed to close client: {e}")
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def configure_client_registry(**settings) -> ClientRegistry:
+    """按给定参数重建共享注册表（通常在应用启动时根据配置调用一次）"""
+    global _registry
+    with _registry_lock:
+        previous = _registry
+        _registry = ClientRegistry(**settings)
+    if previous is not None:
+        previous.shutdown()
+    return _registry
+
+
+def get_client_registry() -> ClientRegistry:
+    """获取当前进程共享的 ClientRegistry（未配置时使用默认参数）"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ClientRegistry()
+    return _registry
+
+
+@atexit.register
+def _shutdown_registry():
+    if _registry is not None:
+        _registry.shutdown()
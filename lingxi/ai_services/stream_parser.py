@@ -0,0 +1,95 @@
+import json
+from typing import Any, Dict, List, Optional
+
+
+class IncrementalIssueParser:
+    """
+    增量解析模型的流式输出
+
+    逐字符跟踪JSON的括号与字符串状态，当顶层对象中 "issues"（修改列表格式下为 "edits"）
+    数组里的某个对象完整闭合时立即将其解析出来，无需等待整个响应结束。
+    顶层对象之前的说明文字或 ```json 代码块标记会被跳过。
+    """
+
+    ARRAY_KEYS = ('issues', 'edits')
+
+    def __init__(self):
+        self._text = ''
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._current_key: Optional[str] = None
+        self._issues_depth: Optional[int] = None
+        self._issue_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        追加一段模型输出
+
+        Args:
+            chunk: 新到达的输出片段
+
+        Returns:
+            List[Dict]: 本次新闭合的问题对象（可能为空）
+        """
+        self._text += chunk
+        text = self._text
+        issues = []
+
+        while self._pos < len(text):
+            ch = text[self._pos]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start + 1:self._pos]
+            elif not self._stack and ch != '{':
+                # 顶层对象开始之前的内容全部跳过
+                pass
+            elif ch == '"':
+                self._in_string = True
+                self._string_start = self._pos
+            elif ch == ':':
+                if len(self._stack) == 1:
+                    self._current_key = self._last_string
+            elif ch == ',':
+                if len(self._stack) == 1:
+                    self._current_key = None
+            elif ch in '{[':
+                self._stack.append(ch)
+                depth = len(self._stack)
+                if ch == '[' and depth == 2 and self._current_key in self.ARRAY_KEYS:
+                    self._issues_depth = depth
+                elif ch == '{' and self._issues_depth is not None and depth == self._issues_depth + 1:
+                    self._issue_start = self._pos
+            elif ch in '}]':
+                depth = len(self._stack)
+                if ch == '}' and self._issue_start is not None and depth == self._issues_depth + 1:
+                    issue = self._load_issue(text[self._issue_start:self._pos + 1])
+                    if issue is not None:
+                        issues.append(issue)
+                    self._issue_start = None
+                if ch == ']' and depth == self._issues_depth:
+                    self._issues_depth = None
+                if self._stack:
+                    self._stack.pop()
+
+            self._pos += 1
+
+        return issues
+
+    @staticmethod
+    def _load_issue(fragment: str) -> Optional[Dict[str, Any]]:
+        """解析单个问题对象，格式不正确时忽略（以最终完整解析为准）"""
+        try:
+            issue = json.loads(fragment)
+        except json.JSONDecodeError:
+            return None
+        return issue if isinstance(issue, dict) else None
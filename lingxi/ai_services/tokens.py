@@ -0,0 +1,75 @@
+import re
+from typing import Dict, NamedTuple, Optional
+
+# 中日韩文字及全角标点，这些字符通常每个字符约占一个 token
+_CJK_PATTERN = re.compile(
+    '[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\ufe30-\ufe4f\uff00-\uffef\u3000-\u303f]'
+)
+
+# 其他字符（英文、数字、空白等）平均每个 token 约 4 个字符
+CHARS_PER_TOKEN = 4
+CJK_TOKENS_PER_CHAR = 1.0
+
+
+def count_cjk_chars(text: str) -> int:
+    """统计中日韩字符数量"""
+    return len(_CJK_PATTERN.findall(text))
+
+
+def estimate_tokens(text: str, cjk_tokens_per_char: float = CJK_TOKENS_PER_CHAR) -> int:
+    """
+    估算文本的 token 数量
+
+    不依赖具体模型的分词器，按中日韩字符与其他字符分别估算，
+    结果偏保守，用于切分长文档与预估请求规模。
+    分词器对中文不友好的模型（如 cl100k 系列）可传入更大的 cjk_tokens_per_char。
+    """
+    if not text:
+        return 0
+    cjk = count_cjk_chars(text)
+    other = len(text) - cjk
+    return int(cjk * cjk_tokens_per_char + other / CHARS_PER_TOKEN) + 1
+
+
+class ModelLimits(NamedTuple):
+    """模型的上下文窗口与输出上限（单位均为 token）"""
+    context_window: int
+    max_output: int
+    cjk_tokens_per_char: float = CJK_TOKENS_PER_CHAR
+    reasoning_tokens: int = 0  # 推理模型的思考过程计入输出，需额外预留
+
+
+# 按模型ID前缀匹配（取最长前缀）；未列出的模型使用 DEFAULT_MODEL_LIMITS
+MODEL_LIMITS: Dict[str, ModelLimits] = {
+    'gpt-4o': ModelLimits(128000, 16384),
+    'gpt-4-turbo': ModelLimits(128000, 4096, 1.5),
+    'gpt-4': ModelLimits(8192, 4096, 1.5),
+    'gpt-3.5-turbo': ModelLimits(16385, 4096, 1.5),
+    'o3': ModelLimits(200000, 100000, reasoning_tokens=8192),
+    'deepseek': ModelLimits(64000, 8192),
+    'deepseek-r1': ModelLimits(64000, 32768, reasoning_tokens=8192),
+    'gemini-pro': ModelLimits(32760, 8192),
+    'gemini-1.0': ModelLimits(32760, 8192),
+    'gemini-1.5': ModelLimits(1048576, 8192),
+    'gemini-2.5': ModelLimits(1048576, 65536, reasoning_tokens=8192),
+    'palm-2': ModelLimits(8192, 1024),
+    'qwen': ModelLimits(32768, 8192),
+    'qwen-plus': ModelLimits(131072, 8192),
+    'qwen-turbo': ModelLimits(131072, 8192),
+    'qwen2.5': ModelLimits(131072, 8192),
+    'qwen3': ModelLimits(131072, 8192, reasoning_tokens=4096),
+    'glm-3-turbo': ModelLimits(128000, 4096),
+    'glm-4': ModelLimits(128000, 4096),
+    'glm-4-long': ModelLimits(1000000, 4096),
+    'glm-4v': ModelLimits(8192, 1024),
+}
+
+DEFAULT_MODEL_LIMITS = ModelLimits(8192, 4096)
+
+
+def get_model_limits(model: str, overrides: Optional[Dict[str, ModelLimits]] = None) -> ModelLimits:
+    """模型的上下文窗口与输出上限；overrides 按模型ID精确匹配，优先于内置表"""
+    if overrides and model in overrides:
+        return overrides[model]
+    prefix = max((prefix for prefix in MODEL_LIMITS if model.startswith(prefix)), key=len, default=None)
+    return MODEL_LIMITS[prefix] if prefix is not None else DEFAULT_MODEL_LIMITS
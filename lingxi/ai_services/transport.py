@@ -0,0 +1,192 @@
+"""
+HTTP传输层
+
+基于 requests 的AI服务（DeepSeek、通义千问、智谱等）共用同一个传输层：
+按主机复用长连接池，按提供商设置连接/读取超时，对 429/5xx 进行有限次数的
+抖动退避重试，并限制对同一主机同时在途的请求数。
+"""
+
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .ratelimit import report_throttle
+
+logger = logging.getLogger(__name__)
+
+# 需要重试的状态码：限流与网关/服务端临时错误
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+def backoff_delay(attempt: int, base: float, maximum: float, retry_after: Optional[str] = None) -> float:
+    """退避时长：优先遵循 Retry-After，否则取指数退避区间内的随机值（full jitter）"""
+    if retry_after:
+        try:
+            return min(float(retry_after), maximum)
+        except ValueError:
+            pass
+    return random.uniform(0, min(maximum, base * (2 ** attempt)))
+
+
+class HTTPTransport:
+    """带连接池、超时、重试与按主机并发上限的共享HTTP传输"""
+
+    def __init__(self, connect_timeout: float = 5.0, read_timeout: float = 60.0,
+                 read_timeouts: Optional[Dict[str, float]] = None, max_retries: int = 2,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 per_host_limit: int = 16, pool_hosts: int = 32):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.read_timeouts = dict(read_timeouts or {})
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.per_host_limit = per_host_limit
+
+        # 连接池大小与并发上限一致，保证在途请求都能拿到可复用的连接
+        self._adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=per_host_limit)
+        self.session = requests.Session()
+        self.session.mount('https://', self._adapter)
+        self.session.mount('http://', self._adapter)
+
+        self._host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._retries = 0
+
+    def timeout_for(self, provider: str, read_timeout: Optional[float] = None) -> Tuple[float, float]:
+        """
+        提供商的 (连接超时, 读取超时)
+
+        给出 read_timeout（按预计输出长度估算）时取它与配置的读超时中较小的一个。
+        """
+        read = self.read_timeouts.get(provider, self.read_timeout)
+        if read_timeout is not None:
+            read = min(read, read_timeout)
+        return self.connect_timeout, read
+
+    def post_json(self, provider: str, url: str, headers: Dict[str, str],
+                  data: Dict[str, Any], read_timeout: Optional[float] = None) -> Dict[str, Any]:
+        """发送 JSON POST 请求并返回解析后的响应体"""
+        with self._host_slot(url):
+            response = self._send(provider, url, headers, data, stream=False, read_timeout=read_timeout)
+            try:
+                response.raise_for_status()
+                return response.json()
+            finally:
+                response.close()
+
+    @contextmanager
+    def stream(self, provider: str, url: str, headers: Dict[str, str],
+               data: Dict[str, Any], read_timeout: Optional[float] = None) -> Iterator[requests.Response]:
+        """
+        发送流式请求，在上下文中返回响应对象
+
+        重试只发生在收到响应头之前；响应体读取期间始终占用该主机的一个并发名额。
+        """
+        with self._host_slot(url):
+            response = self._send(provider, url, headers, data, stream=True, read_timeout=read_timeout)
+            try:
+                response.raise_for_status()
+                yield response
+            finally:
+                response.close()
+
+    def stats(self) -> Dict[str, int]:
+        """连接与请求计数：新建连接数、复用连接的请求数、重试次数"""
+        new_connections = 0
+        pooled_requests = 0
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            new_connections += pool.num_connections
+            pooled_requests += pool.num_requests
+
+        with self._lock:
+            return {
+                'requests': self._requests,
+                'retries': self._retries,
+                'new_connections': new_connections,
+                'reused_connections': max(pooled_requests - new_connections, 0),
+            }
+
+    def close(self):
+        self.session.close()
+
+    def _send(self, provider: str, url: str, headers: Dict[str, str],
+              data: Dict[str, Any], stream: bool, read_timeout: Optional[float] = None) -> requests.Response:
+        timeout = self.timeout_for(provider, read_timeout)
+        attempt = 0
+        while True:
+            with self._lock:
+                self._requests += 1
+            try:
+                response = self.session.post(url, headers=headers, json=data, timeout=timeout, stream=stream)
+            except requests.ConnectionError as e:
+                # 仅重试连接阶段的失败；读超时不重试，上游已收到请求，重试只会让挂起的时间加倍
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"{provider} request failed ({e}), retrying in {delay:.2f}s")
+            else:
+                if response.status_code == 429:
+                    # 让跨进程限流器收紧该密钥的并发并遵循 Retry-After，而不只是本次请求自己退避
+                    report_throttle(response.headers.get('Retry-After'))
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    return response
+                delay = self._backoff(attempt, response.headers.get('Retry-After'))
+                logger.warning(f"{provider} returned HTTP {response.status_code}, retrying in {delay:.2f}s")
+                response.close()
+
+            with self._lock:
+                self._retries += 1
+            attempt += 1
+            time.sleep(delay)
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        return backoff_delay(attempt, self.backoff_base, self.backoff_max, retry_after)
+
+    @contextmanager
+    def _host_slot(self, url: str):
+        host = urlsplit(url).netloc
+        with self._lock:
+            semaphore = self._host_semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.per_host_limit)
+                self._host_semaphores[host] = semaphore
+        with semaphore:
+            yield
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def configure_transport(**settings) -> HTTPTransport:
+    """按给定参数重建共享传输（通常在应用启动时根据配置调用一次）"""
+    global _transport
+    with _transport_lock:
+        previous = _transport
+        _transport = HTTPTransport(**settings)
+    if previous is not None:
+        previous.close()
+    return _transport
+
+
+def get_transport() -> HTTPTransport:
+    """获取当前进程共享的 HTTPTransport（未配置时使用默认参数）"""
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = HTTPTransport()
+    return _transport
@@ -1,32 +1,99 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, Response, stream_with_context, send_file
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from flask_migrate import Migrate
 import json
 import logging
-from datetime import datetime
+import os
+import tempfile
+import zlib
+from datetime import datetime, timedelta
 
 from .config import Config
-from .models import db, User, APIKey, ProofreadingHistory
-from .ai_services import get_ai_service
+from .models import db, User, APIKey
+from .proofreading import (
+    ProofreadingError, build_service, proofread_for_user, resolve_api_key, result_error_message,
+    stream_proofreading_for_user, validate_target
+)
+from .jobs import JobWorker, get_user_job, submit_job
+from .batch import proofread_batch
+from .documents import SUPPORTED_EXTENSIONS, get_extension, proofread_document, spool_upload
+from .ai_services import (
+    circuit_breaker_states, configure_async_transport, configure_circuit_breakers,
+    configure_client_registry, configure_output_budget, configure_rate_limiter, configure_transport,
+    get_rate_limiter, get_transport
+)
+from .latency import get_latency_tracker
+from .history import (
+    export_csv, export_ndjson, get_user_history, gzip_stream, history_page, iter_export_rows
+)
+from .search import SearchError, search_history
+from .catalog import get_model_catalog
+from .usercache import load_cached_user
 
 app = Flask(__name__)
 app.config.from_object(Config)
 
 # 初始化扩展
 db.init_app(app)
-migrate = Migrate(app, db)
+migrate = Migrate(app, db, render_as_batch=True)  # SQLite 的 ALTER TABLE 需要批量模式
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 login_manager.login_message = '请先登录以访问此页面'
 
+# AI服务共享的HTTP传输层
+configure_transport(
+    connect_timeout=Config.HTTP_CONNECT_TIMEOUT,
+    read_timeout=Config.HTTP_READ_TIMEOUT,
+    read_timeouts=Config.get_http_read_timeouts(),
+    max_retries=Config.HTTP_MAX_RETRIES,
+    per_host_limit=Config.HTTP_PER_HOST_LIMIT
+)
+configure_async_transport(
+    connect_timeout=Config.HTTP_CONNECT_TIMEOUT,
+    read_timeout=Config.HTTP_READ_TIMEOUT,
+    read_timeouts=Config.get_http_read_timeouts(),
+    max_retries=Config.HTTP_MAX_RETRIES,
+    max_connections=Config.ASYNC_MAX_CONNECTIONS,
+    http2=Config.ASYNC_HTTP2
+)
+configure_output_budget(
+    base_tokens=Config.OUTPUT_BASE_TOKENS,
+    min_output_tokens=Config.OUTPUT_MIN_TOKENS,
+    tokens_per_second=Config.OUTPUT_TOKENS_PER_SECOND,
+    timeout_base=Config.OUTPUT_TIMEOUT_BASE,
+    max_continuations=Config.OUTPUT_MAX_CONTINUATIONS,
+    model_limits=Config.get_model_limit_overrides()
+)
+configure_client_registry(max_size=Config.CLIENT_REGISTRY_SIZE, idle_seconds=Config.CLIENT_IDLE_SECONDS)
+configure_circuit_breakers(
+    window_seconds=Config.BREAKER_WINDOW_SECONDS,
+    min_calls=Config.BREAKER_MIN_CALLS,
+    error_rate=Config.BREAKER_ERROR_RATE,
+    slow_call_seconds=Config.BREAKER_SLOW_CALL_SECONDS,
+    slow_call_rate=Config.BREAKER_SLOW_CALL_RATE,
+    open_seconds=Config.BREAKER_OPEN_SECONDS,
+    half_open_calls=Config.BREAKER_HALF_OPEN_CALLS
+)
+configure_rate_limiter(
+    enabled=Config.RATE_LIMIT_ENABLED,
+    path=Config.RATE_LIMIT_DB,
+    rate=Config.RATE_LIMIT_RPS,
+    rates=Config.get_rate_limit_overrides(),
+    burst=Config.RATE_LIMIT_BURST,
+    min_concurrency=Config.RATE_LIMIT_MIN_CONCURRENCY,
+    max_concurrency=Config.RATE_LIMIT_MAX_CONCURRENCY,
+    max_wait=Config.RATE_LIMIT_MAX_WAIT
+)
+
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # 只读的用户视图（含API密钥元数据），按 settings_version 失效，见 usercache.py
+    return load_cached_user(int(user_id))
 
 @app.route('/')
 def index():
@@ -37,7 +104,9 @@ def index():
     # 获取用户可用的AI模型
     available_models = current_user.get_available_models()
     
-    return render_template('index.html', available_models=available_models)
+    return render_template('index.html',
+                         available_models=available_models,
+                         max_text_length=Config.MAX_TEXT_LENGTH)
 
 @app.route('/register', methods=['GET', 'POST'])
 def register():
@@ -137,15 +206,15 @@ def settings():
     return render_template('settings.html', 
                          api_keys=user_api_keys,
                          supported_providers=Config.SUPPORTED_PROVIDERS,
-                         ai_models=Config.AI_MODELS)
+                         ai_models_json=get_model_catalog().snapshot().catalog_json)
 
 @app.route('/api/models/<provider>')
 @login_required
 def api_get_provider_models(provider):
     """获取指定提供商的模型列表"""
     try:
-        models = Config.get_provider_models(provider)
-        return jsonify(models)
+        snapshot = get_model_catalog().snapshot()
+        return _catalog_response(snapshot, snapshot.provider_json(provider))
     except Exception as e:
         logger.error(f"Error getting models for provider {provider}: {e}")
         return jsonify({'error': str(e)}), 500
@@ -155,12 +224,19 @@ def api_get_provider_models(provider):
 def api_get_user_models():
     """获取用户可用的所有模型"""
     try:
-        available_models = current_user.get_available_models()
-        return jsonify({'models': available_models})
+        snapshot = get_model_catalog().snapshot()
+        providers = [api_key.provider for api_key in current_user.api_keys]
+        return _catalog_response(snapshot, snapshot.user_models_json(providers))
     except Exception as e:
         logger.error(f"Error getting user models: {e}")
         return jsonify({'error': str(e)}), 500
 
+def _catalog_response(snapshot, body: bytes):
+    """返回预先序列化的目录 JSON，以目录版本号作 ETag"""
+    response = Response(body, mimetype='application/json')
+    response.set_etag(f'catalog-{snapshot.version}-{zlib.crc32(body):08x}')
+    return response.make_conditional(request)
+
 @app.route('/api/models/add', methods=['POST'])
 @login_required
 def api_add_custom_model():
@@ -180,7 +256,7 @@ def api_add_custom_model():
             return jsonify({'error': '不支持的提供商'}), 400
         
         # 添加自定义模型
-        success = Config.add_custom_model(provider, model_id, model_name, description)
+        success = get_model_catalog().add_model(provider, model_id, model_name, description)
         
         if success:
             return jsonify({'message': '自定义模型添加成功'})
@@ -206,7 +282,7 @@ def api_update_model():
             return jsonify({'error': '缺少必需参数'}), 400
         
         # 更新模型信息
-        success = Config.update_model_info(provider, model_id, model_name, description)
+        success = get_model_catalog().update_model(provider, model_id, model_name, description)
         
         if success:
             return jsonify({'message': '模型信息更新成功'})
@@ -230,7 +306,7 @@ def api_remove_model():
             return jsonify({'error': '缺少必需参数'}), 400
         
         # 删除模型
-        success = Config.remove_model(provider, model_id)
+        success = get_model_catalog().remove_model(provider, model_id)
         
         if success:
             return jsonify({'message': '模型删除成功'})
@@ -288,88 +364,322 @@ def delete_api_key(key_id):
 @app.route('/api/proofread', methods=['POST'])
 @login_required
 def api_proofread():
-    """执行文本校对的API接口"""
+    """执行文本校对的API接口
+
+    请求体中设置 "async": true 时仅创建异步任务并立即返回任务ID，
+    由 Worker 进程执行校对，通过 /api/proofread/jobs/<job_id> 查询结果。
+    设置 "hedge": true 时启用对冲请求，响应中的 provider/model 为实际给出结果的模型。
+    """
     try:
         data = request.get_json()
         text = data.get('text', '').strip()
         provider = data.get('provider', '')
         model = data.get('model', '')
         
-        if not text:
-            return jsonify({'error': '请输入要校对的文本'}), 400
-        
-        if not provider:
-            return jsonify({'error': '请选择AI提供商'}), 400
-        
-        if not model:
-            return jsonify({'error': '请选择AI模型'}), 400
-        
-        # 查找用户的API密钥
-        api_key_record = APIKey.query.filter_by(
-            user_id=current_user.id,
-            provider=provider
-        ).first()
-        
-        if not api_key_record:
-            return jsonify({'error': f'未找到 {provider} 的API密钥'}), 400
-        
-        # 检查模型是否可用
-        available_models = api_key_record.get_available_models()
-        model_ids = [m['id'] for m in available_models]
+        if data.get('async'):
+            return _submit_proofreading_job(text, provider, model)
         
-        if model not in model_ids:
-            return jsonify({'error': f'模型 {model} 不可用'}), 400
+        result, _ = proofread_for_user(current_user.id, text, provider, model,
+                                       hedge=bool(data.get('hedge')))
         
-        # 解密API密钥
-        api_key = api_key_record.get_api_key(app.config['ENCRYPTION_KEY'])
+        served_provider, served_model = result.served_by
+        if result.is_error:
+            # 所有可用的上游都失败时不再把原文当作校对结果返回
+            return jsonify({
+                'error': f'校对失败: {result_error_message(result)}',
+                'provider': served_provider,
+                'model': served_model
+            }), 502
         
-        # 获取AI服务并执行校对
-        ai_service = get_ai_service(provider, api_key, api_key_record.base_url, model)
-        result = ai_service.proofread(text)
+        response = jsonify({
+            'corrected_text': result.corrected_text,
+            'issues': result.issues,
+            'provider': served_provider,
+            'model': served_model,
+            'hedged': result.hedged
+        })
+        response.headers['X-Cache'] = 'HIT' if result.from_cache else 'MISS'
+        response.headers['X-Reused-Paragraphs'] = str(result.reused_paragraphs)
+        return response
         
-        # 保存校对历史
+    except ProofreadingError as e:
+        return jsonify({'error': e.message}), e.status_code
+    except Exception as e:
+        logger.error(f"Proofreading error: {e}")
+        return jsonify({'error': f'校对失败: {str(e)}'}), 500
+
+@app.route('/api/proofread/stream', methods=['POST'])
+@login_required
+def api_proofread_stream():
+    """流式校对接口（Server-Sent Events）
+
+    每发现一个完整的问题即推送 issue 事件，结束时推送包含修正全文的 done 事件；
+    校对失败时以 error 事件结束。
+    """
+    try:
+        data = request.get_json()
+        events, from_cache = stream_proofreading_for_user(
+            current_user.id,
+            data.get('text', '').strip(),
+            data.get('provider', ''),
+            data.get('model', '')
+        )
+    except ProofreadingError as e:
+        return jsonify({'error': e.message}), e.status_code
+    except Exception as e:
+        logger.error(f"Streaming proofreading error: {e}")
+        return jsonify({'error': f'校对失败: {str(e)}'}), 500
+    
+    def generate():
         try:
-            history = ProofreadingHistory(
-                user_id=current_user.id,
-                original_text=text,
-                corrected_text=result.corrected_text,
-                issues_found=json.dumps(result.issues, ensure_ascii=False),
-                provider_used=provider,
-                model_used=model
-            )
-            db.session.add(history)
-            db.session.commit()
+            for event, payload in events:
+                if event == 'issue':
+                    yield _format_sse('issue', payload)
+                elif payload.is_error:
+                    # 所有可用的上游都失败时不推送 done，避免客户端把原文当作校对结果
+                    yield _format_sse('error', {'error': f'校对失败: {result_error_message(payload)}'})
+                else:
+                    yield _format_sse('done', {
+                        'corrected_text': payload.corrected_text,
+                        'issues': payload.issues
+                    })
         except Exception as e:
-            logger.error(f"Failed to save proofreading history: {e}")
-        
+            logger.error(f"Streaming proofreading error: {e}")
+            yield _format_sse('error', {'error': f'校对失败: {str(e)}'})
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Cache': 'HIT' if from_cache else 'MISS',
+        'X-Accel-Buffering': 'no'  # 禁用 Nginx 缓冲，保证事件即时送达
+    })
+
+def _format_sse(event: str, data: dict) -> str:
+    """格式化一条 Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route('/api/proofread/jobs', methods=['POST'])
+@login_required
+def api_submit_proofreading_job():
+    """提交异步校对任务"""
+    try:
+        data = request.get_json()
+        return _submit_proofreading_job(
+            data.get('text', '').strip(),
+            data.get('provider', ''),
+            data.get('model', '')
+        )
+    except ProofreadingError as e:
+        return jsonify({'error': e.message}), e.status_code
+    except Exception as e:
+        logger.error(f"Proofreading job submission error: {e}")
+        return jsonify({'error': f'提交校对任务失败: {str(e)}'}), 500
+
+def _submit_proofreading_job(text: str, provider: str, model: str):
+    """创建异步任务并返回 202 响应"""
+    job = submit_job(current_user.id, text, provider, model)
+    response = job.to_dict()
+    response['status_url'] = url_for('api_get_proofreading_job', job_id=job.id)
+    response['result_url'] = url_for('api_get_proofreading_job_result', job_id=job.id)
+    return jsonify(response), 202
+
+@app.route('/api/proofread/jobs/<job_id>')
+@login_required
+def api_get_proofreading_job(job_id):
+    """查询异步校对任务状态"""
+    job = get_user_job(current_user.id, job_id)
+    if not job:
+        return jsonify({'error': '任务不存在'}), 404
+    
+    return jsonify(job.to_dict())
+
+@app.route('/api/proofread/jobs/<job_id>/result')
+@login_required
+def api_get_proofreading_job_result(job_id):
+    """获取异步校对任务结果，任务未完成时返回 202"""
+    job = get_user_job(current_user.id, job_id)
+    if not job:
+        return jsonify({'error': '任务不存在'}), 404
+    
+    if job.status == job.STATUS_FAILED:
+        return jsonify({'error': f'校对失败: {job.error}', 'status': job.status}), 500
+    
+    if job.status != job.STATUS_SUCCEEDED:
+        return jsonify(job.to_dict()), 202
+    
+    return jsonify({
+        'corrected_text': job.corrected_text,
+        'issues': job.get_issues()
+    })
+
+@app.route('/api/proofread/batch', methods=['POST'])
+@login_required
+def api_proofread_batch():
+    """批量校对接口
+
+    请求体：{"texts": [...], "provider": ..., "model": ..., "pack": false}
+    按输入顺序返回每条文本的结果或错误；pack 为 true 时把短文本合并到同一请求中校对。
+    """
+    try:
+        data = request.get_json()
+        items = proofread_batch(
+            current_user.id,
+            data.get('texts'),
+            data.get('provider', ''),
+            data.get('model', ''),
+            pack=bool(data.get('pack'))
+        )
+        failed = sum(1 for item in items if 'error' in item)
         return jsonify({
-            'corrected_text': result.corrected_text,
-            'issues': result.issues
+            'results': items,
+            'succeeded': len(items) - failed,
+            'failed': failed
         })
         
+    except ProofreadingError as e:
+        return jsonify({'error': e.message}), e.status_code
     except Exception as e:
-        logger.error(f"Proofreading error: {e}")
-        return jsonify({'error': f'校对失败: {str(e)}'}), 500
+        logger.error(f"Batch proofreading error: {e}")
+        return jsonify({'error': f'批量校对失败: {str(e)}'}), 500
+
+@app.route('/api/proofread/upload', methods=['POST'])
+@login_required
+def api_proofread_upload():
+    """上传 .txt/.md/.docx 文件进行校对，返回同格式的修正文件
+
+    表单字段：file、provider、model。统计信息通过 X-Issues-Found、X-Failed-Paragraphs 响应头返回。
+    """
+    try:
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            raise ProofreadingError('请选择要上传的文件')
+        
+        provider = request.form.get('provider', '')
+        model = request.form.get('model', '')
+        extension = get_extension(upload.filename)
+        validate_target(provider, model)
+        ai_service = build_service(resolve_api_key(current_user.id, provider, model), model)
+        
+        spool_size = app.config['UPLOAD_SPOOL_MAX_MEMORY']
+        with spool_upload(upload.stream, spool_size) as source:
+            output = tempfile.SpooledTemporaryFile(max_size=spool_size)
+            report = proofread_document(ai_service, provider, extension, source, output)
+        output.seek(0)
+        
+        stem = os.path.splitext(os.path.basename(upload.filename))[0] or 'document'
+        response = send_file(
+            output,
+            mimetype=SUPPORTED_EXTENSIONS[extension],
+            as_attachment=True,
+            download_name=f'{stem}_校对{extension}'
+        )
+        response.headers['X-Issues-Found'] = str(report.issues_found)
+        response.headers['X-Failed-Paragraphs'] = str(report.failed_paragraphs)
+        return response
+        
+    except ProofreadingError as e:
+        return jsonify({'error': e.message}), e.status_code
+    except Exception as e:
+        logger.error(f"Document proofreading error: {e}")
+        return jsonify({'error': f'文档校对失败: {str(e)}'}), 500
+
+@app.route('/api/status/upstreams')
+@login_required
+def api_upstream_status():
+    """上游状态：熔断器、各模型延迟、传输层计数与跨进程限流状态"""
+    limiter = get_rate_limiter()
+    return jsonify({
+        'breakers': circuit_breaker_states(),
+        'rate_limits': limiter.snapshot() if limiter is not None else {},
+        'latency': get_latency_tracker().snapshot(),
+        'transport': get_transport().stats()
+    })
 
 @app.route('/history')
 @login_required
 def history():
-    """校对历史页面"""
-    page = request.args.get('page', 1, type=int)
-    per_page = Config.ITEMS_PER_PAGE
+    """校对历史页面（带 q 参数时为全文检索结果）"""
+    cursor = request.args.get('cursor')
+    query = request.args.get('q', '').strip()
+    if query:
+        try:
+            items, next_cursor = search_history(current_user.id, query, cursor, Config.ITEMS_PER_PAGE)
+        except SearchError as e:
+            flash(str(e))
+            items, next_cursor = [], None
+    else:
+        items, next_cursor = history_page(current_user.id, cursor, Config.ITEMS_PER_PAGE)
+    return render_template('history.html', histories=items, next_cursor=next_cursor, query=query,
+                           is_first_page=not cursor, total=User.get_history_count(current_user.id))
+
+@app.route('/api/history/search')
+@login_required
+def api_history_search():
+    """全文检索校对历史，返回带高亮片段的结果与下一页游标"""
+    query = request.args.get('q', '').strip()
+    try:
+        items, next_cursor = search_history(current_user.id, query, request.args.get('cursor'),
+                                            Config.ITEMS_PER_PAGE)
+    except SearchError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'results': [{
+            'id': history.id,
+            'created_at': history.created_at.isoformat() if history.created_at else None,
+            'provider': history.provider_used,
+            'model': history.model_used,
+            'issue_count': history.issue_count,
+            'snippet': str(history.snippet or '')
+        } for history in items],
+        'next_cursor': next_cursor
+    })
+
+@app.route('/history/export')
+@login_required
+def export_history():
+    """
+    流式导出校对历史（含全文）
     
-    histories = ProofreadingHistory.query.filter_by(user_id=current_user.id)\
-                                        .order_by(ProofreadingHistory.created_at.desc())\
-                                        .paginate(page=page, per_page=per_page, error_out=False)
+    参数：format=ndjson|csv，gzip=1 压缩，start/end 为日期（YYYY-MM-DD，含首尾两天），provider/model 过滤。
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'error': '不支持的导出格式'}), 400
+    try:
+        start = _parse_export_date(request.args.get('start'))
+        end = _parse_export_date(request.args.get('end'))
+    except ValueError:
+        return jsonify({'error': '日期格式应为 YYYY-MM-DD'}), 400
+    if end is not None:
+        end += timedelta(days=1)
     
-    # 解析issues_found JSON
-    for history in histories.items:
-        try:
-            history.issues = json.loads(history.issues_found) if history.issues_found else []
-        except:
-            history.issues = []
+    rows = iter_export_rows(current_user.id, start, end,
+                            request.args.get('provider') or None, request.args.get('model') or None)
+    chunks = export_ndjson(rows) if export_format == 'ndjson' else export_csv(rows)
+    mimetype = 'application/x-ndjson' if export_format == 'ndjson' else 'text/csv'
+    filename = f"lingxi_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    if request.args.get('gzip') in ('1', 'true'):
+        chunks = gzip_stream(chunks)
+        mimetype = 'application/gzip'
+        filename += '.gz'
     
-    return render_template('history.html', histories=histories)
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # 禁用 Nginx 缓冲，边查询边下载
+    })
+
+def _parse_export_date(value):
+    """解析 YYYY-MM-DD，空值返回 None"""
+    return datetime.strptime(value, '%Y-%m-%d') if value else None
+
+@app.route('/api/history/<int:history_id>')
+@login_required
+def api_history_detail(history_id):
+    """单条校对历史的全文与问题列表（历史页展开时加载）"""
+    history = get_user_history(current_user.id, history_id)
+    if history is None:
+        return jsonify({'error': '记录不存在'}), 404
+    return jsonify(history.to_dict())
 
 # 错误处理
 @app.errorhandler(404)
@@ -385,5 +695,9 @@ def internal_error(error):
 with app.app_context():
     db.create_all()
 
+# 开发环境下可以在 Web 进程内运行任务 Worker，生产环境请使用独立的 worker.py
+if Config.JOB_EMBEDDED_WORKER:
+    JobWorker(app).start()
+
 if __name__ == '__main__':
     app.run(debug=True) 
\ No newline at end of file
@@ -0,0 +1,66 @@
+"""
+灵犀校对平台 - 异步校对模块
+
+基于 BaseAIService.aproofread() 的并发校对：所有片段的上游调用都作为协程在同一个事件循环中发出，
+一个 worker 可以同时保持数百个在途请求，而不必为每个请求占用一个线程。
+在途数受 ASYNC_MAX_IN_FLIGHT 与跨进程限流器约束。
+"""
+
+import asyncio
+import time
+from typing import List, Optional
+
+from flask import current_app
+
+from .ai_services import BaseAIService, ProofreadingResult
+from .chunking import get_chunk_budget, merge_chunk_results
+from .concurrency import run_coroutine
+from .latency import LatencyTracker, get_latency_tracker
+from .segmenter import chunk_text
+
+
+def async_enabled() -> bool:
+    """是否启用异步调用路径"""
+    return current_app.config.get('ASYNC_UPSTREAM_ENABLED', False)
+
+
+async def aproofread_texts(service: BaseAIService, provider: str, texts: List[str], max_tokens: int,
+                           max_in_flight: int, tracker: Optional[LatencyTracker] = None) -> List[ProofreadingResult]:
+    """
+    并发校对多条文本
+
+    每条文本按 max_tokens 切分，全部片段一起发出（最多 max_in_flight 个同时在途），
+    再按条目合并。不依赖 Flask 应用上下文，可在任意事件循环中执行。
+
+    Returns:
+        list: 与输入顺序一致的结果，问题带有 offset
+    """
+    chunked = [chunk_text(text, max_tokens) for text in texts]
+    semaphore = asyncio.Semaphore(max_in_flight)
+    model = service.get_model()
+
+    async def run(chunk):
+        async with semaphore:
+            started = time.monotonic()
+            result = await service.aproofread(chunk.text)
+            if tracker is not None and not result.is_error:
+                tracker.record(provider, model, time.monotonic() - started)
+            return result
+
+    results = await asyncio.gather(*(run(chunk) for chunks in chunked for chunk in chunks))
+
+    merged = []
+    pos = 0
+    for text, chunks in zip(texts, chunked):
+        merged.append(merge_chunk_results(text, chunks, results[pos:pos + len(chunks)]))
+        pos += len(chunks)
+    return merged
+
+
+def proofread_texts_async(service: BaseAIService, provider: str, texts: List[str],
+                          max_tokens: int = None) -> List[ProofreadingResult]:
+    """同步入口：按当前应用配置在共享的后台事件循环中执行 aproofread_texts 并等待结果"""
+    return run_coroutine(aproofread_texts(
+        service, provider, texts, max_tokens or get_chunk_budget(),
+        current_app.config['ASYNC_MAX_IN_FLIGHT'], get_latency_tracker()
+    ))
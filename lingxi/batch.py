@@ -0,0 +1,191 @@
+"""
+灵犀校对平台 - 批量校对模块
+
+一次请求校对多条短文本（标题、说明文字、商品简介等）。各条文本共用同一个
+AI服务实例，在共享线程池中并发校对（受每个提供商的并发上限约束），
+结果按输入顺序返回，单条失败不影响其他条目；校对历史一次性批量写入。
+可选地把多条短文本打包进同一个提示词，以减少请求次数。
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+from flask import current_app
+
+from .ai_services import BaseAIService, ProofreadingResult
+from .ai_services.tokens import estimate_tokens
+from .async_proofreading import async_enabled, proofread_texts_async
+from .chunking import get_chunk_budget, locate_issues, merge_chunk_results, proofread_chunk
+from .concurrency import get_provider_executor
+from .proofreading import (
+    ProofreadingError, build_service, lookup_cached_result, resolve_api_key,
+    result_error_message, save_histories, store_cached_result, validate_target, validate_text
+)
+from .segmenter import chunk_text
+
+logger = logging.getLogger(__name__)
+
+
+def proofread_batch(user_id: int, texts: List[Any], provider: str, model: str,
+                    pack: bool = False) -> List[Dict[str, Any]]:
+    """
+    批量校对
+
+    Args:
+        user_id: 用户ID
+        texts: 待校对文本列表
+        provider: AI提供商
+        model: 模型ID
+        pack: 是否把多条短文本打包进同一个请求
+
+    Returns:
+        list: 与输入顺序一致的条目结果，成功时包含 corrected_text/issues/cached，
+        失败时包含 error
+
+    Raises:
+        ProofreadingError: 整体参数错误（列表为空、条数超限、密钥或模型不可用）
+    """
+    validate_target(provider, model)
+    if not isinstance(texts, list) or not texts:
+        raise ProofreadingError('请提供要校对的文本列表')
+
+    max_items = current_app.config['BATCH_MAX_ITEMS']
+    if len(texts) > max_items:
+        raise ProofreadingError(f'单次最多校对 {max_items} 条文本（当前 {len(texts)} 条）', 413)
+
+    api_key_record = resolve_api_key(user_id, provider, model)
+
+    count = len(texts)
+    cleaned: List[str] = [''] * count
+    results: List[Optional[ProofreadingResult]] = [None] * count
+    errors: List[Optional[str]] = [None] * count
+    cache_keys = [None] * count
+    pending = []
+    for index, text in enumerate(texts):
+        if not isinstance(text, str):
+            errors[index] = '文本必须是字符串'
+            continue
+        cleaned[index] = text.strip()
+        try:
+            validate_text(cleaned[index])
+        except ProofreadingError as e:
+            errors[index] = e.message
+            continue
+        cache_keys[index], results[index] = lookup_cached_result(cleaned[index], provider, model)
+        if results[index] is None:
+            pending.append(index)
+
+    if pending:
+        ai_service = build_service(api_key_record, model)
+        if pack:
+            pending = _run_packed(ai_service, provider, cleaned, pending, results)
+        _run_individually(ai_service, provider, cleaned, pending, results)
+
+    succeeded = []
+    for index, result in enumerate(results):
+        if result is None or errors[index]:
+            continue
+        if result.is_error:
+            errors[index] = result_error_message(result)
+            continue
+        if not result.from_cache:
+            store_cached_result(cache_keys[index], cleaned[index], result)
+        succeeded.append((cleaned[index], result))
+
+    save_histories(user_id, succeeded, provider, model)
+    return [_item_payload(index, results[index], errors[index]) for index in range(count)]
+
+
+def _run_individually(service: BaseAIService, provider: str, texts: List[str],
+                      indices: List[int], results: List[Optional[ProofreadingResult]]):
+    """
+    逐条并发校对
+
+    超出预算的条目按片段展开后一并提交，避免在线程池任务内部再次提交任务。
+    启用异步调用路径时全部片段在共享事件循环中并发执行。
+    """
+    if async_enabled():
+        for index, result in zip(indices, proofread_texts_async(service, provider, [texts[i] for i in indices])):
+            results[index] = result
+        return
+
+    executor = get_provider_executor()
+    budget = get_chunk_budget()
+    submitted = []
+    for index in indices:
+        chunks = chunk_text(texts[index], budget)
+        futures = [executor.submit(provider, proofread_chunk, service, chunk) for chunk in chunks]
+        submitted.append((index, chunks, futures))
+
+    for index, chunks, futures in submitted:
+        results[index] = merge_chunk_results(texts[index], chunks, [f.result() for f in futures])
+
+
+def _run_packed(service: BaseAIService, provider: str, texts: List[str],
+                indices: List[int], results: List[Optional[ProofreadingResult]]) -> List[int]:
+    """
+    把短文本打包校对
+
+    Returns:
+        list: 未能通过打包请求得到结果、需要逐条校对的条目
+    """
+    config = current_app.config
+    item_limit = config['BATCH_PACK_ITEM_TOKENS']
+    groups = _pack_groups(
+        [i for i in indices if estimate_tokens(texts[i]) <= item_limit],
+        texts, get_chunk_budget(), config['BATCH_PACK_MAX_ITEMS']
+    )
+    packed = {index for group in groups for index in group}
+    leftover = [i for i in indices if i not in packed]
+
+    executor = get_provider_executor()
+    submitted = [
+        (group, executor.submit(provider, _proofread_pack, service, [texts[i] for i in group]))
+        for group in groups
+    ]
+    for group, future in submitted:
+        for index, result in zip(group, future.result()):
+            if result is None:
+                leftover.append(index)
+            else:
+                result.issues = locate_issues(texts[index], result.issues)
+                results[index] = result
+
+    return sorted(leftover)
+
+
+def _pack_groups(indices: List[int], texts: List[str], budget: int, max_items: int) -> List[List[int]]:
+    """按 token 预算与条数上限贪心分组；只有一条的分组不打包"""
+    groups = []
+    current: List[int] = []
+    current_tokens = 0
+    for index in indices:
+        tokens = estimate_tokens(texts[index])
+        if current and (current_tokens + tokens > budget or len(current) >= max_items):
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return [group for group in groups if len(group) > 1]
+
+
+def _proofread_pack(service: BaseAIService, texts: List[str]) -> List[Optional[ProofreadingResult]]:
+    """执行一次打包请求，失败时全部条目退回逐条校对"""
+    try:
+        return service.proofread_many(texts)
+    except Exception as e:
+        logger.warning(f"Packed proofreading request failed, falling back to single items: {e}")
+        return [None] * len(texts)
+
+
+def _item_payload(index: int, result: Optional[ProofreadingResult], error: Optional[str]) -> Dict[str, Any]:
+    if error or result is None:
+        return {'index': index, 'error': error or '校对失败'}
+    return {
+        'index': index,
+        'corrected_text': result.corrected_text,
+        'issues': result.issues,
+        'cached': result.from_cache
+    }
@@ -0,0 +1,289 @@
+"""
+灵犀校对平台 - 校对结果缓存模块
+
+按 (去掉首尾空白的文本, 提供商, 模型, 提示词版本) 的摘要对校对结果做内容寻址缓存：
+进程内 LRU 作为一级缓存，SQLite 文件作为跨进程、跨重启共享的二级缓存。
+缓存中的结果针对去掉首尾空白的文本，命中时补回本次提交的首尾空白并平移问题偏移。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from flask import current_app
+
+from .ai_services import ProofreadingResult
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(text: str, provider: str, model: str, prompt_version: str) -> str:
+    """
+    生成缓存键
+
+    只忽略首尾空白：行内的换行符、行尾空白与 Unicode 组合形式都会改变修正文本与问题的字符偏移，
+    不同的文本各自缓存。
+    """
+    digest = hashlib.sha256()
+    for part in (prompt_version, provider, model, text.strip()):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _shift_issues(issues: List[Dict[str, Any]], delta: int) -> List[Dict[str, Any]]:
+    shifted = []
+    for issue in issues:
+        issue = dict(issue)
+        if isinstance(issue.get('offset'), int):
+            offset = issue['offset'] + delta
+            issue['offset'] = offset if offset >= 0 else None
+        shifted.append(issue)
+    return shifted
+
+
+def to_cached_result(text: str, result: ProofreadingResult) -> ProofreadingResult:
+    """把针对 text 的校对结果换算为针对 text.strip() 的结果（写入缓存前调用）"""
+    leading = len(text) - len(text.lstrip())
+    return ProofreadingResult(result.corrected_text.strip(), _shift_issues(result.issues, -leading),
+                              is_error=result.is_error)
+
+
+def rebase_cached_result(text: str, result: ProofreadingResult) -> ProofreadingResult:
+    """把缓存中针对 text.strip() 的结果换算到提交的 text 上：补回首尾空白，问题偏移加上开头空白的长度"""
+    core = text.strip()
+    start = len(text) - len(text.lstrip())
+    rebased = ProofreadingResult(text[:start] + result.corrected_text + text[start + len(core):],
+                                 _shift_issues(result.issues, start))
+    rebased.from_cache = result.from_cache
+    return rebased
+
+
+def _serialize(result: ProofreadingResult) -> str:
+    return json.dumps({
+        'corrected_text': result.corrected_text,
+        'issues': result.issues
+    }, ensure_ascii=False)
+
+
+def _deserialize(value: str) -> ProofreadingResult:
+    data = json.loads(value)
+    result = ProofreadingResult(data['corrected_text'], data['issues'])
+    result.from_cache = True
+    return result
+
+
+class MemoryLRUCache:
+    """线程安全的进程内 LRU 缓存，条目带过期时间"""
+
+    def __init__(self, max_items: int, ttl_seconds: int):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, expires_at: float = None):
+        with self._lock:
+            self._items[key] = (value, expires_at or time.time() + self.ttl_seconds)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class DiskCache:
+    """
+    基于 SQLite 的持久化缓存
+
+    多个 gunicorn worker 共享同一个数据库文件（WAL 模式），
+    条目按过期时间淘汰，总大小超过上限时按最近访问时间淘汰最旧的条目。
+    """
+
+    # 每写入多少次检查一次总大小
+    EVICTION_CHECK_INTERVAL = 100
+    # 访问时间的最小刷新间隔，避免每次命中都写库
+    TOUCH_INTERVAL = 60
+
+    def __init__(self, db_path: str, max_bytes: int, ttl_seconds: int):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_cache_entries_accessed_at ON cache_entries (accessed_at)')
+        conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        """每个线程使用独立连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[tuple]:
+        """返回 (value, expires_at)，不存在或已过期时返回 None"""
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT value, expires_at, accessed_at FROM cache_entries WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        value, expires_at, accessed_at = row
+        now = time.time()
+        if expires_at < now:
+            conn.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+            conn.commit()
+            return None
+
+        if now - accessed_at > self.TOUCH_INTERVAL:
+            conn.execute('UPDATE cache_entries SET accessed_at = ? WHERE key = ?', (now, key))
+            conn.commit()
+        return value, expires_at
+
+    def set(self, key: str, value: str) -> float:
+        """写入缓存，返回过期时间"""
+        conn = self._connect()
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        conn.execute(
+            'INSERT OR REPLACE INTO cache_entries (key, value, size, expires_at, accessed_at) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (key, value, len(value.encode('utf-8')), expires_at, now)
+        )
+        conn.commit()
+
+        with self._lock:
+            self._writes += 1
+            check = self._writes % self.EVICTION_CHECK_INTERVAL == 0
+        if check:
+            self.evict()
+        return expires_at
+
+    def evict(self) -> int:
+        """删除过期条目，并在超出大小上限时淘汰最久未访问的条目（淘汰到上限的90%）"""
+        conn = self._connect()
+        removed = conn.execute('DELETE FROM cache_entries WHERE expires_at < ?', (time.time(),)).rowcount
+
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM cache_entries').fetchone()[0]
+        if total > self.max_bytes:
+            target = total - int(self.max_bytes * 0.9)
+            freed = 0
+            keys = []
+            for key, size in conn.execute('SELECT key, size FROM cache_entries ORDER BY accessed_at'):
+                keys.append((key,))
+                freed += size
+                if freed >= target:
+                    break
+            conn.executemany('DELETE FROM cache_entries WHERE key = ?', keys)
+            removed += len(keys)
+
+        conn.commit()
+        return removed
+
+
+class ProofreadingCache:
+    """两级校对结果缓存"""
+
+    def __init__(self, memory_items: int, ttl_seconds: int, db_path: str, disk_max_bytes: int):
+        self.memory = MemoryLRUCache(memory_items, ttl_seconds)
+        self.disk = DiskCache(db_path, disk_max_bytes, ttl_seconds)
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+    def get(self, key: str) -> Optional[ProofreadingResult]:
+        """查询缓存，未命中返回 None；磁盘层异常按未命中处理"""
+        value = self.memory.get(key)
+        if value is not None:
+            self.stats['memory_hits'] += 1
+            return _deserialize(value)
+
+        try:
+            entry = self.disk.get(key)
+        except sqlite3.Error as e:
+            logger.warning(f"Proofreading cache read failed: {e}")
+            entry = None
+
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+
+        value, expires_at = entry
+        self.memory.set(key, value, expires_at)
+        self.stats['disk_hits'] += 1
+        return _deserialize(value)
+
+    def set(self, key: str, result: ProofreadingResult):
+        """写入缓存（AI调用失败的结果不缓存）"""
+        if result.is_error:
+            return
+
+        value = _serialize(result)
+        try:
+            expires_at = self.disk.set(key, value)
+        except sqlite3.Error as e:
+            logger.warning(f"Proofreading cache write failed: {e}")
+            expires_at = None
+        self.memory.set(key, value, expires_at)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> Optional[ProofreadingCache]:
+    """获取当前进程的缓存实例，缓存被禁用时返回 None"""
+    global _cache
+    config = current_app.config
+    if not config.get('CACHE_ENABLED'):
+        return None
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ProofreadingCache(
+                    memory_items=config['CACHE_MEMORY_ITEMS'],
+                    ttl_seconds=config['CACHE_TTL_SECONDS'],
+                    db_path=config['CACHE_DB_PATH'],
+                    disk_max_bytes=config['CACHE_DISK_MAX_BYTES']
+                )
+    return _cache
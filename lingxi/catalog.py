@@ -0,0 +1,245 @@
+"""
+灵犀校对平台 - 模型目录模块
+
+各提供商的可用模型保存在 ai_model 表中，首次建表时写入 Config.AI_MODELS 作为初始目录。
+每个进程持有一份只读快照（CatalogSnapshot），按 (提供商, 模型ID) 建索引，
+接口需要的 JSON 在加载时一次序列化好，请求中直接返回。
+
+model_catalog_version 表只有一行版本号，每次修改目录时在同一事务中加一（也使并发修改串行化）。
+各进程每隔 MODEL_CATALOG_CHECK_SECONDS 秒读一次版本号，发现变化后重新加载并整体替换快照，
+因此在任一 Worker 中修改目录，其他 Worker 最多延迟一个检查周期即可看到。
+"""
+
+import json
+import logging
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from flask import current_app
+from jinja2.utils import htmlsafe_json_dumps
+from markupsafe import Markup
+from sqlalchemy import event, func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from .config import Config
+from .models import db, AIModel, ModelCatalogVersion
+
+logger = logging.getLogger(__name__)
+
+_EMPTY_PROVIDER = MappingProxyType({'models': (), 'default_model': ''})
+
+
+def _freeze(value):
+    """把 dict / list 递归转换为只读的 MappingProxyType / tuple"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class CatalogSnapshot:
+    """某一版本模型目录的只读快照"""
+
+    def __init__(self, version: int, rows: Iterable[Tuple[str, str, str, str]]):
+        """
+        Args:
+            rows: (提供商, 模型ID, 名称, 描述)，按显示顺序排列
+        """
+        self.version = version
+        catalog: Dict[str, dict] = {provider: {'models': [], 'default_model': ''}
+                                    for provider in Config.SUPPORTED_PROVIDERS}
+        for provider, model_id, name, description in rows:
+            catalog.setdefault(provider, {'models': [], 'default_model': ''})['models'].append(
+                {'id': model_id, 'name': name, 'description': description}
+            )
+        for provider, entry in catalog.items():
+            ids = [model['id'] for model in entry['models']]
+            default = Config.AI_MODELS.get(provider, {}).get('default_model', '')
+            entry['default_model'] = default if default in ids else (ids[0] if ids else '')
+
+        user_entries = {}
+        for provider, entry in catalog.items():
+            provider_name = Config.get_provider_name(provider)
+            user_entries[provider] = [{
+                'provider': provider,
+                'provider_name': provider_name,
+                'model_id': model['id'],
+                'model_name': model['name'],
+                'description': model['description'],
+                'full_name': f"{provider_name} - {model['name']}"
+            } for model in entry['models']]
+
+        self._provider_json = {provider: json.dumps(entry, ensure_ascii=False).encode('utf-8')
+                               for provider, entry in catalog.items()}
+        self._user_json = {provider: ','.join(json.dumps(item, ensure_ascii=False) for item in items)
+                           for provider, items in user_entries.items()}
+        # 设置页内嵌到 <script> 中的完整目录
+        self.catalog_json: Markup = htmlsafe_json_dumps(catalog)
+
+        self._providers: Mapping[str, Mapping] = _freeze(catalog)
+        self._user_entries: Mapping[str, tuple] = _freeze(user_entries)
+        self._index: Dict[Tuple[str, str], Mapping] = {
+            (provider, model['id']): model
+            for provider, entry in self._providers.items() for model in entry['models']
+        }
+
+    @property
+    def providers(self) -> Mapping[str, Mapping]:
+        """提供商 -> {'models': (...), 'default_model': ...}"""
+        return self._providers
+
+    def provider_models(self, provider: str) -> Mapping:
+        """指定提供商的模型列表与默认模型；未知提供商返回空列表"""
+        return self._providers.get(provider, _EMPTY_PROVIDER)
+
+    def get_model(self, provider: str, model_id: str) -> Optional[Mapping]:
+        """按 (提供商, 模型ID) 查找模型，不存在时返回 None"""
+        return self._index.get((provider, model_id))
+
+    def user_entries(self, provider: str) -> tuple:
+        """用户可用模型列表中该提供商的条目（含提供商显示名称）"""
+        return self._user_entries.get(provider, ())
+
+    def provider_json(self, provider: str) -> bytes:
+        """provider_models() 的 JSON"""
+        return self._provider_json.get(provider) or b'{"models": [], "default_model": ""}'
+
+    def user_models_json(self, providers: Iterable[str]) -> bytes:
+        """由若干提供商的条目拼成 {"models": [...]}"""
+        parts = [self._user_json[provider] for provider in providers if self._user_json.get(provider)]
+        return ('{"models": [' + ','.join(parts) + ']}').encode('utf-8')
+
+
+class ModelCatalog:
+    """当前进程的模型目录：持有快照，按版本号检查并重新加载，修改时递增版本号"""
+
+    def __init__(self, check_seconds: float = 2.0):
+        self.check_seconds = check_seconds
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> CatalogSnapshot:
+        """
+        当前快照
+
+        距上次检查不足 check_seconds 时直接返回；否则读取版本号（单行主键查询），
+        版本变化时重新加载。需要应用上下文。
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < self.check_seconds:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is not None and time.monotonic() - self._checked_at < self.check_seconds:
+                return self._snapshot  # 其他线程刚刚检查过
+            version = _read_version()
+            if self._snapshot is None or self._snapshot.version != version:
+                self._snapshot = _load_snapshot()
+                logger.info(f"Model catalog loaded: version {self._snapshot.version}")
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+    def invalidate(self):
+        """下次读取时重新检查版本号"""
+        self._checked_at = 0.0
+
+    def add_model(self, provider: str, model_id: str, model_name: str, description: str = '') -> bool:
+        """添加模型；提供商不受支持或模型已存在时返回 False"""
+        if provider not in Config.SUPPORTED_PROVIDERS:
+            return False
+        position = db.session.query(func.max(AIModel.position)).filter(AIModel.provider == provider).scalar()
+        db.session.add(AIModel(
+            provider=provider,
+            model_id=model_id,
+            name=model_name,
+            description=description or f'自定义{model_name}模型',
+            position=(position or 0) + 1
+        ))
+        try:
+            db.session.flush()
+        except IntegrityError:
+            db.session.rollback()
+            return False
+        return self._commit_change()
+
+    def update_model(self, provider: str, model_id: str, model_name: str = None,
+                     description: str = None) -> bool:
+        """更新模型名称或描述；模型不存在时返回 False"""
+        model = AIModel.query.filter_by(provider=provider, model_id=model_id).first()
+        if model is None:
+            return False
+        if model_name:
+            model.name = model_name
+        if description:
+            model.description = description
+        return self._commit_change()
+
+    def remove_model(self, provider: str, model_id: str) -> bool:
+        """删除模型；模型不存在时返回 False"""
+        deleted = AIModel.query.filter_by(provider=provider, model_id=model_id).delete()
+        if not deleted:
+            db.session.rollback()
+            return False
+        return self._commit_change()
+
+    def _commit_change(self) -> bool:
+        # 版本号与目录修改在同一事务中提交；更新这一行会加锁，并发修改依次进行
+        table = ModelCatalogVersion.__table__
+        db.session.execute(update(table).where(table.c.id == 1).values(version=table.c.version + 1))
+        db.session.commit()
+        self.invalidate()
+        return True
+
+
+def _read_version() -> int:
+    table = ModelCatalogVersion.__table__
+    return db.session.execute(select(table.c.version).where(table.c.id == 1)).scalar() or 0
+
+
+def _load_snapshot() -> CatalogSnapshot:
+    # 先读版本号再读目录：读取期间若有修改，下次检查时版本号不同，会再加载一次
+    version = _read_version()
+    table = AIModel.__table__
+    rows = db.session.execute(
+        select(table.c.provider, table.c.model_id, table.c.name, table.c.description)
+        .order_by(table.c.provider, table.c.position, table.c.id)
+    ).all()
+    return CatalogSnapshot(version, rows)
+
+
+def initial_catalog_rows() -> List[dict]:
+    """Config.AI_MODELS 中的初始目录（建表与迁移时写入）"""
+    return [{
+        'provider': provider,
+        'model_id': model['id'],
+        'name': model['name'],
+        'description': model['description'],
+        'position': position
+    } for provider, entry in Config.AI_MODELS.items() for position, model in enumerate(entry['models'])]
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _seed_catalog(target, connection, **kw):
+    """新建的数据库写入初始目录"""
+    versions = ModelCatalogVersion.__table__
+    if connection.execute(select(versions.c.id)).first() is None:
+        connection.execute(AIModel.__table__.insert(), initial_catalog_rows())
+        connection.execute(versions.insert().values(id=1, version=1))
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_model_catalog() -> ModelCatalog:
+    """获取当前进程共享的 ModelCatalog"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = ModelCatalog(current_app.config['MODEL_CATALOG_CHECK_SECONDS'])
+    return _catalog
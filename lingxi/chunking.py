@@ -0,0 +1,147 @@
+"""
+灵犀校对平台 - 长文档分片校对模块
+
+超出单次请求预算的文档先按段落/句子切分，再以受限并发同时校对各片段，
+最后按原顺序拼接修正文本，并把每个问题的位置换算为原文中的字符偏移。
+"""
+
+from concurrent.futures import as_completed
+from typing import Any, Dict, Iterator, List, Tuple
+
+from flask import current_app
+
+from .ai_services import BaseAIService, ProofreadingResult
+from .ai_services.tokens import estimate_tokens
+from .concurrency import get_provider_executor
+from .latency import timed_proofread
+from .segmenter import Chunk, chunk_text
+
+
+def get_chunk_budget() -> int:
+    """单个片段的 token 预算"""
+    return current_app.config['CHUNK_MAX_TOKENS']
+
+
+def needs_chunking(text: str, max_tokens: int = None) -> bool:
+    """文本是否超出单次请求预算"""
+    return estimate_tokens(text) > (max_tokens or get_chunk_budget())
+
+
+def locate_issues(text: str, issues: List[Dict[str, Any]], base_offset: int = 0) -> List[Dict[str, Any]]:
+    """
+    为问题补充 offset 字段（问题原文在整篇文档中的字符偏移）
+
+    问题已带有与原文吻合的 offset（如修改列表格式由服务端定位的问题）时直接采用；
+    否则问题通常按出现顺序排列，优先从上一个问题之后开始查找；
+    找不到原文片段的问题 offset 为 None。
+    """
+    located = []
+    cursor = 0
+    for issue in issues:
+        issue = dict(issue)
+        original = issue.get('original') or ''
+        offset = issue.get('offset')
+        index = -1
+        if original and isinstance(offset, int) and offset >= 0 and text.startswith(original, offset):
+            index = offset
+        elif original:
+            index = text.find(original, cursor)
+            if index == -1:
+                index = text.find(original)
+        if index == -1:
+            issue['offset'] = None
+        else:
+            issue['offset'] = base_offset + index
+            cursor = index + len(original)
+        located.append(issue)
+    return located
+
+
+def merge_chunk_results(text: str, chunks: List[Chunk], results: List[ProofreadingResult]) -> ProofreadingResult:
+    """
+    合并各片段的校对结果
+
+    片段之间的原文空白原样保留；校对失败的片段保留原文，其错误信息计入问题列表，
+    且合并结果标记为 is_error（不会被缓存）。
+    """
+    parts = []
+    issues = []
+    is_error = False
+    pos = 0
+    for chunk, result in zip(chunks, results):
+        parts.append(text[pos:chunk.start])
+        if result.is_error:
+            parts.append(chunk.text)
+            is_error = True
+        else:
+            parts.append(result.corrected_text)
+        issues.extend(locate_issues(chunk.text, result.issues, chunk.start))
+        pos = chunk.end
+    parts.append(text[pos:])
+
+    return ProofreadingResult(''.join(parts), issues, is_error=is_error)
+
+
+def proofread_chunk(service: BaseAIService, chunk: Chunk) -> ProofreadingResult:
+    """校对单个片段，异常转换为错误结果"""
+    try:
+        return timed_proofread(service, chunk.text)
+    except Exception as e:
+        return service._create_error_result(chunk.text, "API错误", str(e))
+
+
+def proofread_chunked(service: BaseAIService, provider: str, text: str,
+                      max_tokens: int = None) -> ProofreadingResult:
+    """分片并发校对整篇文档"""
+    if current_app.config.get('ASYNC_UPSTREAM_ENABLED'):
+        # 函数内导入：async_proofreading 依赖本模块
+        from .async_proofreading import proofread_texts_async
+        return proofread_texts_async(service, provider, [text], max_tokens)[0]
+
+    chunks = chunk_text(text, max_tokens or get_chunk_budget())
+    futures = get_provider_executor().map(provider, lambda c: proofread_chunk(service, c), chunks)
+    return merge_chunk_results(text, chunks, [f.result() for f in futures])
+
+
+def iter_chunked(service: BaseAIService, provider: str, text: str,
+                 max_tokens: int = None) -> Iterator[Tuple[str, Any]]:
+    """
+    分片并发校对，按片段完成顺序逐个产出 ('issue', dict)，
+    全部完成后产出 ('result', ProofreadingResult)
+    """
+    chunks = chunk_text(text, max_tokens or get_chunk_budget())
+    futures = get_provider_executor().map(provider, lambda c: proofread_chunk(service, c), chunks)
+    index_of = {future: i for i, future in enumerate(futures)}
+
+    for future in as_completed(futures):
+        chunk = chunks[index_of[future]]
+        for issue in locate_issues(chunk.text, future.result().issues, chunk.start):
+            yield 'issue', issue
+
+    yield 'result', merge_chunk_results(text, chunks, [f.result() for f in futures])
+
+
+def run_proofreading(ai_service: BaseAIService, provider: str, text: str) -> ProofreadingResult:
+    """
+    执行校对：短文本单次请求，超出预算的长文本分片并发校对
+
+    返回结果中的每个问题都带有 offset 字段（在原文中的字符偏移）。
+    """
+    if needs_chunking(text):
+        return proofread_chunked(ai_service, provider, text)
+
+    result = timed_proofread(ai_service, text)
+    result.issues = locate_issues(text, result.issues)
+    return result
+
+
+def run_proofreading_stream(ai_service: BaseAIService, provider: str, text: str):
+    """run_proofreading 的流式版本，产出 ('issue', dict) 与最终的 ('result', ProofreadingResult)"""
+    if needs_chunking(text):
+        yield from iter_chunked(ai_service, provider, text)
+        return
+
+    for event, payload in ai_service.proofread_stream(text):
+        if event == 'result':
+            payload.issues = locate_issues(text, payload.issues)
+        yield event, payload
@@ -0,0 +1,101 @@
+"""
+灵犀校对平台 - 并发调度模块
+
+所有需要并发调用AI服务的功能（长文档分片、批量校对等）共用同一个线程池，
+并按提供商限制同时在途的请求数，避免单个请求把上游打满。
+启用异步调用路径时，协程在进程共享的后台事件循环中执行。
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Coroutine, Dict, Iterable, List, Optional
+
+from flask import current_app, has_app_context
+
+
+class ProviderExecutor:
+    """带按提供商并发上限的共享线程池"""
+
+    def __init__(self, max_workers: int, per_provider_limit: int):
+        self.per_provider_limit = per_provider_limit
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='proofread-fanout')
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, provider: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            semaphore = self._semaphores.get(provider)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.per_provider_limit)
+                self._semaphores[provider] = semaphore
+            return semaphore
+
+    def submit(self, provider: str, func: Callable, *args, **kwargs) -> Future:
+        """
+        提交任务；任务在线程中先等待该提供商的并发名额再执行
+
+        若在 Flask 应用上下文中提交，任务会在同一应用的上下文中执行。
+        """
+        semaphore = self._semaphore(provider)
+        app = current_app._get_current_object() if has_app_context() else None
+
+        def run():
+            with semaphore:
+                if app is None:
+                    return func(*args, **kwargs)
+                with app.app_context():
+                    return func(*args, **kwargs)
+
+        return self._executor.submit(run)
+
+    def map(self, provider: str, func: Callable, items: Iterable) -> List[Future]:
+        """对每个元素提交一个任务，按输入顺序返回 Future 列表"""
+        return [self.submit(provider, func, item) for item in items]
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_provider_executor() -> ProviderExecutor:
+    """获取当前进程共享的 ProviderExecutor"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                config = current_app.config
+                _executor = ProviderExecutor(
+                    max_workers=config['FANOUT_MAX_WORKERS'],
+                    per_provider_limit=config['FANOUT_PER_PROVIDER']
+                )
+    return _executor
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """获取当前进程共享的后台事件循环（在守护线程中常驻运行）"""
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='proofread-asyncio', daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def run_coroutine(coro: Coroutine, timeout: Optional[float] = None):
+    """
+    在共享的后台事件循环中执行协程，阻塞等待并返回结果
+
+    同步代码（Flask 请求、任务 Worker）借此使用异步调用路径；所有调用共用同一个事件循环，
+    因而也共用同一个异步连接池。
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result(timeout)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,6 +15,9 @@ class Config:
     
     # 用于加密API密钥的密钥
     ENCRYPTION_KEY = os.environ.get('ENCRYPTION_KEY') or 'default-encryption-key-change-in-production'
+    # 密钥轮换期间仍可用于解密的旧密钥（逗号分隔），执行 manage.py rotate-keys 后即可移除
+    ENCRYPTION_KEY_PREVIOUS = tuple(k for k in os.environ.get('ENCRYPTION_KEY_PREVIOUS', '').split(',') if k)
+    API_KEY_CACHE_TTL = int(os.environ.get('API_KEY_CACHE_TTL', 300))  # 已解密API密钥的内存缓存时长（秒）
     
     # AI服务配置
     SUPPORTED_PROVIDERS = {
@@ -25,7 +29,7 @@ class Config:
         'custom_openai': 'Custom OpenAI'
     }
     
-    # AI模型配置 - 每个提供商的可用模型（根据最新模型列表更新）
+    # AI模型的初始目录 - 建表时写入 ai_model 表，之后以数据库中的目录为准（见 catalog.py）
     AI_MODELS = {
         'openai': {
             'models': [
@@ -93,9 +97,108 @@ class Config:
     
     # 应用配置
     MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB
-    MAX_TEXT_LENGTH = int(os.environ.get('MAX_TEXT_LENGTH', 10000))  # 10000 字符
+    MAX_TEXT_LENGTH = int(os.environ.get('MAX_TEXT_LENGTH', 100000))  # 100000 字符，超长文档自动分片校对
+    UPLOAD_SPOOL_MAX_MEMORY = int(os.environ.get('UPLOAD_SPOOL_MAX_MEMORY', 1024 * 1024))  # 上传文件超过该大小后落盘并以 mmap 读取
     ITEMS_PER_PAGE = int(os.environ.get('ITEMS_PER_PAGE', 10))
     
+    # 异步校对任务配置
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))  # 每个 Worker 进程的执行线程数
+    JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1.0))  # 秒
+    JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', 300))  # 运行超时后重新入队
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+    JOB_EMBEDDED_WORKER = os.environ.get('JOB_EMBEDDED_WORKER', 'false').lower() == 'true'
+    
+    # 长文档分片与并发配置
+    CHUNK_MAX_TOKENS = int(os.environ.get('CHUNK_MAX_TOKENS', 800))  # 单个片段的输入 token 预算
+    FANOUT_MAX_WORKERS = int(os.environ.get('FANOUT_MAX_WORKERS', 32))  # 共享线程池大小
+    FANOUT_PER_PROVIDER = int(os.environ.get('FANOUT_PER_PROVIDER', 16))  # 每个提供商的并发上限
+    
+    # AI服务HTTP传输配置（连接池、超时与重试）
+    HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 5))  # 秒
+    HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 60))  # 秒
+    HTTP_READ_TIMEOUTS = os.environ.get('HTTP_READ_TIMEOUTS', '')  # 按提供商覆盖读超时，如 "zhipu=90,qwen=45"
+    HTTP_MAX_RETRIES = int(os.environ.get('HTTP_MAX_RETRIES', 2))  # 429/5xx 的最大重试次数
+    HTTP_PER_HOST_LIMIT = int(os.environ.get('HTTP_PER_HOST_LIMIT', 16))  # 每个主机的并发请求上限
+    
+    # 输出预算：max_tokens 按输入长度估算并受模型上下文窗口约束，读超时按 max_tokens 估算（不超过上面的读超时）
+    OUTPUT_BASE_TOKENS = int(os.environ.get('OUTPUT_BASE_TOKENS', 256))  # 与输入长度无关的输出部分
+    OUTPUT_MIN_TOKENS = int(os.environ.get('OUTPUT_MIN_TOKENS', 256))  # 上下文窗口放不下输入加该数量的输出时直接拒绝
+    OUTPUT_TOKENS_PER_SECOND = float(os.environ.get('OUTPUT_TOKENS_PER_SECOND', 25))  # 估算读超时的生成速度
+    OUTPUT_TIMEOUT_BASE = float(os.environ.get('OUTPUT_TIMEOUT_BASE', 10))  # 读超时中与输出长度无关的部分（秒）
+    OUTPUT_MAX_CONTINUATIONS = int(os.environ.get('OUTPUT_MAX_CONTINUATIONS', 2))  # 输出被截断后最多续写的次数
+    MODEL_LIMITS = os.environ.get('MODEL_LIMITS', '')  # 覆盖模型的上下文窗口与输出上限，如 "my-model=32768:4096"
+    
+    # 跨进程上游限流：按 (提供商, 密钥) 的令牌桶与 AIMD 并发上限，状态存于本机 SQLite 文件
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_DB = os.environ.get('RATE_LIMIT_DB') or os.path.join(tempfile.gettempdir(), 'lingxi_ratelimit.sqlite3')
+    RATE_LIMIT_RPS = float(os.environ.get('RATE_LIMIT_RPS', 5))  # 每把密钥每秒请求数
+    RATE_LIMIT_RPS_OVERRIDES = os.environ.get('RATE_LIMIT_RPS_OVERRIDES', '')  # 按提供商覆盖，如 "zhipu=2,qwen=3"
+    RATE_LIMIT_BURST = float(os.environ.get('RATE_LIMIT_BURST', 10))  # 令牌桶容量
+    RATE_LIMIT_MIN_CONCURRENCY = int(os.environ.get('RATE_LIMIT_MIN_CONCURRENCY', 1))
+    RATE_LIMIT_MAX_CONCURRENCY = int(os.environ.get('RATE_LIMIT_MAX_CONCURRENCY', 32))
+    RATE_LIMIT_MAX_WAIT = float(os.environ.get('RATE_LIMIT_MAX_WAIT', 30))  # 排队超过该时长则放弃（秒）
+    
+    # 异步调用路径：批量与长文档分片的上游请求作为协程在共享事件循环中发出
+    ASYNC_UPSTREAM_ENABLED = os.environ.get('ASYNC_UPSTREAM_ENABLED', 'false').lower() == 'true'
+    ASYNC_MAX_IN_FLIGHT = int(os.environ.get('ASYNC_MAX_IN_FLIGHT', 256))  # 单次批量/文档同时在途的请求数
+    ASYNC_MAX_CONNECTIONS = int(os.environ.get('ASYNC_MAX_CONNECTIONS', 256))  # 异步连接池大小
+    ASYNC_HTTP2 = os.environ.get('ASYNC_HTTP2', 'true').lower() == 'true'  # 需要安装 h2
+    
+    # SDK 客户端注册表：按密钥复用 OpenAI/Gemini 等客户端
+    CLIENT_REGISTRY_SIZE = int(os.environ.get('CLIENT_REGISTRY_SIZE', 128))
+    CLIENT_IDLE_SECONDS = int(os.environ.get('CLIENT_IDLE_SECONDS', 900))  # 空闲超过该时长的客户端被关闭
+    
+    # 批量校对配置（并发受 FANOUT_PER_PROVIDER 约束）
+    BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', 500))  # 单次请求的最大条数
+    BATCH_PACK_ITEM_TOKENS = int(os.environ.get('BATCH_PACK_ITEM_TOKENS', 200))  # 可打包的单条文本 token 上限
+    BATCH_PACK_MAX_ITEMS = int(os.environ.get('BATCH_PACK_MAX_ITEMS', 20))  # 每个打包请求的最大条数
+    
+    # 对冲请求配置：主模型超过其滚动分位耗时未返回时并发请求另一个模型
+    HEDGE_ENABLED = os.environ.get('HEDGE_ENABLED', 'true').lower() == 'true'
+    HEDGE_PERCENTILE = float(os.environ.get('HEDGE_PERCENTILE', 0.95))
+    HEDGE_MIN_SAMPLES = int(os.environ.get('HEDGE_MIN_SAMPLES', 20))  # 样本不足时使用默认等待时长
+    HEDGE_DEFAULT_DELAY = float(os.environ.get('HEDGE_DEFAULT_DELAY', 10.0))  # 秒
+    LATENCY_WINDOW = int(os.environ.get('LATENCY_WINDOW', 200))  # 每个模型保留的最近耗时样本数
+    
+    # 模型响应格式：full 复述完整修正文本；edits 只返回修改列表，由服务端重建修正文本，输出 token 更少
+    RESPONSE_FORMAT = os.environ.get('RESPONSE_FORMAT', 'full')
+    
+    # 熔断与故障转移配置
+    BREAKER_WINDOW_SECONDS = float(os.environ.get('BREAKER_WINDOW_SECONDS', 60))  # 统计窗口
+    BREAKER_MIN_CALLS = int(os.environ.get('BREAKER_MIN_CALLS', 10))  # 窗口内调用数达到该值才判断是否熔断
+    BREAKER_ERROR_RATE = float(os.environ.get('BREAKER_ERROR_RATE', 0.5))
+    BREAKER_SLOW_CALL_SECONDS = float(os.environ.get('BREAKER_SLOW_CALL_SECONDS', 30))
+    BREAKER_SLOW_CALL_RATE = float(os.environ.get('BREAKER_SLOW_CALL_RATE', 0.8))
+    BREAKER_OPEN_SECONDS = float(os.environ.get('BREAKER_OPEN_SECONDS', 30))  # 熔断后多久进入半开探测
+    BREAKER_HALF_OPEN_CALLS = int(os.environ.get('BREAKER_HALF_OPEN_CALLS', 1))
+    FAILOVER_ENABLED = os.environ.get('FAILOVER_ENABLED', 'true').lower() == 'true'
+    FAILOVER_ORDER = tuple(p.strip() for p in os.environ.get(
+        'FAILOVER_ORDER', 'deepseek,qwen,zhipu,openai,gemini,custom_openai'
+    ).split(',') if p.strip())
+    
+    # 增量校对：再次提交修订稿时复用未改动段落的校对结果
+    INCREMENTAL_ENABLED = os.environ.get('INCREMENTAL_ENABLED', 'true').lower() == 'true'
+    
+    # 校对结果缓存配置（进程内 LRU + SQLite 磁盘缓存）
+    CACHE_ENABLED = os.environ.get('CACHE_ENABLED', 'true').lower() == 'true'
+    CACHE_MEMORY_ITEMS = int(os.environ.get('CACHE_MEMORY_ITEMS', 512))
+    CACHE_TTL_SECONDS = int(os.environ.get('CACHE_TTL_SECONDS', 7 * 24 * 3600))  # 7天
+    CACHE_DB_PATH = os.environ.get('CACHE_DB_PATH', 'cache/proofreading_cache.db')
+    CACHE_DISK_MAX_BYTES = int(os.environ.get('CACHE_DISK_MAX_BYTES', 256 * 1024 * 1024))  # 256MB
+    
+    # 校对历史存储：原文按内容去重，修正文本存为差量，大文本压缩（zlib；安装 zstandard 后可用 zstd）
+    HISTORY_COMPRESSION = os.environ.get('HISTORY_COMPRESSION', 'zlib')
+    # 校对历史保留策略：超出的记录由 manage.py archive-history 搬入归档表（0 表示不限制）
+    HISTORY_RETENTION_DAYS = int(os.environ.get('HISTORY_RETENTION_DAYS', 0))  # 在线表保留的天数
+    HISTORY_HOT_ROWS_PER_USER = int(os.environ.get('HISTORY_HOT_ROWS_PER_USER', 0))  # 每个用户在线表保留的最近条数
+
+    # 用户视图缓存：每个进程缓存的用户数，以及检查 user.settings_version 的间隔（秒）
+    USER_CACHE_MAX_ITEMS = int(os.environ.get('USER_CACHE_MAX_ITEMS', 4096))
+    USER_CACHE_CHECK_SECONDS = float(os.environ.get('USER_CACHE_CHECK_SECONDS', 5))
+    
+    # 模型目录：各进程每隔该秒数检查一次目录版本号，其他 Worker 的修改在此延迟内生效
+    MODEL_CATALOG_CHECK_SECONDS = float(os.environ.get('MODEL_CATALOG_CHECK_SECONDS', 2))
+    
     # 日志配置
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
     LOG_FILE = os.environ.get('LOG_FILE', 'logs/app.log')
@@ -106,76 +209,40 @@ class Config:
     SESSION_COOKIE_SAMESITE = 'Lax'
     
     @classmethod
-    def get_provider_name(cls, provider_key: str) -> str:
-        """获取提供商显示名称"""
-        return cls.SUPPORTED_PROVIDERS.get(provider_key, provider_key)
-    
-    @classmethod
-    def get_provider_models(cls, provider_key: str) -> dict:
-        """获取指定提供商的模型列表"""
-        return cls.AI_MODELS.get(provider_key, {'models': [], 'default_model': ''})
-    
-    @classmethod
-    def get_all_models(cls) -> dict:
-        """获取所有提供商的模型配置"""
-        return cls.AI_MODELS
-    
-    @classmethod
-    def get_model_info(cls, provider_key: str, model_id: str) -> dict:
-        """获取特定模型的信息"""
-        provider_models = cls.get_provider_models(provider_key)
-        for model in provider_models.get('models', []):
-            if model['id'] == model_id:
-                return model
-        return {}
+    def get_http_read_timeouts(cls):
+        """解析按提供商覆盖的读超时配置"""
+        timeouts = {}
+        for item in cls.HTTP_READ_TIMEOUTS.split(','):
+            provider, _, seconds = item.partition('=')
+            if provider.strip() and seconds.strip():
+                timeouts[provider.strip()] = float(seconds)
+        return timeouts
     
     @classmethod
-    def add_custom_model(cls, provider_key: str, model_id: str, model_name: str, description: str = '') -> bool:
-        """动态添加自定义模型"""
-        if provider_key not in cls.AI_MODELS:
-            return False
-        
-        # 检查模型是否已存在
-        existing_models = [m['id'] for m in cls.AI_MODELS[provider_key]['models']]
-        if model_id in existing_models:
-            return False
-        
-        # 添加新模型
-        new_model = {
-            'id': model_id,
-            'name': model_name,
-            'description': description or f'自定义{model_name}模型'
-        }
-        cls.AI_MODELS[provider_key]['models'].append(new_model)
-        return True
+    def get_model_limit_overrides(cls):
+        """解析模型的 (上下文窗口, 输出上限) 覆盖配置"""
+        limits = {}
+        for item in cls.MODEL_LIMITS.split(','):
+            model, _, value = item.partition('=')
+            context_window, _, max_output = value.partition(':')
+            if model.strip() and context_window.strip() and max_output.strip():
+                limits[model.strip()] = (int(context_window), int(max_output))
+        return limits
     
     @classmethod
-    def update_model_info(cls, provider_key: str, model_id: str, model_name: str = None, description: str = None) -> bool:
-        """更新模型信息"""
-        if provider_key not in cls.AI_MODELS:
-            return False
-        
-        for model in cls.AI_MODELS[provider_key]['models']:
-            if model['id'] == model_id:
-                if model_name:
-                    model['name'] = model_name
-                if description:
-                    model['description'] = description
-                return True
-        return False
+    def get_rate_limit_overrides(cls):
+        """解析按提供商覆盖的限流速率配置"""
+        rates = {}
+        for item in cls.RATE_LIMIT_RPS_OVERRIDES.split(','):
+            provider, _, rate = item.partition('=')
+            if provider.strip() and rate.strip():
+                rates[provider.strip()] = float(rate)
+        return rates
     
     @classmethod
-    def remove_model(cls, provider_key: str, model_id: str) -> bool:
-        """删除模型"""
-        if provider_key not in cls.AI_MODELS:
-            return False
-        
-        models = cls.AI_MODELS[provider_key]['models']
-        for i, model in enumerate(models):
-            if model['id'] == model_id:
-                models.pop(i)
-                return True
-        return False
+    def get_provider_name(cls, provider_key: str) -> str:
+        """获取提供商显示名称"""
+        return cls.SUPPORTED_PROVIDERS.get(provider_key, provider_key)
     
     @classmethod
     def is_production(cls) -> bool:
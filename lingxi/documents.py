@@ -0,0 +1,350 @@
+"""
+灵犀校对平台 - 文档上传校对模块
+
+上传的 .txt/.md/.docx 文件先写入 SpooledTemporaryFile（小文件留在内存，大文件落盘），
+再逐段提取文本、按窗口分批送入分片并发校对流程，并把修正结果逐段写成同格式的
+输出文件。任一时刻内存中只保留一个窗口的段落，峰值内存与文件大小无关。
+"""
+
+import codecs
+import json
+import logging
+import mmap
+import os
+import re
+import shutil
+import tempfile
+import xml.sax
+import zipfile
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import XMLGenerator
+
+from flask import current_app
+
+from .ai_services import BaseAIService, ProofreadingResult
+from .ai_services.tokens import estimate_tokens
+from .chunking import get_chunk_budget, merge_chunk_results, proofread_chunk
+from .concurrency import get_provider_executor
+from .proofreading import ProofreadingError
+from .segmenter import chunk_text
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = {
+    '.txt': 'text/plain',
+    '.md': 'text/markdown',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+}
+
+COPY_BUFFER_SIZE = 64 * 1024
+
+# 段落分隔：至少一个空行（兼容 \r\n）
+_PARAGRAPH_BREAK = re.compile(rb'\r?\n[ \t]*\r?\n(?:[ \t]*\r?\n)*')
+_UTF8_BOM = codecs.BOM_UTF8
+
+# docx 正文所在的成员及其中的元素名
+DOCX_DOCUMENT = 'word/document.xml'
+_W_PARAGRAPH = 'w:p'
+_W_TEXT = 'w:t'
+
+
+class DocumentReport:
+    """一次文档校对的统计信息"""
+
+    def __init__(self):
+        self.paragraphs = 0
+        self.issues_found = 0
+        self.failed_paragraphs = 0
+
+    def add(self, result: ProofreadingResult):
+        self.paragraphs += 1
+        if result.is_error:
+            self.failed_paragraphs += 1
+        else:
+            self.issues_found += len(result.issues)
+
+
+def get_extension(filename: str) -> str:
+    """校验并返回上传文件的扩展名"""
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension not in SUPPORTED_EXTENSIONS:
+        supported = '、'.join(SUPPORTED_EXTENSIONS)
+        raise ProofreadingError(f'不支持的文件类型，仅支持 {supported}')
+    return extension
+
+
+def spool_upload(stream, max_memory: int) -> tempfile.SpooledTemporaryFile:
+    """把上传流分块复制到 SpooledTemporaryFile，超过 max_memory 字节后自动落盘"""
+    spooled = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    shutil.copyfileobj(stream, spooled, COPY_BUFFER_SIZE)
+    spooled.seek(0)
+    return spooled
+
+
+def proofread_paragraphs(service: BaseAIService, provider: str, items: Iterable[Any],
+                         get_text: Callable[[Any], Optional[str]]) -> Iterator[Tuple[Any, ProofreadingResult]]:
+    """
+    按窗口分批校对段落流，按输入顺序产出 (item, ProofreadingResult)
+
+    每个窗口约为一轮并发所能处理的 token 量；get_text 返回 None 的条目原样跳过。
+    """
+    budget = get_chunk_budget()
+    window_tokens = budget * current_app.config['FANOUT_PER_PROVIDER']
+    window: List[Tuple[Any, str]] = []
+    tokens = 0
+    for item in items:
+        text = get_text(item)
+        window.append((item, text))
+        tokens += estimate_tokens(text) if text else 0
+        if tokens >= window_tokens:
+            yield from _run_window(service, provider, window, budget)
+            window, tokens = [], 0
+    yield from _run_window(service, provider, window, budget)
+
+
+def _run_window(service: BaseAIService, provider: str, window: List[Tuple[Any, Optional[str]]], budget: int):
+    executor = get_provider_executor()
+    submitted = []
+    for item, text in window:
+        chunks = chunk_text(text, budget) if text else []
+        futures = [executor.submit(provider, proofread_chunk, service, chunk) for chunk in chunks]
+        submitted.append((item, text, chunks, futures))
+
+    for item, text, chunks, futures in submitted:
+        if text is None:
+            yield item, None
+            continue
+        yield item, merge_chunk_results(text, chunks, [f.result() for f in futures])
+
+
+def proofread_document(service: BaseAIService, provider: str, extension: str,
+                       source: tempfile.SpooledTemporaryFile, output) -> DocumentReport:
+    """校对上传的文档，并把同格式的修正文件写入 output"""
+    if extension == '.docx':
+        return _proofread_docx(service, provider, source, output)
+    return _proofread_text(service, provider, source, output, markdown=(extension == '.md'))
+
+
+# ---------------------------------------------------------------------------
+# 纯文本 / Markdown
+# ---------------------------------------------------------------------------
+
+def _proofread_text(service: BaseAIService, provider: str, source, output, markdown: bool) -> DocumentReport:
+    report = DocumentReport()
+    with _open_buffer(source) as buffer:
+        encoding, start = _detect_encoding(buffer)
+        output.write(buffer[:start])
+
+        segments = iter_text_segments(buffer, encoding, start, markdown)
+        for (text, separator, skip), result in proofread_paragraphs(
+                service, provider, segments, lambda segment: None if segment[2] else segment[0]):
+            if result is None:
+                output.write(text.encode(encoding))
+            else:
+                report.add(result)
+                output.write((text if result.is_error else result.corrected_text).encode(encoding))
+            output.write(separator)
+    return report
+
+
+def iter_text_segments(buffer, encoding: str, start: int = 0,
+                       markdown: bool = False) -> Iterator[Tuple[str, bytes, bool]]:
+    """
+    按空行切分段落，产出 (段落文本, 之后的原始分隔字节, 是否跳过校对)
+
+    buffer 可以是 bytes 或 mmap，正则直接在其上查找，每次只解码一个段落。
+    Markdown 中位于代码块（```）内的段落不做校对。
+    """
+    in_fence = False
+    pos = start
+    length = len(buffer)
+    while pos < length:
+        match = _PARAGRAPH_BREAK.search(buffer, pos)
+        end, next_pos = (match.start(), match.end()) if match else (length, length)
+        text = buffer[pos:end].decode(encoding, errors='replace')
+        separator = buffer[end:next_pos]
+
+        skip = False
+        if markdown:
+            fences = sum(1 for line in text.splitlines() if line.lstrip().startswith('```'))
+            skip = in_fence or fences > 0
+            in_fence = in_fence != (fences % 2 == 1)
+        yield text, separator, skip
+        pos = next_pos
+
+
+class _open_buffer:
+    """以 bytes 或只读 mmap 的形式打开临时文件：已落盘的大文件使用内存映射"""
+
+    def __init__(self, source: tempfile.SpooledTemporaryFile):
+        self.source = source
+        self.mapped = None
+
+    def __enter__(self):
+        source = self.source
+        source.seek(0, os.SEEK_END)
+        size = source.tell()
+        source.seek(0)
+        if size == 0:
+            return b''
+        if size <= current_app.config['UPLOAD_SPOOL_MAX_MEMORY']:
+            return source.read()
+        source.rollover()
+        self.mapped = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.mapped
+
+    def __exit__(self, *exc):
+        if self.mapped is not None:
+            self.mapped.close()
+
+
+def _detect_encoding(buffer) -> Tuple[str, int]:
+    """识别文本编码：UTF-8（可带 BOM），否则按 GB18030 处理；返回 (编码, 正文起始偏移)"""
+    if buffer[:len(_UTF8_BOM)] == _UTF8_BOM:
+        return 'utf-8', len(_UTF8_BOM)
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(buffer[:COPY_BUFFER_SIZE], final=False)
+        return 'utf-8', 0
+    except UnicodeDecodeError:
+        return 'gb18030', 0
+
+
+# ---------------------------------------------------------------------------
+# Word (.docx)
+# ---------------------------------------------------------------------------
+
+def _proofread_docx(service: BaseAIService, provider: str, source, output) -> DocumentReport:
+    """
+    三遍流式处理 docx：
+
+    1. SAX 解析 word/document.xml，逐段提取文本；
+    2. 分批校对，修正文本按段落顺序写入临时文件（每行一个 JSON）；
+    3. 再次 SAX 解析原文档，把修正文本写回对应段落，其余成员原样复制。
+    """
+    report = DocumentReport()
+    try:
+        source_zip = zipfile.ZipFile(source)
+        source_zip.getinfo(DOCX_DOCUMENT)
+    except (zipfile.BadZipFile, KeyError):
+        raise ProofreadingError('无法读取 .docx 文件，文件可能已损坏')
+
+    with source_zip, tempfile.TemporaryFile('w+', encoding='utf-8') as corrections:
+        paragraphs = iter_docx_paragraphs(source_zip)
+        for text, result in proofread_paragraphs(service, provider, paragraphs, lambda text: text or None):
+            corrected = None
+            if result is not None:
+                report.add(result)
+                if not result.is_error and result.corrected_text != text:
+                    corrected = result.corrected_text
+            corrections.write(json.dumps(corrected, ensure_ascii=False) + '\n')
+
+        corrections.seek(0)
+        _write_docx(source_zip, corrections, output)
+    return report
+
+
+def iter_docx_paragraphs(source_zip: zipfile.ZipFile) -> Iterator[str]:
+    """按文档顺序逐段产出正文段落文本（增量解析，不构建整棵 XML 树）"""
+    paragraphs: List[str] = []
+    handler = _ParagraphTextHandler(paragraphs.append)
+    parser = xml.sax.make_parser()
+    parser.setContentHandler(handler)
+    with source_zip.open(DOCX_DOCUMENT) as document:
+        while True:
+            data = document.read(COPY_BUFFER_SIZE)
+            if not data:
+                break
+            parser.feed(data)
+            yield from paragraphs
+            paragraphs.clear()
+    parser.close()
+    yield from paragraphs
+
+
+class _ParagraphTextHandler(xml.sax.ContentHandler):
+    """收集顶层段落（w:p）中 w:t 的文本；嵌套在段落内的文本框段落保持原样"""
+
+    def __init__(self, on_paragraph: Callable[[str], None]):
+        super().__init__()
+        self.on_paragraph = on_paragraph
+        self.depth = 0
+        self.in_text = False
+        self.parts: List[str] = []
+
+    def startElement(self, name, attrs):
+        if name == _W_PARAGRAPH:
+            self.depth += 1
+            if self.depth == 1:
+                self.parts = []
+        elif name == _W_TEXT and self.depth == 1:
+            self.in_text = True
+
+    def endElement(self, name):
+        if name == _W_PARAGRAPH:
+            if self.depth == 1:
+                self.on_paragraph(''.join(self.parts))
+            self.depth -= 1
+        elif name == _W_TEXT:
+            self.in_text = False
+
+    def characters(self, content):
+        if self.in_text:
+            self.parts.append(content)
+
+
+class _ParagraphRewriter(XMLGenerator):
+    """
+    原样输出 XML，并把有修正的顶层段落的文本写入其第一个 w:t，其余 w:t 置空
+
+    修正过的段落会合并为单一格式的文本，未修改的段落保留原有格式。
+    """
+
+    def __init__(self, out, corrections):
+        super().__init__(out, encoding='utf-8', short_empty_elements=True)
+        self.corrections = corrections
+        self.depth = 0
+        self.corrected: Optional[str] = None
+        self.in_text = False
+
+    def startElement(self, name, attrs):
+        if name == _W_PARAGRAPH:
+            self.depth += 1
+            if self.depth == 1:
+                self.corrected = json.loads(self.corrections.readline() or 'null')
+        elif name == _W_TEXT and self.depth == 1:
+            self.in_text = True
+            if self.corrected is not None:
+                attrs = dict(attrs)
+                attrs['xml:space'] = 'preserve'
+                super().startElement(name, attrs)
+                super().characters(self.corrected)
+                self.corrected = ''
+                return
+        super().startElement(name, attrs)
+
+    def endElement(self, name):
+        if name == _W_PARAGRAPH:
+            if self.depth == 1:
+                self.corrected = None
+            self.depth -= 1
+        elif name == _W_TEXT:
+            self.in_text = False
+        super().endElement(name)
+
+    def characters(self, content):
+        if self.in_text and self.corrected is not None:
+            return
+        super().characters(content)
+
+
+def _write_docx(source_zip: zipfile.ZipFile, corrections, output):
+    """复制 docx 的全部成员，word/document.xml 经改写后写入"""
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as target:
+        for info in source_zip.infolist():
+            with source_zip.open(info) as src, target.open(info, 'w') as dst:
+                if info.filename == DOCX_DOCUMENT:
+                    parser = xml.sax.make_parser()
+                    parser.setContentHandler(_ParagraphRewriter(dst, corrections))
+                    parser.parse(src)
+                else:
+                    shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
@@ -0,0 +1,50 @@
+"""
+灵犀校对平台 - 故障转移模块
+
+主提供商熔断或调用失败时，按配置的顺序改用用户在其他提供商下的密钥，
+每个提供商使用该密钥启用的第一个模型；处于熔断状态的上游直接跳过。
+"""
+
+import logging
+from typing import Callable, Iterator, Tuple
+
+from flask import current_app
+
+from .ai_services import BaseAIService
+from .models import APIKeyMixin
+from .usercache import get_user_cache
+
+logger = logging.getLogger(__name__)
+
+
+def failover_services(user_id: int, provider: str,
+                      build_service: Callable[[APIKeyMixin, str], BaseAIService]) -> Iterator[Tuple[str, str, BaseAIService]]:
+    """
+    按 FAILOVER_ORDER 依次产出可用的备用 (提供商, 模型, AI服务)
+
+    未列入 FAILOVER_ORDER 的提供商排在最后，按密钥添加顺序尝试。
+    """
+    config = current_app.config
+    if not config['FAILOVER_ENABLED']:
+        return
+
+    order = {name: index for index, name in enumerate(config['FAILOVER_ORDER'])}
+    user = get_user_cache().get(user_id)
+    if user is None:
+        return
+    records = [record for record in user.api_keys if record.provider != provider]
+    records.sort(key=lambda record: order.get(record.provider, len(order)))
+
+    for record in records:
+        models = record.get_available_models()
+        if not models:
+            continue
+        model = models[0]['id']
+        try:
+            service = build_service(record, model)
+        except Exception as e:
+            logger.warning(f"Failed to build failover service {record.provider}/{model}: {e}")
+            continue
+        if not service.get_circuit_breaker().available():
+            continue
+        yield record.provider, model, service
@@ -0,0 +1,124 @@
+"""
+灵犀校对平台 - 对冲请求模块
+
+主模型在其滚动 p95 耗时内仍未返回时，把同一文本同时发给用户启用的另一个模型，
+采用先返回的有效结果，另一个请求尚未开始则取消、已开始则丢弃其结果。
+"""
+
+import logging
+import math
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Callable, NamedTuple, Optional, Tuple
+
+from flask import current_app
+
+from .ai_services import BaseAIService, ProofreadingResult
+from .chunking import locate_issues
+from .concurrency import get_provider_executor
+from .latency import get_latency_tracker, timed_proofread
+from .models import APIKeyMixin
+from .usercache import get_user_cache
+
+logger = logging.getLogger(__name__)
+
+
+class HedgeTarget(NamedTuple):
+    """对冲请求发往的提供商、模型及对应的API密钥"""
+    provider: str
+    model: str
+    api_key_record: APIKeyMixin
+
+
+def hedge_delay(provider: str, model: str) -> float:
+    """触发对冲前等待主模型的时长：其滚动分位耗时，样本不足时使用默认值"""
+    config = current_app.config
+    delay = get_latency_tracker().percentile(
+        provider, model, config['HEDGE_PERCENTILE'], config['HEDGE_MIN_SAMPLES']
+    )
+    return delay if delay is not None else config['HEDGE_DEFAULT_DELAY']
+
+
+def choose_hedge_target(user_id: int, provider: str, model: str) -> Optional[HedgeTarget]:
+    """
+    在用户启用的其他模型中选择对冲目标
+
+    优先选择其他提供商（故障与拥塞相互独立），同类候选中选近期 p95 最低的；
+    没有延迟样本的模型排在有样本的之后，按密钥添加顺序选择。
+    """
+    config = current_app.config
+    tracker = get_latency_tracker()
+    best = None
+    best_rank = None
+    order = 0
+    user = get_user_cache().get(user_id)
+    for record in (user.api_keys if user is not None else ()):
+        for candidate in record.get_available_models():
+            if record.provider == provider and candidate['id'] == model:
+                continue
+            p95 = tracker.percentile(record.provider, candidate['id'], 0.95, config['HEDGE_MIN_SAMPLES'])
+            rank = (record.provider == provider, p95 if p95 is not None else math.inf, order)
+            order += 1
+            if best_rank is None or rank < best_rank:
+                best, best_rank = HedgeTarget(record.provider, candidate['id'], record), rank
+    return best
+
+
+def proofread_hedged(primary_service: BaseAIService, provider: str, model: str, text: str,
+                     target: Optional[HedgeTarget],
+                     build_secondary: Callable[[HedgeTarget], BaseAIService]) -> Tuple[ProofreadingResult, str, str]:
+    """
+    执行对冲校对
+
+    Returns:
+        tuple: (ProofreadingResult, 采用结果的提供商, 模型)；结果的 hedged 标记是否发出了对冲请求
+    """
+    executor = get_provider_executor()
+    primary = executor.submit(provider, _attempt, primary_service, text)
+    done, _ = wait([primary], timeout=hedge_delay(provider, model))
+    if done or target is None:
+        return _finish(primary.result(), text, hedged=False), provider, model
+
+    try:
+        secondary_service = build_secondary(target)
+    except Exception as e:
+        logger.warning(f"Failed to build hedge service {target.provider}/{target.model}: {e}")
+        return _finish(primary.result(), text, hedged=False), provider, model
+
+    logger.info(f"Hedging {provider}/{model} with {target.provider}/{target.model}")
+    secondary = executor.submit(target.provider, _attempt, secondary_service, text)
+    owners = {primary: (provider, model), secondary: (target.provider, target.model)}
+
+    pending = {primary, secondary}
+    failed = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in _primary_first(done, primary):
+            result = future.result()
+            if not result.is_error:
+                for loser in pending:
+                    loser.cancel()
+                return (_finish(result, text, hedged=True),) + owners[future]
+            if failed is None or future is primary:
+                failed = (result,) + owners[future]
+
+    result, winner_provider, winner_model = failed
+    return _finish(result, text, hedged=True), winner_provider, winner_model
+
+
+def _attempt(service: BaseAIService, text: str) -> ProofreadingResult:
+    """执行一次校对，异常转换为错误结果"""
+    try:
+        return timed_proofread(service, text)
+    except Exception as e:
+        return service._create_error_result(text, "API错误", str(e))
+
+
+def _primary_first(done, primary: Future):
+    """同时完成时优先采用主模型的结果"""
+    return sorted(done, key=lambda future: future is not primary)
+
+
+def _finish(result: ProofreadingResult, text: str, hedged: bool) -> ProofreadingResult:
+    result.issues = locate_issues(text, result.issues)
+    result.hedged = hedged
+    return result
@@ -0,0 +1,194 @@
+"""
+灵犀校对平台 - 校对历史查询模块
+
+历史列表按 (created_at, id) 做游标分页：下一页从上一页最后一行之后继续读取，
+每页都是 ix_proofreading_history_user_created 上的一次索引范围扫描，翻到多深都与第一页开销相同。
+总条数取自随增删维护的 User.history_count，不再每次 COUNT(*)。
+列表只读取元数据列（摘要与问题数），页面大小与文档长度无关；全文由 get_user_history() 按条读取。
+导出按列流式读取（服务端游标 + yield_per），内存占用与导出条数无关。
+超出保留策略的记录搬到归档表（ArchivedHistory），且总是早于同一用户的在线记录：
+列表读完在线表后以同一游标接着读归档表，导出先读归档表再读在线表，顺序不变。
+"""
+
+import base64
+import binascii
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import null, select, tuple_
+from sqlalchemy.orm import load_only
+
+from .models import db, ArchivedHistory, ProofreadingHistory, TextBlob
+from .textstore import unpack_text
+
+# 列表页需要的列（在线表与归档表同名）
+LIST_COLUMNS = ('id', 'created_at', 'provider_used', 'model_used', 'preview', 'issue_count')
+
+
+def encode_cursor(history: ProofreadingHistory) -> str:
+    """以某一行的 (created_at, id) 生成下一页游标"""
+    raw = f'{history.created_at.isoformat()}|{history.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[datetime, int]]:
+    """解析游标，格式不正确时返回 None"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, history_id = raw.split('|')
+        return datetime.fromisoformat(created_at), int(history_id)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        return None
+
+
+def history_page(user_id: int, cursor: Optional[str] = None,
+                 per_page: int = 10) -> Tuple[List[ProofreadingHistory], Optional[str]]:
+    """
+    读取一页校对历史（按时间倒序，只加载 LIST_COLUMNS）
+
+    Args:
+        cursor: 上一页返回的游标；为空或无法解析时从第一页开始
+
+    Returns:
+        tuple: (本页记录, 下一页游标；没有更多记录时为 None)
+    """
+    position = decode_cursor(cursor) if cursor else None
+    # 多取一行用于判断是否还有下一页
+    items = _page_items(ProofreadingHistory, user_id, position, per_page + 1)
+    if len(items) <= per_page:
+        items += _page_items(ArchivedHistory, user_id, position, per_page + 1 - len(items))
+    if len(items) > per_page:
+        items = items[:per_page]
+        return items, encode_cursor(items[-1])
+    return items, None
+
+
+def _page_items(model, user_id: int, position: Optional[Tuple[datetime, int]], limit: int) -> list:
+    """在一张历史表上按游标位置读取至多 limit 行"""
+    query = model.query.filter(model.user_id == user_id)
+    if position is not None:
+        query = query.filter(tuple_(model.created_at, model.id) < position)
+    return query.options(load_only(*(getattr(model, name) for name in LIST_COLUMNS)))\
+                .order_by(model.created_at.desc(), model.id.desc())\
+                .limit(limit).all()
+
+
+def get_user_history(user_id: int, history_id: int) -> Optional[ProofreadingHistory]:
+    """获取用户的一条完整校对历史（在线表中没有时查归档表）；不存在或不属于该用户时返回 None"""
+    history = ProofreadingHistory.query.filter_by(id=history_id, user_id=user_id).first()
+    if history is None:
+        history = ArchivedHistory.query.filter_by(id=history_id, user_id=user_id).first()
+    return history
+
+
+EXPORT_FIELDS = ('id', 'created_at', 'provider', 'model', 'original_text', 'corrected_text', 'issues')
+
+# 导出时每批从游标读取的行数
+EXPORT_BATCH_SIZE = 500
+
+# gzip 导出时每隔多少条记录刷新一次压缩流，保证数据持续送达而不是攒到结束
+GZIP_FLUSH_ROWS = 100
+
+
+def iter_export_rows(user_id: int, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                     provider: Optional[str] = None, model: Optional[str] = None,
+                     batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    按时间顺序逐条读取用户的校对历史（含全文）
+
+    直接查询存储列并在此解码，不创建模型实例；yield_per 使结果分批从服务端游标读取。
+    先读归档表再读在线表。
+
+    Args:
+        start: 起始时间（含）
+        end: 结束时间（不含）
+    """
+    for table in (ArchivedHistory.__table__, ProofreadingHistory.__table__):
+        query = _export_query(table, user_id, start, end, provider, model)
+        yield from _decode_export_rows(db.session.execute(query.execution_options(yield_per=batch_size)))
+
+
+def _export_query(history, user_id: int, start: Optional[datetime], end: Optional[datetime],
+                  provider: Optional[str], model: Optional[str]):
+    blobs = TextBlob.__table__
+    if 'original_text' in history.c:
+        legacy = (history.c.original_text, history.c.corrected_text, history.c.issues_found)
+    else:
+        # 归档表没有旧格式的明文列
+        legacy = (null().label('original_text'), null().label('corrected_text'), null().label('issues_found'))
+    query = select(
+        history.c.id, history.c.created_at, history.c.provider_used, history.c.model_used,
+        *legacy, blobs.c.data, history.c.corrected_delta, history.c.issues_data
+    ).select_from(
+        history.outerjoin(blobs, blobs.c.digest == history.c.original_digest)
+    ).where(history.c.user_id == user_id)
+    if start is not None:
+        query = query.where(history.c.created_at >= start)
+    if end is not None:
+        query = query.where(history.c.created_at < end)
+    if provider:
+        query = query.where(history.c.provider_used == provider)
+    if model:
+        query = query.where(history.c.model_used == model)
+    return query.order_by(history.c.created_at, history.c.id)
+
+
+def _decode_export_rows(result) -> Iterator[Dict[str, Any]]:
+    for row in result:
+        original, corrected = ProofreadingHistory.decode_texts(row.original_text, row.corrected_text,
+                                                               row.data, row.corrected_delta)
+        issues = row.issues_found
+        if issues is None and row.issues_data is not None:
+            issues = unpack_text(row.issues_data)
+        yield {
+            'id': row.id,
+            'created_at': row.created_at.isoformat() if row.created_at else None,
+            'provider': row.provider_used,
+            'model': row.model_used,
+            'original_text': original,
+            'corrected_text': corrected,
+            'issues': json.loads(issues) if issues else []
+        }
+
+
+def export_ndjson(rows: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """每条记录一行 JSON"""
+    for row in rows:
+        yield (json.dumps(row, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def export_csv(rows: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """CSV（带 UTF-8 BOM，便于 Excel 识别中文），问题列表以 JSON 字符串存于 issues 列"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(EXPORT_FIELDS)
+    yield buffer.getvalue().encode('utf-8')
+    for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([
+            json.dumps(row['issues'], ensure_ascii=False) if field == 'issues' else row[field]
+            for field in EXPORT_FIELDS
+        ])
+        yield buffer.getvalue().encode('utf-8')
+
+
+def gzip_stream(chunks: Iterable[bytes], flush_every: int = GZIP_FLUSH_ROWS) -> Iterator[bytes]:
+    """
+    把字节块流式压缩为 gzip
+
+    第一块与之后每 flush_every 块做一次同步刷新，客户端可以立即开始接收与解压。
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for count, chunk in enumerate(chunks):
+        data = compressor.compress(chunk)
+        if count % flush_every == 0:
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
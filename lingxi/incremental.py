@@ -0,0 +1,201 @@
+"""
+灵犀校对平台 - 增量校对模块
+
+按段落计算指纹，并把每个段落的校对结果与校对历史关联保存。
+用户修订后再次提交时，只把新增或修改过的段落发送给AI服务，
+未改动的段落直接复用之前保存的结果。
+"""
+
+import hashlib
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from .ai_services import BaseAIService, ProofreadingResult
+from .cache import _shift_issues
+from .chunking import get_chunk_budget, merge_chunk_results, proofread_chunk, run_proofreading
+from .concurrency import get_provider_executor
+from .models import db, ParagraphResult
+from .segmenter import Span, chunk_text, split_paragraphs
+
+logger = logging.getLogger(__name__)
+
+
+def paragraph_fingerprint(paragraph: str, provider: str, model: str, prompt_version: str) -> str:
+    """
+    段落指纹：段落原文与提供商、模型、提示词版本的摘要
+
+    复用的修正文本与问题偏移针对的是段落原文，换行符、行尾空白或 Unicode 组合形式
+    不同的段落各自保存结果。
+    """
+    digest = hashlib.sha256()
+    for part in (prompt_version, provider, model, paragraph):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class IncrementalPlan:
+    """一次提交的段落划分、指纹及可复用的历史结果"""
+
+    def __init__(self, text: str, spans: List[Span], fingerprints: List[str],
+                 stored: Dict[str, ParagraphResult]):
+        self.text = text
+        self.spans = spans
+        self.fingerprints = fingerprints
+        self.stored = stored
+
+    @property
+    def reusable(self) -> int:
+        """可复用的段落数"""
+        return sum(1 for fp in self.fingerprints if fp in self.stored)
+
+    def paragraph(self, index: int) -> str:
+        span = self.spans[index]
+        return self.text[span.start:span.end]
+
+
+def plan_incremental(user_id: int, text: str, provider: str, model: str, prompt_version: str) -> IncrementalPlan:
+    """切分段落并查询该用户已保存的段落结果"""
+    spans = split_paragraphs(text)
+    fingerprints = [
+        paragraph_fingerprint(text[span.start:span.end], provider, model, prompt_version)
+        for span in spans
+    ]
+
+    stored = {}
+    if fingerprints:
+        records = ParagraphResult.query.filter(
+            ParagraphResult.user_id == user_id,
+            ParagraphResult.fingerprint.in_(set(fingerprints))
+        ).all()
+        stored = {record.fingerprint: record for record in records}
+
+    return IncrementalPlan(text, spans, fingerprints, stored)
+
+
+def proofread_incremental(ai_service: BaseAIService, provider: str, plan: IncrementalPlan):
+    """
+    按计划执行校对
+
+    没有可复用段落时按常规流程校对整篇文档；否则只把改动过的段落
+    （超出预算的段落再分片）并发发送给AI服务，其余段落复用历史结果。
+
+    Returns:
+        tuple: (ProofreadingResult, 待保存的段落结果列表)
+    """
+    text = plan.text
+    if not plan.reusable:
+        result = run_proofreading(ai_service, provider, text)
+        return result, split_result_by_paragraph(plan, result)
+
+    budget = get_chunk_budget()
+    executor = get_provider_executor()
+    pending = {}
+    for index, fingerprint in enumerate(plan.fingerprints):
+        # 文档内重复出现的相同段落只发送一次
+        if fingerprint in plan.stored or fingerprint in pending:
+            continue
+        paragraph = plan.paragraph(index)
+        chunks = chunk_text(paragraph, budget)
+        futures = [executor.submit(provider, proofread_chunk, ai_service, chunk) for chunk in chunks]
+        pending[fingerprint] = (paragraph, chunks, futures)
+
+    parts = []
+    issues = []
+    records = []
+    is_error = False
+    pos = 0
+    for span, fingerprint in zip(plan.spans, plan.fingerprints):
+        parts.append(text[pos:span.start])
+
+        if fingerprint in pending:
+            paragraph, chunks, futures = pending[fingerprint]
+            paragraph_result = merge_chunk_results(paragraph, chunks, [f.result() for f in futures])
+            if paragraph_result.is_error:
+                is_error = True
+            else:
+                records.append(_make_record(fingerprint, paragraph_result.corrected_text, paragraph_result.issues))
+            corrected, paragraph_issues = paragraph_result.corrected_text, paragraph_result.issues
+        else:
+            stored = plan.stored[fingerprint]
+            corrected, paragraph_issues = stored.corrected_text, stored.get_issues()
+
+        parts.append(corrected)
+        issues.extend(_shift_issues(paragraph_issues, span.start))
+        pos = span.end
+    parts.append(text[pos:])
+
+    result = ProofreadingResult(''.join(parts), issues, is_error=is_error)
+    result.reused_paragraphs = plan.reusable
+    return result, records
+
+
+def split_result_by_paragraph(plan: IncrementalPlan, result: ProofreadingResult) -> List[Dict[str, Any]]:
+    """
+    把整篇文档的校对结果拆分为段落结果
+
+    仅当修正文本的段落数与原文一致、且每个问题都能定位到单个段落内时
+    才能可靠对应；否则不保存段落结果。
+    """
+    if result.is_error or not plan.spans:
+        return []
+
+    corrected = result.corrected_text
+    corrected_spans = split_paragraphs(corrected)
+    if len(corrected_spans) != len(plan.spans):
+        return []
+
+    grouped = [[] for _ in plan.spans]
+    for issue in result.issues:
+        offset = issue.get('offset')
+        if offset is None:
+            return []
+        end = offset + len(issue.get('original') or '')
+        index = next((i for i, span in enumerate(plan.spans) if span.start <= offset < span.end), None)
+        if index is None or end > plan.spans[index].end:
+            return []
+        grouped[index].append(issue)
+
+    records = []
+    for span, corrected_span, fingerprint, paragraph_issues in zip(
+            plan.spans, corrected_spans, plan.fingerprints, grouped):
+        records.append(_make_record(
+            fingerprint,
+            corrected[corrected_span.start:corrected_span.end],
+            _shift_issues(paragraph_issues, -span.start)
+        ))
+    return records
+
+
+def store_paragraph_results(user_id: int, history_id: Optional[int], records: List[Dict[str, Any]]):
+    """保存段落结果（同一指纹只保留最新的一条）"""
+    if not history_id or not records:
+        return
+
+    try:
+        fingerprints = [record['fingerprint'] for record in records]
+        existing = {
+            r.fingerprint: r for r in ParagraphResult.query.filter(
+                ParagraphResult.user_id == user_id,
+                ParagraphResult.fingerprint.in_(fingerprints)
+            )
+        }
+        for record in records:
+            row = existing.get(record['fingerprint'])
+            if row is None:
+                row = ParagraphResult(user_id=user_id, fingerprint=record['fingerprint'])
+                db.session.add(row)
+                existing[record['fingerprint']] = row
+            row.history_id = history_id
+            row.corrected_text = record['corrected_text']
+            row.issues_found = json.dumps(record['issues'], ensure_ascii=False)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to save paragraph results: {e}")
+
+
+def _make_record(fingerprint: str, corrected_text: str, issues: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {'fingerprint': fingerprint, 'corrected_text': corrected_text, 'issues': issues}
+
@@ -0,0 +1,214 @@
+"""
+灵犀校对平台 - 异步校对任务模块
+
+Web 进程只负责把任务写入数据库并立即返回任务ID；
+Worker 进程从数据库领取任务，在线程池中执行实际的AI调用。
+任务状态全部持久化在数据库中，进程重启后未完成的任务会被重新领取。
+"""
+
+import json
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+
+from .models import db, ProofreadingJob
+from .proofreading import (
+    ProofreadingError,
+    proofread_for_user,
+    resolve_api_key,
+    result_error_message,
+    validate_request,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def submit_job(user_id: int, text: str, provider: str, model: str) -> ProofreadingJob:
+    """
+    校验请求并创建一个待执行的校对任务
+
+    参数错误会在提交时立即抛出 ProofreadingError，而不是留到 Worker 中失败。
+    """
+    validate_request(text, provider, model)
+    resolve_api_key(user_id, provider, model)
+
+    job = ProofreadingJob(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        text=text,
+        provider=provider,
+        model=model,
+        status=ProofreadingJob.STATUS_PENDING
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def get_user_job(user_id: int, job_id: str) -> Optional[ProofreadingJob]:
+    """获取属于指定用户的任务"""
+    return ProofreadingJob.query.filter_by(id=job_id, user_id=user_id).first()
+
+
+class JobWorker:
+    """从数据库领取校对任务并在线程池中执行"""
+
+    def __init__(self, app, max_workers: int = None, poll_interval: float = None):
+        self.app = app
+        self.max_workers = max_workers or app.config['JOB_WORKERS']
+        self.poll_interval = poll_interval or app.config['JOB_POLL_INTERVAL']
+        self.lease_seconds = app.config['JOB_LEASE_SECONDS']
+        self.max_attempts = app.config['JOB_MAX_ATTEMPTS']
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix='proofread-job'
+        )
+        self._slots = threading.Semaphore(self.max_workers)
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def claim_next_job(self) -> Optional[str]:
+        """
+        原子地领取一个待执行任务
+
+        通过带状态条件的 UPDATE 实现乐观锁，多个 Worker 进程并发领取时
+        同一个任务只会被其中一个成功领取。
+
+        Returns:
+            str: 领取到的任务ID，没有可执行任务时返回 None
+        """
+        while True:
+            candidate = db.session.query(ProofreadingJob.id)\
+                                  .filter_by(status=ProofreadingJob.STATUS_PENDING)\
+                                  .order_by(ProofreadingJob.created_at)\
+                                  .first()
+            if candidate is None:
+                db.session.commit()
+                return None
+
+            claimed = ProofreadingJob.query.filter_by(
+                id=candidate.id,
+                status=ProofreadingJob.STATUS_PENDING
+            ).update({
+                'status': ProofreadingJob.STATUS_RUNNING,
+                'started_at': datetime.utcnow(),
+                'attempts': ProofreadingJob.attempts + 1
+            }, synchronize_session=False)
+            db.session.commit()
+
+            if claimed:
+                return candidate.id
+            # 已被其他 Worker 抢先领取，继续尝试下一个
+
+    def requeue_stale_jobs(self) -> int:
+        """
+        回收超过租约时间仍处于运行状态的任务（通常是 Worker 异常退出）
+
+        Returns:
+            int: 重新入队的任务数量
+        """
+        deadline = datetime.utcnow() - timedelta(seconds=self.lease_seconds)
+        stale = ProofreadingJob.query.filter(
+            ProofreadingJob.status == ProofreadingJob.STATUS_RUNNING,
+            ProofreadingJob.started_at < deadline
+        )
+
+        stale.filter(ProofreadingJob.attempts >= self.max_attempts).update({
+            'status': ProofreadingJob.STATUS_FAILED,
+            'error': '任务多次执行超时',
+            'finished_at': datetime.utcnow()
+        }, synchronize_session=False)
+
+        requeued = stale.filter(ProofreadingJob.attempts < self.max_attempts).update({
+            'status': ProofreadingJob.STATUS_PENDING,
+            'started_at': None
+        }, synchronize_session=False)
+        db.session.commit()
+
+        if requeued:
+            logger.warning(f"Requeued {requeued} stale proofreading jobs")
+        return requeued
+
+    def run_job(self, job_id: str):
+        """执行单个任务并持久化结果"""
+        try:
+            with self.app.app_context():
+                job = db.session.get(ProofreadingJob, job_id)
+                if job is None:
+                    return
+
+                try:
+                    result, history = proofread_for_user(job.user_id, job.text, job.provider, job.model)
+                    if result.is_error:
+                        # 所有可用的上游都失败时不把原文当作校对结果保存
+                        job.status = ProofreadingJob.STATUS_FAILED
+                        job.error = result_error_message(result)
+                    else:
+                        job.corrected_text = result.corrected_text
+                        job.issues_found = json.dumps(result.issues, ensure_ascii=False)
+                        job.history_id = history.id if history else None
+                        job.status = ProofreadingJob.STATUS_SUCCEEDED
+                except ProofreadingError as e:
+                    job.status = ProofreadingJob.STATUS_FAILED
+                    job.error = e.message
+                except Exception as e:
+                    logger.error(f"Proofreading job {job_id} failed: {e}")
+                    db.session.rollback()
+                    job = db.session.get(ProofreadingJob, job_id)
+                    job.status = ProofreadingJob.STATUS_FAILED
+                    job.error = str(e)
+
+                job.finished_at = datetime.utcnow()
+                db.session.commit()
+        finally:
+            self._slots.release()
+
+    def run_forever(self):
+        """主循环：领取任务并提交到线程池，直到 stop() 被调用"""
+        logger.info(f"Proofreading job worker started with {self.max_workers} threads")
+        last_requeue = None
+
+        while not self._stop_event.is_set():
+            if not self._slots.acquire(timeout=self.poll_interval):
+                continue
+
+            job_id = None
+            try:
+                with self.app.app_context():
+                    now = datetime.utcnow()
+                    if last_requeue is None or (now - last_requeue).total_seconds() > self.lease_seconds / 2:
+                        self.requeue_stale_jobs()
+                        last_requeue = now
+                    job_id = self.claim_next_job()
+            except Exception as e:
+                logger.error(f"Failed to claim proofreading job: {e}")
+
+            if job_id is None:
+                self._slots.release()
+                self._stop_event.wait(self.poll_interval)
+                continue
+
+            self._executor.submit(self.run_job, job_id)
+
+        logger.info("Proofreading job worker stopped")
+
+    def start(self) -> threading.Thread:
+        """在后台线程中运行主循环（用于嵌入 Web 进程）"""
+        self._thread = threading.Thread(target=self.run_forever, name='proofread-job-worker', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def request_stop(self):
+        """通知主循环停止领取新任务（可在信号处理函数中调用）"""
+        self._stop_event.set()
+
+    def stop(self, wait: bool = True):
+        """停止领取新任务，并等待正在执行的任务结束"""
+        self.request_stop()
+        if self._thread is not None:
+            self._thread.join()
+        self._executor.shutdown(wait=wait)
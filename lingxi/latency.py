@@ -0,0 +1,82 @@
+"""
+灵犀校对平台 - 上游延迟统计模块
+
+按 (提供商, 模型) 记录最近若干次成功调用的耗时，提供滚动分位数，
+供对冲请求等功能根据实时延迟而不是固定常数做决策。
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from flask import current_app
+
+
+class LatencyTracker:
+    """按 (提供商, 模型) 维护滚动窗口内的调用耗时"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[Tuple[str, str], Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, model: str, seconds: float):
+        key = (provider, model)
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = deque(maxlen=self.window)
+                self._samples[key] = samples
+            samples.append(seconds)
+
+    def count(self, provider: str, model: str) -> int:
+        with self._lock:
+            return len(self._samples.get((provider, model), ()))
+
+    def percentile(self, provider: str, model: str, q: float, min_samples: int = 1) -> Optional[float]:
+        """滚动分位数（q 取 0~1）；样本数不足 min_samples 时返回 None"""
+        with self._lock:
+            samples = sorted(self._samples.get((provider, model), ()))
+        if len(samples) < max(min_samples, 1):
+            return None
+        index = min(int(q * len(samples)), len(samples) - 1)
+        return samples[index]
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """各 (提供商, 模型) 的样本数与 p50/p95"""
+        with self._lock:
+            keys = list(self._samples)
+        return {
+            f'{provider}/{model}': {
+                'samples': self.count(provider, model),
+                'p50': self.percentile(provider, model, 0.5),
+                'p95': self.percentile(provider, model, 0.95),
+            }
+            for provider, model in keys
+        }
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_latency_tracker() -> LatencyTracker:
+    """获取当前进程共享的 LatencyTracker"""
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = LatencyTracker(current_app.config['LATENCY_WINDOW'])
+    return _tracker
+
+
+def timed_proofread(service, text: str):
+    """调用 service.proofread 并记录成功调用的耗时"""
+    started = time.monotonic()
+    result = service.proofread(text)
+    if not result.is_error:
+        provider = getattr(service, 'PROVIDER', None)
+        if provider:
+            get_latency_tracker().record(provider, service.get_model(), time.monotonic() - started)
+    return result
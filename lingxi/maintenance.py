@@ -0,0 +1,353 @@
+"""
+灵犀校对平台 - 运维任务模块
+
+供 manage.py 调用的离线维护任务。所有任务都按主键分批处理、逐批提交，
+可以在应用正常服务期间在线执行。
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import delete, or_, select, text, tuple_, update
+from sqlalchemy.exc import OperationalError
+
+from .models import (
+    db, APIKey, ArchivedHistory, CryptoHelper, ParagraphResult, ProofreadingHistory, ProofreadingJob, User
+)
+from .search import get_search_index
+
+logger = logging.getLogger(__name__)
+
+# 归档一批记录时遇到并发修改的最多重试次数
+ARCHIVE_BATCH_RETRIES = 3
+
+
+def rotate_api_keys(encryption_password: str, previous_passwords: tuple = (),
+                    batch_size: int = 100, progress: Optional[Callable[[int, int], None]] = None) -> dict:
+    """
+    用当前加密密码重新加密全部 APIKey
+
+    轮换步骤：把新密码设为 ENCRYPTION_KEY、旧密码放入 ENCRYPTION_KEY_PREVIOUS 并重启应用
+    （此时新旧密文都能解密），然后执行本任务，完成后即可移除旧密码。
+
+    每行以原密文为条件更新：若轮换期间用户恰好修改了密钥，该行保持用户写入的新值。
+    批量更新不经过 flush 事件，需自行递增用户的 settings_version，使各进程缓存的密文失效。
+
+    Returns:
+        dict: rotated（已重新加密）、skipped（已是当前密码）、conflicts（被并发修改）
+    """
+    stats = {'rotated': 0, 'skipped': 0, 'conflicts': 0}
+    last_id = 0
+    while True:
+        rows = db.session.query(APIKey.id, APIKey.user_id, APIKey.encrypted_api_key).filter(
+            APIKey.id > last_id
+        ).order_by(APIKey.id).limit(batch_size).all()
+        if not rows:
+            break
+
+        for key_id, user_id, encrypted in rows:
+            rotated = CryptoHelper.rotate_api_key(encrypted, encryption_password, previous_passwords)
+            if rotated is None:
+                stats['skipped'] += 1
+                continue
+            updated = APIKey.query.filter_by(id=key_id, encrypted_api_key=encrypted).update(
+                {'encrypted_api_key': rotated}, synchronize_session=False
+            )
+            if updated:
+                User.bump_settings_version(db.session.connection(), user_id)
+            stats['rotated' if updated else 'conflicts'] += 1
+
+        db.session.commit()
+        last_id = rows[-1][0]
+        if progress:
+            progress(last_id, stats['rotated'])
+
+    logger.info(f"API key rotation finished: {stats}")
+    return stats
+
+
+def migrate_history_storage(batch_size: int = 200, codec: Optional[str] = None,
+                            progress: Optional[Callable[[int, int], None]] = None) -> dict:
+    """
+    把旧格式（明文列）的校对历史转换为去重、差量与压缩存储
+
+    在执行迁移 0002_history_text_storage 之后运行。转换期间应用照常读写：
+    新写入的行直接使用新格式，尚未转换的行从旧列读取。任务可以中断后重新执行。
+
+    每行以旧列仍有值为条件更新，已被其他进程转换或改写的行不会被覆盖。
+
+    Returns:
+        dict: migrated（已转换）、conflicts（被并发修改）
+    """
+    stats = {'migrated': 0, 'conflicts': 0}
+    last_id = 0
+    while True:
+        rows = db.session.query(
+            ProofreadingHistory.id,
+            ProofreadingHistory.legacy_original_text,
+            ProofreadingHistory.legacy_corrected_text,
+            ProofreadingHistory.legacy_issues_found
+        ).filter(
+            ProofreadingHistory.id > last_id,
+            ProofreadingHistory.legacy_original_text.isnot(None)
+        ).order_by(ProofreadingHistory.id).limit(batch_size).all()
+        if not rows:
+            break
+
+        connection = db.session.connection()
+        for history_id, original, corrected, issues in rows:
+            values = ProofreadingHistory.storage_values(
+                connection, original, corrected if corrected is not None else original, issues, codec
+            )
+            updated = ProofreadingHistory.query.filter(
+                ProofreadingHistory.id == history_id,
+                ProofreadingHistory.legacy_original_text.isnot(None)
+            ).update(values, synchronize_session=False)
+            stats['migrated' if updated else 'conflicts'] += 1
+
+        db.session.commit()
+        last_id = rows[-1][0]
+        if progress:
+            progress(last_id, stats['migrated'])
+
+    logger.info(f"History storage migration finished: {stats}")
+    return stats
+
+
+def backfill_history_summaries(batch_size: int = 200,
+                               progress: Optional[Callable[[int, int], None]] = None) -> dict:
+    """
+    为迁移 0004_history_list_summary 之前写入的校对历史填充列表摘要与问题数
+
+    只处理 issue_count 为空的行，可以中断后重新执行。
+
+    Returns:
+        dict: filled（已填充）
+    """
+    stats = {'filled': 0}
+    last_id = 0
+    while True:
+        histories = ProofreadingHistory.query.filter(
+            ProofreadingHistory.id > last_id,
+            ProofreadingHistory.issue_count.is_(None)
+        ).order_by(ProofreadingHistory.id).limit(batch_size).all()
+        if not histories:
+            break
+
+        for history in histories:
+            history.preview = ProofreadingHistory.make_preview(history.original_text)
+            history.issue_count = ProofreadingHistory.count_issues(history.issues_found)
+            stats['filled'] += 1
+
+        db.session.commit()
+        last_id = histories[-1].id
+        if progress:
+            progress(last_id, stats['filled'])
+
+    logger.info(f"History summary backfill finished: {stats}")
+    return stats
+
+
+def rebuild_search_index(batch_size: int = 200,
+                         progress: Optional[Callable[[int, int], None]] = None) -> dict:
+    """
+    清空并重建校对历史的全文检索索引
+
+    在执行迁移 0005_history_search_index 之后运行一次；重建期间新写入的记录照常建立索引，
+    已有记录在对应批次处理完之前搜索不到。归档表中的记录一并重建，不要与 archive-history 同时执行。
+
+    Returns:
+        dict: indexed（已建立索引）
+    """
+    connection = db.session.connection()
+    index = get_search_index(connection)
+    if index is None:
+        raise RuntimeError('当前数据库不支持全文检索')
+
+    stats = {'indexed': 0}
+    # 清空索引的同一事务中记下当前最大 id：之后写入的记录由写入流程建立索引，不再重复添加
+    index.clear(connection)
+    max_id = db.session.query(db.func.max(ProofreadingHistory.id)).scalar() or 0
+    db.session.commit()
+    for model in (ArchivedHistory, ProofreadingHistory):
+        last_id = 0
+        while last_id < max_id:
+            rows = db.session.query(model.id, model.user_id).filter(
+                model.id > last_id,
+                model.id <= max_id
+            ).order_by(model.id).limit(batch_size).all()
+            if not rows:
+                break
+
+            connection = db.session.connection()
+            for history_id, user_id in rows:
+                texts = model.read_texts(connection, history_id)
+                if texts is not None:
+                    index.add(connection, history_id, user_id, *texts)
+                    stats['indexed'] += 1
+
+            db.session.commit()
+            last_id = rows[-1][0]
+            if progress:
+                progress(last_id, stats['indexed'])
+
+    logger.info(f"Search index rebuild finished: {stats}")
+    return stats
+
+
+def archive_histories(retention_days: int = 0, hot_rows_per_user: int = 0, batch_size: int = 200,
+                      vacuum: bool = False, progress: Optional[Callable[[int, int], None]] = None) -> dict:
+    """
+    按保留策略把旧的校对历史从在线表搬入归档表
+
+    每个用户从最早的记录开始，搬移早于 retention_days 天、或最近 hot_rows_per_user 条之外的记录，
+    因此归档记录总是早于同一用户的在线记录。一批记录在同一事务中写入归档表并从在线表删除，
+    id、存储列与检索索引都保持不变，历史页、详情与导出照常读取；该批的段落复用结果随之删除。
+    任务可以中断后重新执行。
+
+    Args:
+        retention_days: 在线表保留的天数，0 表示不按时间归档
+        hot_rows_per_user: 每个用户在线表保留的最近条数，0 表示不按条数归档
+        vacuum: 完成后整理数据库文件（SQLite 执行 VACUUM 把空闲页还给文件系统，期间会锁库）
+
+    Returns:
+        dict: archived（已归档条数）、hot_rows（在线表剩余条数）、
+              hot_bytes_before / hot_bytes_after（在线表及其索引占用的字节数，数据库不支持统计时为 None）、
+              reclaimed_bytes（二者之差）
+    """
+    if retention_days <= 0 and hot_rows_per_user <= 0:
+        raise ValueError('未设置保留策略（HISTORY_RETENTION_DAYS 或 HISTORY_HOT_ROWS_PER_USER）')
+
+    cutoff = datetime.utcnow() - timedelta(days=retention_days) if retention_days > 0 else None
+    stats = {'archived': 0, 'hot_bytes_before': _hot_table_bytes(db.session.connection())}
+    # SQLite 的 INTEGER PRIMARY KEY 未声明 AUTOINCREMENT，删掉当前最大 id 的行后新记录会复用该 id，
+    # 与归档表冲突；因此开始时最新的一行始终留在在线表
+    max_id = db.session.query(db.func.max(ProofreadingHistory.id)).scalar() or 0
+    user_ids = [user_id for (user_id,) in
+                db.session.query(User.id).filter(User.history_count > 0).order_by(User.id)]
+    db.session.commit()
+
+    for user_id in user_ids:
+        condition = _archive_condition(user_id, cutoff, hot_rows_per_user)
+        if condition is None:
+            continue
+        while True:
+            archived = _archive_batch(user_id, condition, max_id, batch_size)
+            if not archived:
+                break
+            stats['archived'] += archived
+            if progress:
+                progress(user_id, stats['archived'])
+
+    if vacuum:
+        _vacuum_history()
+    connection = db.session.connection()
+    stats['hot_rows'] = db.session.query(db.func.count(ProofreadingHistory.id)).scalar()
+    stats['hot_bytes_after'] = _hot_table_bytes(connection)
+    db.session.commit()
+    if stats['hot_bytes_before'] is not None and stats['hot_bytes_after'] is not None:
+        stats['reclaimed_bytes'] = stats['hot_bytes_before'] - stats['hot_bytes_after']
+    else:
+        stats['reclaimed_bytes'] = None
+
+    logger.info(f"History archive finished: {stats}")
+    return stats
+
+
+def _archive_condition(user_id: int, cutoff: Optional[datetime], hot_rows_per_user: int):
+    """某个用户需要归档的在线记录的筛选条件，没有需要归档的记录时返回 None"""
+    conditions = []
+    if cutoff is not None:
+        conditions.append(ProofreadingHistory.created_at < cutoff)
+    if hot_rows_per_user > 0:
+        # 保留的最后一条之后的第一条：它及更早的记录都要归档（沿 (created_at, id) 索引定位）
+        boundary = db.session.query(ProofreadingHistory.created_at, ProofreadingHistory.id).filter(
+            ProofreadingHistory.user_id == user_id
+        ).order_by(
+            ProofreadingHistory.created_at.desc(), ProofreadingHistory.id.desc()
+        ).offset(hot_rows_per_user).first()
+        if boundary is not None:
+            conditions.append(tuple_(ProofreadingHistory.created_at, ProofreadingHistory.id) <= tuple(boundary))
+    return or_(*conditions) if conditions else None
+
+
+def _archive_batch(user_id: int, condition, max_id: int, batch_size: int) -> int:
+    """
+    把一批最早的待归档记录搬入归档表并提交，返回搬移的条数
+
+    期间有记录被并发删除时放弃这一批并重新读取，重试 ARCHIVE_BATCH_RETRIES 次仍不成功则跳过
+    该用户本轮余下的记录（返回 0），归档始终从最早的记录开始，重新执行任务即可补上。
+    """
+    history = ProofreadingHistory.__table__
+    for _ in range(ARCHIVE_BATCH_RETRIES + 1):
+        rows = db.session.execute(
+            select(history).where(
+                history.c.user_id == user_id, history.c.id < max_id, condition
+            ).order_by(history.c.created_at, history.c.id).limit(batch_size)
+        ).mappings().all()
+        if not rows:
+            return 0
+
+        connection = db.session.connection()
+        archived_at = datetime.utcnow()
+        values = []
+        for row in rows:
+            record = {name: row[name] for name in ArchivedHistory.COPIED_COLUMNS}
+            if row['original_text'] is not None:
+                # 尚未执行 migrate-history-storage 的旧行：归档时顺便编码
+                corrected = row['corrected_text'] if row['corrected_text'] is not None else row['original_text']
+                encoded = ProofreadingHistory.storage_values(
+                    connection, row['original_text'], corrected, row['issues_found']
+                )
+                record.update({name: encoded[name] for name in
+                               ('original_digest', 'corrected_delta', 'issues_data', 'preview', 'issue_count')})
+            record['archived_at'] = archived_at
+            values.append(record)
+
+        ids = [row['id'] for row in rows]
+        connection.execute(ArchivedHistory.__table__.insert(), values)
+        connection.execute(delete(ParagraphResult.__table__).where(ParagraphResult.__table__.c.history_id.in_(ids)))
+        connection.execute(
+            update(ProofreadingJob.__table__).where(ProofreadingJob.__table__.c.history_id.in_(ids))
+            .values(history_id=None)
+        )
+        deleted = connection.execute(delete(history).where(history.c.id.in_(ids))).rowcount
+        if deleted == len(ids):
+            db.session.commit()
+            return len(ids)
+        # 期间有记录被并发删除：放弃这一批，重新读取
+        db.session.rollback()
+        logger.warning(f"History archive batch for user {user_id} changed concurrently, retrying")
+
+    logger.error(f"History archive batch for user {user_id} kept changing concurrently, "
+                 f"skipping the user's remaining rows in this run")
+    return 0
+
+
+def _hot_table_bytes(connection) -> Optional[int]:
+    """在线历史表及其索引占用的字节数；数据库不支持统计时返回 None"""
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        try:
+            return connection.execute(text(
+                "SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name IN "
+                "(SELECT name FROM sqlite_master WHERE tbl_name = 'proofreading_history')"
+            )).scalar()
+        except OperationalError:
+            # 未编译 dbstat 虚拟表
+            return None
+    if dialect == 'postgresql':
+        return connection.execute(text("SELECT pg_total_relation_size('proofreading_history')")).scalar()
+    return None
+
+
+def _vacuum_history():
+    """整理存储：SQLite 重建数据库文件，PostgreSQL 回收在线表的死元组供新行复用"""
+    db.session.commit()
+    dialect = db.engine.dialect.name
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        if dialect == 'sqlite':
+            connection.execute(text('VACUUM'))
+        elif dialect == 'postgresql':
+            connection.execute(text('VACUUM ANALYZE proofreading_history'))
@@ -1,49 +1,204 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
 from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import object_session
 import base64
 import hashlib
 import json
+import threading
+import time
+
+from .textstore import decode_corrected, encode_corrected, pack_text, text_digest, unpack_text
 
 db = SQLAlchemy()
 
 class CryptoHelper:
     """用于加密和解密API密钥的助手类"""
     
+    # Fernet 令牌本身已是 urlsafe base64，以版本字节 0x80 开头
+    TOKEN_PREFIX = 'gAAAAA'
+    
     @staticmethod
     def _get_key(password: str) -> bytes:
         """从密码生成加密密钥"""
         return base64.urlsafe_b64encode(hashlib.sha256(password.encode()).digest())
     
+    @staticmethod
+    @lru_cache(maxsize=16)
+    def get_fernet(encryption_password: str, previous_passwords: tuple = ()) -> MultiFernet:
+        """
+        获取（进程内缓存的）MultiFernet
+        
+        使用当前密码加密；解密时依次尝试当前密码与轮换前的旧密码。
+        """
+        passwords = (encryption_password,) + tuple(p for p in previous_passwords if p != encryption_password)
+        return MultiFernet([Fernet(CryptoHelper._get_key(p)) for p in passwords])
+    
+    @staticmethod
+    def _to_token(encrypted_api_key: str) -> bytes:
+        """兼容旧数据：早期版本在 Fernet 令牌外又做了一次 base64 编码"""
+        if encrypted_api_key.startswith(CryptoHelper.TOKEN_PREFIX):
+            return encrypted_api_key.encode()
+        return base64.urlsafe_b64decode(encrypted_api_key.encode())
+    
     @staticmethod
     def encrypt_api_key(api_key: str, encryption_password: str) -> str:
         """加密API密钥"""
-        key = CryptoHelper._get_key(encryption_password)
-        fernet = Fernet(key)
-        encrypted_key = fernet.encrypt(api_key.encode())
-        return base64.urlsafe_b64encode(encrypted_key).decode()
+        fernet = CryptoHelper.get_fernet(encryption_password)
+        return fernet.encrypt(api_key.encode()).decode()
     
     @staticmethod
-    def decrypt_api_key(encrypted_api_key: str, encryption_password: str) -> str:
+    def decrypt_api_key(encrypted_api_key: str, encryption_password: str,
+                        previous_passwords: tuple = ()) -> str:
         """解密API密钥"""
-        key = CryptoHelper._get_key(encryption_password)
-        fernet = Fernet(key)
-        encrypted_bytes = base64.urlsafe_b64decode(encrypted_api_key.encode())
-        decrypted_key = fernet.decrypt(encrypted_bytes)
-        return decrypted_key.decode()
+        fernet = CryptoHelper.get_fernet(encryption_password, tuple(previous_passwords))
+        return fernet.decrypt(CryptoHelper._to_token(encrypted_api_key)).decode()
+    
+    @staticmethod
+    def rotate_api_key(encrypted_api_key: str, encryption_password: str,
+                       previous_passwords: tuple = ()) -> Optional[str]:
+        """
+        用当前密码重新加密
+        
+        Returns:
+            新的密文；已经是当前密码加密的新格式密文时返回 None
+        """
+        token = CryptoHelper._to_token(encrypted_api_key)
+        if encrypted_api_key.startswith(CryptoHelper.TOKEN_PREFIX):
+            try:
+                CryptoHelper.get_fernet(encryption_password).decrypt(token)
+                return None
+            except InvalidToken:
+                pass
+        fernet = CryptoHelper.get_fernet(encryption_password, tuple(previous_passwords))
+        return fernet.rotate(token).decode()
+
+
+class DecryptedKeyCache:
+    """
+    已解密API密钥的短期内存缓存
+    
+    以 APIKey.id 为键，并以密文作为版本戳：密钥被修改（包括其他进程修改）后
+    密文随之变化，旧的缓存项不会再被命中。
+    """
+    
+    def __init__(self, ttl_seconds: float = 300):
+        self.ttl_seconds = ttl_seconds
+        self._items = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key_id: int, stamp: str) -> Optional[str]:
+        with self._lock:
+            item = self._items.get(key_id)
+            if item is None:
+                return None
+            item_stamp, plaintext, expires_at = item
+            if item_stamp != stamp or expires_at < time.monotonic():
+                del self._items[key_id]
+                return None
+            return plaintext
+    
+    def set(self, key_id: int, stamp: str, plaintext: str):
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._items[key_id] = (stamp, plaintext, time.monotonic() + self.ttl_seconds)
+    
+    def invalidate(self, key_id: int):
+        with self._lock:
+            self._items.pop(key_id, None)
+    
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+_decrypted_key_cache = None
+
+
+def get_decrypted_key_cache() -> DecryptedKeyCache:
+    """获取进程内共享的已解密密钥缓存"""
+    global _decrypted_key_cache
+    if _decrypted_key_cache is None:
+        from config import Config
+        _decrypted_key_cache = DecryptedKeyCache(Config.API_KEY_CACHE_TTL)
+    return _decrypted_key_cache
 
-class User(UserMixin, db.Model):
+class UserModelsMixin:
+    """用户（模型实例或缓存视图）共用的方法，子类提供 api_keys"""
+    
+    def get_available_models(self):
+        """获取用户可用的所有模型"""
+        from .catalog import get_model_catalog
+        snapshot = get_model_catalog().snapshot()
+        available_models = []
+        for api_key in self.api_keys:
+            available_models.extend(snapshot.user_entries(api_key.provider))
+        return available_models
+
+class APIKeyMixin:
+    """API密钥（模型实例或缓存视图）共用的方法，子类提供 id、provider、encrypted_api_key、enabled_models"""
+    
+    def get_api_key(self, encryption_password: str, previous_passwords: tuple = ()) -> str:
+        """获取解密的API密钥（短期缓存解密结果）"""
+        cache = get_decrypted_key_cache()
+        if self.id is not None:
+            plaintext = cache.get(self.id, self.encrypted_api_key)
+            if plaintext is not None:
+                return plaintext
+        
+        plaintext = CryptoHelper.decrypt_api_key(self.encrypted_api_key, encryption_password, previous_passwords)
+        if self.id is not None:
+            cache.set(self.id, self.encrypted_api_key, plaintext)
+        return plaintext
+    
+    def get_enabled_models(self) -> list:
+        """获取启用的模型列表"""
+        if self.enabled_models:
+            try:
+                return json.loads(self.enabled_models)
+            except json.JSONDecodeError:
+                return []
+        return []
+    
+    def get_available_models(self):
+        """获取此API密钥可用的模型"""
+        from .catalog import get_model_catalog
+        models = get_model_catalog().snapshot().provider_models(self.provider)['models']
+        enabled_models = set(self.get_enabled_models())
+        
+        # 如果没有设置启用的模型，返回所有模型
+        if not enabled_models:
+            return list(models)
+        return [model for model in models if model['id'] in enabled_models]
+    
+    def has_model(self, model_id: str) -> bool:
+        """模型是否在目录中且对此API密钥启用"""
+        from .catalog import get_model_catalog
+        if get_model_catalog().snapshot().get_model(self.provider, model_id) is None:
+            return False
+        enabled_models = self.get_enabled_models()
+        return not enabled_models or model_id in enabled_models
+
+class User(UserModelsMixin, UserMixin, db.Model):
     """用户模型"""
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     password_hash = db.Column(db.String(120), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    history_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # 校对历史条数，随增删维护
+    settings_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # API密钥变更时递增，用于失效各进程的用户缓存
     
     # 关联关系
     api_keys = db.relationship('APIKey', backref='user', lazy=True, cascade='all, delete-orphan')
     proofreading_history = db.relationship('ProofreadingHistory', backref='user', lazy=True, cascade='all, delete-orphan')
+    archived_history = db.relationship('ArchivedHistory', backref='user', lazy=True, cascade='all, delete-orphan')
+    proofreading_jobs = db.relationship('ProofreadingJob', backref='user', lazy=True, cascade='all, delete-orphan')
     
     def set_password(self, password):
         """设置密码（哈希存储）"""
@@ -53,31 +208,35 @@ class User(UserMixin, db.Model):
         """验证密码"""
         return check_password_hash(self.password_hash, password)
     
-    def get_available_models(self):
-        """获取用户可用的所有模型"""
-        from config import Config
-        available_models = []
-        
-        for api_key in self.api_keys:
-            provider_models = Config.get_provider_models(api_key.provider)
-            provider_name = Config.get_provider_name(api_key.provider)
-            
-            for model in provider_models.get('models', []):
-                available_models.append({
-                    'provider': api_key.provider,
-                    'provider_name': provider_name,
-                    'model_id': model['id'],
-                    'model_name': model['name'],
-                    'description': model['description'],
-                    'full_name': f"{provider_name} - {model['name']}"
-                })
-        
-        return available_models
+    @staticmethod
+    def bump_settings_version(connection, user_id: int):
+        """递增用户的设置版本号（可以在 flush 事件中调用）"""
+        connection.execute(
+            update(User.__table__)
+            .where(User.__table__.c.id == user_id)
+            .values(settings_version=User.__table__.c.settings_version + 1)
+        )
+    
+    @staticmethod
+    def get_history_count(user_id: int) -> int:
+        """读取用户的历史条数（current_user 是缓存的视图，不含随写入变化的计数）"""
+        return db.session.execute(
+            select(User.__table__.c.history_count).where(User.__table__.c.id == user_id)
+        ).scalar() or 0
+    
+    @staticmethod
+    def adjust_history_count(connection, user_id: int, delta: int):
+        """原子地增减用户的历史条数（可以在 flush 事件中调用）"""
+        connection.execute(
+            update(User.__table__)
+            .where(User.__table__.c.id == user_id)
+            .values(history_count=User.__table__.c.history_count + delta)
+        )
     
     def __repr__(self):
         return f'<User {self.username}>'
 
-class APIKey(db.Model):
+class APIKey(APIKeyMixin, db.Model):
     """API密钥模型"""
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -90,10 +249,8 @@ class APIKey(db.Model):
     def set_api_key(self, api_key: str, encryption_password: str):
         """设置加密的API密钥"""
         self.encrypted_api_key = CryptoHelper.encrypt_api_key(api_key, encryption_password)
-    
-    def get_api_key(self, encryption_password: str) -> str:
-        """获取解密的API密钥"""
-        return CryptoHelper.decrypt_api_key(self.encrypted_api_key, encryption_password)
+        if self.id is not None:
+            get_decrypted_key_cache().invalidate(self.id)
     
     def set_enabled_models(self, model_ids: list):
         """设置启用的模型列表"""
@@ -102,57 +259,481 @@ class APIKey(db.Model):
         else:
             self.enabled_models = None
     
-    def get_enabled_models(self) -> list:
-        """获取启用的模型列表"""
-        if self.enabled_models:
+    def __repr__(self):
+        return f'<APIKey {self.provider} for User {self.user_id}>'
+
+@event.listens_for(APIKey, 'after_delete')
+def _invalidate_deleted_api_key(mapper, connection, target):
+    """删除API密钥时清除其解密缓存"""
+    get_decrypted_key_cache().invalidate(target.id)
+
+@event.listens_for(APIKey, 'after_insert')
+@event.listens_for(APIKey, 'after_update')
+@event.listens_for(APIKey, 'after_delete')
+def _bump_user_settings_version(mapper, connection, target):
+    """API密钥变更时递增用户的设置版本号，并在提交后失效本进程的用户缓存"""
+    from .usercache import invalidate_after_commit
+    User.bump_settings_version(connection, target.user_id)
+    invalidate_after_commit(object_session(target), target.user_id)
+
+class AIModel(db.Model):
+    """模型目录中的一个模型；目录由 catalog.ModelCatalog 加载为各进程的只读快照"""
+    __tablename__ = 'ai_model'
+    __table_args__ = (
+        db.UniqueConstraint('provider', 'model_id', name='uq_ai_model_provider_model'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    provider = db.Column(db.String(50), nullable=False)
+    model_id = db.Column(db.String(100), nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.String(200), nullable=False, default='')
+    position = db.Column(db.Integer, nullable=False, default=0)  # 同一提供商内的显示顺序
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<AIModel {self.provider}/{self.model_id}>'
+
+class ModelCatalogVersion(db.Model):
+    """模型目录的版本号（只有一行）：每次修改目录时加一，各进程据此判断快照是否过期"""
+    __tablename__ = 'model_catalog_version'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+def _history_codec() -> str:
+    from config import Config
+    return Config.HISTORY_COMPRESSION
+
+
+def _insert_ignore(connection, table, values: dict):
+    """插入一行，主键已存在时忽略（并发写入相同内容时不报错）"""
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        statement = insert(table).values(**values).on_conflict_do_nothing()
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        statement = insert(table).values(**values).on_conflict_do_nothing()
+    elif dialect in ('mysql', 'mariadb'):
+        statement = table.insert().values(**values).prefix_with('IGNORE')
+    else:
+        statement = table.insert().values(**values)
+    connection.execute(statement)
+
+
+class TextBlob(db.Model):
+    """按内容寻址的文本存储：相同的原文只存一份"""
+    digest = db.Column(db.String(64), primary_key=True)  # 文本的 SHA-256
+    data = db.Column(db.LargeBinary, nullable=False)  # pack_text() 压缩后的内容
+    size = db.Column(db.Integer, nullable=False)  # 原文字符数
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @property
+    def text(self) -> str:
+        return unpack_text(self.data)
+    
+    @staticmethod
+    def intern(connection, text: str, codec: str = 'zlib') -> str:
+        """
+        存入文本（已存在则复用）并返回摘要
+        
+        直接在给定连接上执行，可以在 flush 事件中调用。
+        """
+        digest = text_digest(text)
+        table = TextBlob.__table__
+        exists = connection.execute(select(table.c.digest).where(table.c.digest == digest)).first()
+        if exists is None:
+            _insert_ignore(connection, table, {
+                'digest': digest,
+                'data': pack_text(text, codec),
+                'size': len(text),
+                'created_at': datetime.utcnow()
+            })
+        return digest
+    
+    def __repr__(self):
+        return f'<TextBlob {self.digest[:8]}>'
+
+def _read_stored_texts(connection, table, history_id: int) -> Optional[tuple]:
+    """从校对历史表（在线表或归档表）读取并解码一条记录的原文与修正文本"""
+    legacy = table.c.original_text if 'original_text' in table.c else None
+    columns = [table.c.original_digest, table.c.corrected_delta]
+    if legacy is not None:
+        columns += [table.c.original_text, table.c.corrected_text]
+    row = connection.execute(select(*columns).where(table.c.id == history_id)).first()
+    if row is None:
+        return None
+    digest, delta = row[0], row[1]
+    original, corrected = (row[2], row[3]) if legacy is not None else (None, None)
+    blob_data = None
+    if original is None:
+        blobs = TextBlob.__table__
+        blob_data = connection.execute(select(blobs.c.data).where(blobs.c.digest == digest)).scalar()
+    return ProofreadingHistory.decode_texts(original, corrected, blob_data, delta)
+
+
+class HistoryRecordMixin:
+    """校对历史（在线表与归档表）共用的只读方法，子类提供 original_text / corrected_text / issues_found"""
+    
+    def get_issues(self) -> list:
+        """获取解析后的问题列表"""
+        if self.issues_found:
             try:
-                return json.loads(self.enabled_models)
+                return json.loads(self.issues_found)
             except json.JSONDecodeError:
                 return []
         return []
     
-    def get_available_models(self):
-        """获取此API密钥可用的模型"""
+    def to_dict(self) -> dict:
+        """完整记录的字典表示（含全文与问题列表）"""
+        return {
+            'id': self.id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'provider': self.provider_used,
+            'model': self.model_used,
+            'model_name': self.get_model_display_name(),
+            'original_text': self.original_text,
+            'corrected_text': self.corrected_text,
+            'issues': self.get_issues()
+        }
+    
+    def get_model_display_name(self):
+        """获取模型的显示名称"""
         from config import Config
-        provider_models = Config.get_provider_models(self.provider)
-        enabled_models = self.get_enabled_models()
+        from .catalog import get_model_catalog
+        provider_name = Config.get_provider_name(self.provider_used)
+        model_info = get_model_catalog().snapshot().get_model(self.provider_used, self.model_used)
         
-        # 如果没有设置启用的模型，返回所有模型
-        if not enabled_models:
-            return provider_models.get('models', [])
+        if model_info:
+            return f"{provider_name} - {model_info['name']}"
+        else:
+            return f"{provider_name} - {self.model_used}"
+
+class ProofreadingHistory(HistoryRecordMixin, db.Model):
+    """
+    校对历史模型
+    
+    原文存于 text_blob（按内容去重），修正文本存为相对原文的差量，问题列表压缩存储；
+    original_text / corrected_text / issues_found 属性读写的仍是普通字符串。
+    迁移前写入的行保留在旧的明文列中，由 manage.py migrate-history-storage 分批转换。
+    列表页只读取 preview、issue_count 等元数据列，全文与问题列表在展开时按条加载。
+    """
+    PREVIEW_CHARS = 120
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    original_digest = db.Column(db.String(64), db.ForeignKey('text_blob.digest'), index=True)
+    corrected_delta = db.Column(db.LargeBinary)  # encode_corrected() 的结果
+    issues_data = db.Column(db.LargeBinary)  # pack_text() 压缩后的问题列表JSON
+    provider_used = db.Column(db.String(50), nullable=False)  # AI提供商
+    model_used = db.Column(db.String(100), nullable=False)  # 具体模型
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    preview = db.Column(db.String(200))  # 原文开头的摘要，供列表页显示
+    issue_count = db.Column(db.Integer)  # 发现的问题数
+    
+    # 旧格式的明文列，回填完成后为空
+    legacy_original_text = db.Column('original_text', db.Text)
+    legacy_corrected_text = db.Column('corrected_text', db.Text)
+    legacy_issues_found = db.Column('issues_found', db.Text)  # JSON格式存储发现的问题
+    
+    original_blob = db.relationship('TextBlob', lazy='select', viewonly=True)
+    
+    # 逐段落的校对结果，用于修订后再次校对时复用
+    paragraph_results = db.relationship('ParagraphResult', backref='history', lazy=True, cascade='all, delete-orphan')
+    
+    @staticmethod
+    def storage_values(connection, original_text: str, corrected_text: str,
+                       issues_found: Optional[str], codec: Optional[str] = None) -> dict:
+        """
+        把明文编码为存储列的取值（批量插入与回填使用）
+        
+        Returns:
+            dict: original_digest、corrected_delta、issues_data、列表摘要及清空的旧明文列
+        """
+        codec = codec or _history_codec()
+        return {
+            'original_digest': TextBlob.intern(connection, original_text, codec),
+            'corrected_delta': encode_corrected(original_text, corrected_text, codec),
+            'issues_data': pack_text(issues_found, codec) if issues_found is not None else None,
+            'preview': ProofreadingHistory.make_preview(original_text),
+            'issue_count': ProofreadingHistory.count_issues(issues_found),
+            'legacy_original_text': None,
+            'legacy_corrected_text': None,
+            'legacy_issues_found': None
+        }
+    
+    @staticmethod
+    def read_texts(connection, history_id: int) -> Optional[tuple]:
+        """
+        直接在连接上读取并解码一条记录的原文与修正文本（可以在 flush 事件中调用）
         
-        # 返回启用的模型
-        available = []
-        for model in provider_models.get('models', []):
-            if model['id'] in enabled_models:
-                available.append(model)
+        Returns:
+            tuple: (原文, 修正文本)；记录不存在时返回 None
+        """
+        return _read_stored_texts(connection, ProofreadingHistory.__table__, history_id)
+    
+    @staticmethod
+    def decode_texts(legacy_original: Optional[str], legacy_corrected: Optional[str],
+                     blob_data: Optional[bytes], corrected_delta: Optional[bytes]) -> tuple:
+        """
+        由存储列解码原文与修正文本（按列直接查询时使用，不经过模型实例）
         
-        return available
+        Returns:
+            tuple: (原文, 修正文本)
+        """
+        original = legacy_original
+        if original is None:
+            original = unpack_text(blob_data) if blob_data is not None else ''
+        corrected = legacy_corrected
+        if corrected is None:
+            corrected = decode_corrected(original, corrected_delta) if corrected_delta is not None else ''
+        return original, corrected
+    
+    @staticmethod
+    def make_preview(text: str) -> str:
+        """原文开头的摘要（空白折叠为单个空格）"""
+        preview = ' '.join(text[:ProofreadingHistory.PREVIEW_CHARS * 2].split())
+        if len(preview) > ProofreadingHistory.PREVIEW_CHARS:
+            preview = preview[:ProofreadingHistory.PREVIEW_CHARS] + '…'
+        return preview
+    
+    @staticmethod
+    def count_issues(issues_found: Optional[str]) -> int:
+        """问题列表JSON中的条数"""
+        if not issues_found:
+            return 0
+        try:
+            issues = json.loads(issues_found)
+        except json.JSONDecodeError:
+            return 0
+        return len(issues) if isinstance(issues, list) else 0
+    
+    @property
+    def original_text(self) -> str:
+        """原文"""
+        if getattr(self, '_original_plain', None) is None:
+            if self.legacy_original_text is not None:
+                self._original_plain = self.legacy_original_text
+            elif self.original_blob is not None:
+                self._original_plain = self.original_blob.text
+            else:
+                return ''
+        return self._original_plain
+    
+    @original_text.setter
+    def original_text(self, value: str):
+        if self.id is not None:
+            # 修正文本以原文为基准编码，替换原文前先解出修正文本
+            self.corrected_text = self.corrected_text
+        self._original_plain = value
+        self.preview = self.make_preview(value)
+        self._pending_encode = True
+        self.legacy_original_text = None
+        self.original_digest = None
+    
+    @property
+    def corrected_text(self) -> str:
+        """修正后的文本"""
+        if getattr(self, '_corrected_plain', None) is None:
+            if self.legacy_corrected_text is not None:
+                self._corrected_plain = self.legacy_corrected_text
+            elif self.corrected_delta is not None:
+                self._corrected_plain = decode_corrected(self.original_text, self.corrected_delta)
+            else:
+                return ''
+        return self._corrected_plain
+    
+    @corrected_text.setter
+    def corrected_text(self, value: str):
+        self._corrected_plain = value
+        self._pending_encode = True
+        self.legacy_corrected_text = None
+        self.corrected_delta = None
+    
+    @property
+    def issues_found(self) -> Optional[str]:
+        """发现的问题（JSON字符串）"""
+        if self.legacy_issues_found is not None:
+            return self.legacy_issues_found
+        if self.issues_data is not None:
+            return unpack_text(self.issues_data)
+        return None
+    
+    @issues_found.setter
+    def issues_found(self, value: Optional[str]):
+        self.legacy_issues_found = None
+        self.issues_data = pack_text(value, _history_codec()) if value is not None else None
+        self.issue_count = self.count_issues(value)
+    
+    def _encode_pending(self, connection):
+        """flush 时把通过属性写入的原文与修正文本编码到存储列"""
+        if not getattr(self, '_pending_encode', False):
+            return
+        codec = _history_codec()
+        original = self.original_text
+        self.original_digest = TextBlob.intern(connection, original, codec)
+        self.corrected_delta = encode_corrected(original, self.corrected_text, codec)
+        self._pending_encode = False
     
     def __repr__(self):
-        return f'<APIKey {self.provider} for User {self.user_id}>'
+        return f'<ProofreadingHistory {self.id} by User {self.user_id}>'
+
+@event.listens_for(ProofreadingHistory, 'before_insert')
+@event.listens_for(ProofreadingHistory, 'before_update')
+def _encode_history_texts(mapper, connection, target):
+    """写入前编码原文与修正文本"""
+    target._encode_pending(connection)
 
-class ProofreadingHistory(db.Model):
-    """校对历史模型"""
+# 历史列表按 (created_at, id) 游标分页，每页都是一次索引范围扫描
+db.Index('ix_proofreading_history_user_created', ProofreadingHistory.user_id,
+         ProofreadingHistory.created_at.desc(), ProofreadingHistory.id.desc())
+
+@event.listens_for(ProofreadingHistory, 'after_insert')
+def _count_inserted_history(mapper, connection, target):
+    User.adjust_history_count(connection, target.user_id, 1)
+
+@event.listens_for(ProofreadingHistory, 'after_delete')
+def _count_deleted_history(mapper, connection, target):
+    User.adjust_history_count(connection, target.user_id, -1)
+
+class ArchivedHistory(HistoryRecordMixin, db.Model):
+    """
+    归档的校对历史（冷表）
+    
+    超出保留策略的记录由 manage.py archive-history 从 proofreading_history 按原样搬入，保留原 id，
+    存储列的编码不变；之后只读不改。在线表因此只保留近期记录，索引可以常驻内存。
+    每个用户的归档记录都早于其在线记录，列表与导出按 (created_at, id) 顺序衔接两张表。
+    history_count 统计的是两张表的合计，搬移时不变。
+    """
+    __tablename__ = 'proofreading_history_archive'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # 沿用在线表中的 id
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    original_digest = db.Column(db.String(64), db.ForeignKey('text_blob.digest'), nullable=False)
+    corrected_delta = db.Column(db.LargeBinary)
+    issues_data = db.Column(db.LargeBinary)
+    provider_used = db.Column(db.String(50), nullable=False)
+    model_used = db.Column(db.String(100), nullable=False)
+    created_at = db.Column(db.DateTime)
+    preview = db.Column(db.String(200))
+    issue_count = db.Column(db.Integer)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    original_blob = db.relationship('TextBlob', lazy='select', viewonly=True)
+    
+    # 从在线表原样复制的列
+    COPIED_COLUMNS = ('id', 'user_id', 'original_digest', 'corrected_delta', 'issues_data',
+                      'provider_used', 'model_used', 'created_at', 'preview', 'issue_count')
+    
+    @staticmethod
+    def read_texts(connection, history_id: int) -> Optional[tuple]:
+        """直接在连接上读取并解码一条归档记录的原文与修正文本"""
+        return _read_stored_texts(connection, ArchivedHistory.__table__, history_id)
+    
+    @property
+    def original_text(self) -> str:
+        """原文"""
+        return self.original_blob.text if self.original_blob is not None else ''
+    
+    @property
+    def corrected_text(self) -> str:
+        """修正后的文本"""
+        if self.corrected_delta is None:
+            return ''
+        return decode_corrected(self.original_text, self.corrected_delta)
+    
+    @property
+    def issues_found(self) -> Optional[str]:
+        """发现的问题（JSON字符串）"""
+        return unpack_text(self.issues_data) if self.issues_data is not None else None
+    
+    def __repr__(self):
+        return f'<ArchivedHistory {self.id} by User {self.user_id}>'
+
+db.Index('ix_proofreading_history_archive_user_created', ArchivedHistory.user_id,
+         ArchivedHistory.created_at.desc(), ArchivedHistory.id.desc())
+
+@event.listens_for(ArchivedHistory, 'after_delete')
+def _count_deleted_archived_history(mapper, connection, target):
+    User.adjust_history_count(connection, target.user_id, -1)
+
+class ParagraphResult(db.Model):
+    """段落级校对结果（按段落指纹复用）"""
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'fingerprint', name='uq_paragraph_result_user_fingerprint'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    original_text = db.Column(db.Text, nullable=False)
+    history_id = db.Column(db.Integer, db.ForeignKey('proofreading_history.id', ondelete='CASCADE'), nullable=False, index=True)
+    fingerprint = db.Column(db.String(64), nullable=False)  # 段落文本+提供商+模型+提示词版本的摘要
     corrected_text = db.Column(db.Text, nullable=False)
-    issues_found = db.Column(db.Text)  # JSON格式存储发现的问题
-    provider_used = db.Column(db.String(50), nullable=False)  # AI提供商
-    model_used = db.Column(db.String(100), nullable=False)  # 具体模型
+    issues_found = db.Column(db.Text)  # JSON格式，offset 为相对段落起点的偏移
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    def get_model_display_name(self):
-        """获取模型的显示名称"""
-        from config import Config
-        provider_name = Config.get_provider_name(self.provider_used)
-        model_info = Config.get_model_info(self.provider_used, self.model_used)
-        
-        if model_info:
-            return f"{provider_name} - {model_info['name']}"
-        else:
-            return f"{provider_name} - {self.model_used}"
+    def get_issues(self) -> list:
+        """获取解析后的问题列表"""
+        if self.issues_found:
+            try:
+                return json.loads(self.issues_found)
+            except json.JSONDecodeError:
+                return []
+        return []
+    
+    def __repr__(self):
+        return f'<ParagraphResult {self.fingerprint[:8]} of History {self.history_id}>'
+
+class ProofreadingJob(db.Model):
+    """异步校对任务模型"""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    text = db.Column(db.Text, nullable=False)
+    provider = db.Column(db.String(50), nullable=False)
+    model = db.Column(db.String(100), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=STATUS_PENDING, index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    corrected_text = db.Column(db.Text)
+    issues_found = db.Column(db.Text)  # JSON格式存储发现的问题
+    error = db.Column(db.Text)
+    history_id = db.Column(db.Integer, db.ForeignKey('proofreading_history.id', ondelete='SET NULL'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    @property
+    def is_finished(self) -> bool:
+        """任务是否已结束（成功或失败）"""
+        return self.status in (self.STATUS_SUCCEEDED, self.STATUS_FAILED)
+    
+    def get_issues(self) -> list:
+        """获取解析后的问题列表"""
+        if self.issues_found:
+            try:
+                return json.loads(self.issues_found)
+            except json.JSONDecodeError:
+                return []
+        return []
+    
+    def to_dict(self) -> dict:
+        """任务状态的字典表示（不包含校对结果）"""
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'provider': self.provider,
+            'model': self.model,
+            'attempts': self.attempts,
+            'error': self.error,
+            'history_id': self.history_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
     
     def __repr__(self):
-        return f'<ProofreadingHistory {self.id} by User {self.user_id}>' 
\ No newline at end of file
+        return f'<ProofreadingJob {self.id} {self.status}>'
@@ -0,0 +1,331 @@
+"""
+灵犀校对平台 - 校对流程模块
+
+把"查找密钥 -> 校验模型 -> 调用AI服务 -> 保存历史"封装成可复用的流程，
+供同步接口与异步任务 Worker 共同使用。
+"""
+
+import json
+import logging
+
+from flask import current_app
+from sqlalchemy import insert
+
+from .models import db, APIKeyMixin, ProofreadingHistory, User
+from .search import index_histories
+from .usercache import get_user_cache
+from .ai_services import AI_SERVICES, BaseAIService, get_ai_service, ProofreadingResult
+from .cache import get_result_cache, make_cache_key, rebase_cached_result, to_cached_result
+from .chunking import needs_chunking, run_proofreading, run_proofreading_stream
+from .failover import failover_services
+from .hedging import choose_hedge_target, proofread_hedged
+from .incremental import (
+    plan_incremental, proofread_incremental, split_result_by_paragraph, store_paragraph_results
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ProofreadingError(Exception):
+    """校对请求错误（参数或配置问题），携带对应的HTTP状态码"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def result_error_message(result: ProofreadingResult) -> str:
+    """取出错误结果中的错误说明"""
+    for issue in result.issues:
+        if issue.get('explanation'):
+            return issue['explanation']
+    return '上游服务不可用'
+
+
+def validate_request(text: str, provider: str, model: str):
+    """校验校对请求的基本参数"""
+    validate_text(text)
+    validate_target(provider, model)
+
+
+def validate_text(text: str):
+    """校验待校对文本"""
+    if not text:
+        raise ProofreadingError('请输入要校对的文本')
+
+    max_length = current_app.config['MAX_TEXT_LENGTH']
+    if len(text) > max_length:
+        raise ProofreadingError(f'文本长度 {len(text)} 超过限制（最多 {max_length} 字符）', 413)
+
+
+def validate_target(provider: str, model: str):
+    """校验提供商与模型参数"""
+    if not provider:
+        raise ProofreadingError('请选择AI提供商')
+
+    if not model:
+        raise ProofreadingError('请选择AI模型')
+
+
+def resolve_api_key(user_id: int, provider: str, model: str) -> APIKeyMixin:
+    """
+    查找用户在指定提供商下的API密钥，并检查模型是否可用
+
+    密钥取自按用户缓存的只读视图（usercache），检查周期内不访问数据库。
+
+    Raises:
+        ProofreadingError: 未配置密钥或模型不可用
+    """
+    user = get_user_cache().get(user_id)
+    api_key_record = user.get_api_key_record(provider) if user is not None else None
+
+    if not api_key_record:
+        raise ProofreadingError(f'未找到 {provider} 的API密钥')
+
+    if not api_key_record.has_model(model):
+        raise ProofreadingError(f'模型 {model} 不可用')
+
+    return api_key_record
+
+
+def save_history(user_id: int, text: str, result: ProofreadingResult,
+                 provider: str, model: str):
+    """保存校对历史，失败时只记录日志并返回 None"""
+    try:
+        history = ProofreadingHistory(
+            user_id=user_id,
+            original_text=text,
+            corrected_text=result.corrected_text,
+            issues_found=json.dumps(result.issues, ensure_ascii=False),
+            provider_used=provider,
+            model_used=model
+        )
+        db.session.add(history)
+        db.session.commit()
+        return history
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to save proofreading history: {e}")
+        return None
+
+
+def save_histories(user_id: int, items, provider: str, model: str) -> int:
+    """
+    一次批量插入多条校对历史，失败时只记录日志
+
+    Args:
+        items: (原文, ProofreadingResult) 列表
+
+    Returns:
+        int: 写入的行数
+    """
+    if not items:
+        return 0
+
+    try:
+        # 批量插入不经过模型属性与 flush 事件，需要先把文本编码为存储列，并自行维护历史条数与检索索引
+        connection = db.session.connection()
+        rows = [dict(
+            ProofreadingHistory.storage_values(
+                connection, text, result.corrected_text, json.dumps(result.issues, ensure_ascii=False)
+            ),
+            user_id=user_id,
+            provider_used=provider,
+            model_used=model
+        ) for text, result in items]
+        history_ids = db.session.scalars(
+            insert(ProofreadingHistory).returning(ProofreadingHistory.id, sort_by_parameter_order=True), rows
+        ).all()
+        User.adjust_history_count(connection, user_id, len(rows))
+        index_histories(connection, [
+            (history_id, user_id, text, result.corrected_text)
+            for history_id, (text, result) in zip(history_ids, items)
+        ])
+        db.session.commit()
+        return len(rows)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to save proofreading histories: {e}")
+        return 0
+
+
+def build_service(api_key_record: APIKeyMixin, model: str) -> BaseAIService:
+    """解密API密钥并构造AI服务实例"""
+    api_key = api_key_record.get_api_key(
+        current_app.config['ENCRYPTION_KEY'],
+        current_app.config['ENCRYPTION_KEY_PREVIOUS']
+    )
+    service = get_ai_service(api_key_record.provider, api_key, api_key_record.base_url, model)
+    service.response_format = current_app.config['RESPONSE_FORMAT']
+    return service
+
+
+def make_result_cache_key(text: str, provider: str, model: str):
+    """结果缓存键；缓存禁用时为 None"""
+    if get_result_cache() is None:
+        return None
+    service_class = AI_SERVICES.get(provider, BaseAIService)
+    return make_cache_key(text, provider, model, service_class.get_prompt_version())
+
+
+def lookup_cached_result(text: str, provider: str, model: str):
+    """
+    查询结果缓存
+
+    Returns:
+        tuple: (缓存键, 命中的 ProofreadingResult 或 None)；缓存禁用时缓存键为 None
+    """
+    cache_key = make_result_cache_key(text, provider, model)
+    if cache_key is None:
+        return None, None
+    result = get_result_cache().get(cache_key)
+    return cache_key, rebase_cached_result(text, result) if result is not None else None
+
+
+def store_cached_result(cache_key, text: str, result: ProofreadingResult):
+    """把针对 text 的结果写入结果缓存"""
+    cache = get_result_cache()
+    if cache is not None and cache_key is not None:
+        cache.set(cache_key, to_cached_result(text, result))
+
+
+def proofread_for_user(user_id: int, text: str, provider: str, model: str, hedge: bool = False):
+    """
+    为指定用户执行一次完整的校对流程
+
+    相同文本、提供商、模型与提示词版本的结果直接取自缓存，命中时
+    result.from_cache 为 True，但仍会写入一条校对历史。
+
+    hedge 为 True 且文本无需分片时启用对冲请求：主模型超过其滚动 p95 耗时仍未返回，
+    就同时请求用户启用的另一个模型，采用先返回的有效结果。实际给出结果的
+    (提供商, 模型) 记录在 result.served_by 与校对历史中。
+
+    Args:
+        user_id: 用户ID
+        text: 待校对的文本
+        provider: AI提供商
+        model: 模型ID
+        hedge: 是否启用对冲请求
+
+    Returns:
+        tuple: (ProofreadingResult, ProofreadingHistory 或 None)
+    """
+    validate_request(text, provider, model)
+    api_key_record = resolve_api_key(user_id, provider, model)
+
+    cache_key, result = lookup_cached_result(text, provider, model)
+    if result is not None:
+        result.served_by = (provider, model)
+        return result, save_history(user_id, text, result, provider, model)
+
+    ai_service = build_service(api_key_record, model)
+    records = []
+    result = None
+    if hedge and current_app.config['HEDGE_ENABLED'] and not needs_chunking(text):
+        target = choose_hedge_target(user_id, provider, model)
+        result, provider, model = proofread_hedged(
+            ai_service, provider, model, text, target,
+            lambda t: build_service(t.api_key_record, t.model)
+        )
+        # 结果按实际给出结果的模型写入缓存
+        cache_key = make_result_cache_key(text, provider, model)
+    elif ai_service.get_circuit_breaker().available():
+        plan = plan_for_user(user_id, text, provider, model)
+        if plan is None:
+            result = run_proofreading(ai_service, provider, text)
+        else:
+            result, records = proofread_incremental(ai_service, provider, plan)
+
+    if result is None or result.is_error:
+        # 主提供商熔断或调用失败（对冲时主模型与对冲目标均失败）时改用用户的其他密钥
+        for backup_provider, backup_model, backup_service in failover_services(user_id, provider, build_service):
+            logger.info(f"Failing over from {provider}/{model} to {backup_provider}/{backup_model}")
+            backup_result = run_proofreading(backup_service, backup_provider, text)
+            if not backup_result.is_error:
+                result, provider, model, records = backup_result, backup_provider, backup_model, []
+                cache_key = make_result_cache_key(text, provider, model)
+                break
+        if result is None:
+            result = ai_service._create_error_result(text, "API错误", f"{provider} 暂时不可用（已熔断）")
+    result.served_by = (provider, model)
+    if result.is_error:
+        # 失败的结果既不作为校对历史，也不作为之后增量校对复用的基准
+        return result, None
+    store_cached_result(cache_key, text, result)
+
+    history = save_history(user_id, text, result, provider, model)
+    if history is not None:
+        store_paragraph_results(user_id, history.id, records)
+    return result, history
+
+
+def stream_proofreading_for_user(user_id: int, text: str, provider: str, model: str):
+    """
+    为指定用户执行流式校对
+
+    参数校验、缓存查询与服务构造在调用时立即完成（错误以 ProofreadingError 抛出），
+    返回的生成器逐个产出 ('issue', dict)，最后产出 ('result', ProofreadingResult)
+    并在此之前保存校对历史；结果为错误（result.is_error）时不保存。
+
+    Returns:
+        tuple: (事件生成器, 是否命中缓存)
+    """
+    validate_request(text, provider, model)
+    api_key_record = resolve_api_key(user_id, provider, model)
+
+    cache_key, cached = lookup_cached_result(text, provider, model)
+    if cached is not None:
+        cached.served_by = (provider, model)
+
+        def replay():
+            for issue in cached.issues:
+                yield 'issue', issue
+            save_history(user_id, text, cached, provider, model)
+            yield 'result', cached
+
+        return replay(), True
+
+    ai_service = build_service(api_key_record, model)
+    if not ai_service.get_circuit_breaker().available():
+        # 流式输出开始后无法再切换，只在开始前避开已熔断的上游
+        backup = next(failover_services(user_id, provider, build_service), None)
+        if backup is not None:
+            provider, model, ai_service = backup
+            cache_key = make_result_cache_key(text, provider, model)
+    plan = plan_for_user(user_id, text, provider, model)
+
+    def finish(result, records):
+        result.served_by = (provider, model)
+        if result.is_error:
+            return
+        store_cached_result(cache_key, text, result)
+        history = save_history(user_id, text, result, provider, model)
+        if history is not None:
+            store_paragraph_results(user_id, history.id, records)
+
+    def generate():
+        if plan is not None and plan.reusable:
+            # 只有改动过的段落需要请求AI服务，直接一次性给出合并结果
+            result, records = proofread_incremental(ai_service, provider, plan)
+            if not result.is_error:
+                for issue in result.issues:
+                    yield 'issue', issue
+            finish(result, records)
+            yield 'result', result
+            return
+
+        for event, payload in run_proofreading_stream(ai_service, provider, text):
+            if event == 'result':
+                finish(payload, split_result_by_paragraph(plan, payload) if plan is not None else [])
+            yield event, payload
+
+    return generate(), False
+
+
+def plan_for_user(user_id: int, text: str, provider: str, model: str):
+    """生成增量校对计划；未启用增量校对时返回 None"""
+    if not current_app.config.get('INCREMENTAL_ENABLED'):
+        return None
+    service_class = AI_SERVICES.get(provider, BaseAIService)
+    return plan_incremental(user_id, text, provider, model, service_class.get_prompt_version())
@@ -0,0 +1,318 @@
+"""
+灵犀校对平台 - 校对历史全文检索模块
+
+中文没有空格分词，文本按 n-gram 切分后交给数据库的全文索引：
+连续的中日韩字符切成重叠的二元组（每段末字另记一个单字），其他文字按单词切分并转小写。
+每条记录的词项前加上所属用户的标记词，检索时与查询词一起在倒排索引内求交，不必扫描其他用户的记录。
+
+- SQLite：无内容（contentless）FTS5 表 history_fts，只存倒排索引、不再保存一份正文；
+- PostgreSQL：history_search 表的 tsvector 列与 GIN 索引。
+
+索引随 ProofreadingHistory 的插入与删除增量维护；已有记录由 manage.py rebuild-search-index 建立索引。
+归档（ArchivedHistory）沿用原 id，搬移时索引不变，结果按 id 从在线表与归档表读取。
+摘要高亮在结果页对解码后的正文计算，每页只涉及几条记录。
+"""
+
+import logging
+import re
+from typing import List, Optional, Tuple
+
+from markupsafe import Markup, escape
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+from .models import db, ArchivedHistory, ProofreadingHistory
+
+logger = logging.getLogger(__name__)
+
+_CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff'
+_TOKEN_RE = re.compile(rf'[{_CJK}]+|[^\W_{_CJK}]+')
+_CJK_RE = re.compile(rf'[{_CJK}]')
+
+# 查询中的词数上限，避免构造过大的查询
+MAX_QUERY_TERMS = 8
+
+SNIPPET_BEFORE = 30
+SNIPPET_AFTER = 90
+
+
+class SearchError(Exception):
+    """检索不可用或查询无效"""
+
+
+def _owner_token(user_id: int) -> str:
+    return f'u{user_id}'
+
+
+def ngram_tokens(text_value: str) -> List[str]:
+    """
+    把文本切分为索引词项
+
+    连续的中日韩字符输出重叠二元组，并在每段末尾补一个单字，使任意单字都是某个词项的首字；
+    其他文字按单词输出。
+    """
+    tokens = []
+    for match in _TOKEN_RE.finditer(text_value.lower()):
+        run = match.group()
+        if _CJK_RE.match(run):
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            tokens.append(run[-1])
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def document_terms(user_id: int, original_text: str, corrected_text: str) -> str:
+    """一条校对历史的索引文档：用户标记 + 原文词项（+ 与原文不同时的修正文本词项）"""
+    tokens = [_owner_token(user_id)] + ngram_tokens(original_text)
+    if corrected_text != original_text:
+        tokens += ngram_tokens(corrected_text)
+    return ' '.join(tokens)
+
+
+def parse_query(query: str) -> List[Tuple[List[str], bool]]:
+    """
+    解析查询：以空白分隔的每个词都必须出现
+
+    Returns:
+        list: (词项序列, 是否按前缀匹配)；单个汉字与最后一个单词按前缀匹配
+    """
+    terms = []
+    for word in query.split()[:MAX_QUERY_TERMS]:
+        for match in _TOKEN_RE.finditer(word.lower()):
+            run = match.group()
+            if not _CJK_RE.match(run):
+                terms.append(([run], True))
+            elif len(run) == 1:
+                terms.append(([run], True))
+            else:
+                terms.append(([run[i:i + 2] for i in range(len(run) - 1)], False))
+    return terms
+
+
+class SQLiteSearchIndex:
+    """基于 FTS5 的检索索引"""
+
+    def ensure(self, connection):
+        connection.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS history_fts "
+            "USING fts5(owner, terms, content='', tokenize='unicode61')"
+        ))
+
+    def drop(self, connection):
+        connection.execute(text('DROP TABLE IF EXISTS history_fts'))
+
+    def clear(self, connection):
+        connection.execute(text("INSERT INTO history_fts(history_fts) VALUES ('delete-all')"))
+
+    def add(self, connection, history_id: int, user_id: int, original_text: str, corrected_text: str):
+        connection.execute(
+            text('INSERT INTO history_fts (rowid, owner, terms) VALUES (:id, :owner, :terms)'),
+            {'id': history_id, 'owner': _owner_token(user_id),
+             'terms': document_terms(user_id, original_text, corrected_text)}
+        )
+
+    def remove(self, connection, history_id: int, user_id: int, original_text: str, corrected_text: str):
+        # 无内容表删除时需要提供与写入时相同的词项
+        connection.execute(
+            text("INSERT INTO history_fts (history_fts, rowid, owner, terms) VALUES ('delete', :id, :owner, :terms)"),
+            {'id': history_id, 'owner': _owner_token(user_id),
+             'terms': document_terms(user_id, original_text, corrected_text)}
+        )
+
+    def match(self, connection, user_id: int, terms, before_id: Optional[int], limit: int) -> List[int]:
+        phrases = []
+        for tokens, prefix in terms:
+            phrases.append('"' + ' '.join(tokens) + '"' + ('*' if prefix else ''))
+        expression = f'owner : "{_owner_token(user_id)}" AND terms : ({" AND ".join(phrases)})'
+        sql = 'SELECT rowid FROM history_fts WHERE history_fts MATCH :expression'
+        if before_id is not None:
+            sql += ' AND rowid < :before_id'
+        sql += ' ORDER BY rowid DESC LIMIT :limit'
+        rows = connection.execute(text(sql), {'expression': expression, 'before_id': before_id, 'limit': limit})
+        return [row[0] for row in rows]
+
+
+class PostgresSearchIndex:
+    """基于 tsvector + GIN 的检索索引"""
+
+    def ensure(self, connection):
+        connection.execute(text(
+            'CREATE TABLE IF NOT EXISTS history_search ('
+            'history_id INTEGER PRIMARY KEY, '
+            'terms TSVECTOR NOT NULL)'
+        ))
+        connection.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_history_search_terms ON history_search USING GIN (terms)'
+        ))
+
+    def drop(self, connection):
+        connection.execute(text('DROP TABLE IF EXISTS history_search'))
+
+    def clear(self, connection):
+        connection.execute(text('DELETE FROM history_search'))
+
+    def add(self, connection, history_id: int, user_id: int, original_text: str, corrected_text: str):
+        # 只用词项是否出现（不做短语匹配），strip() 去掉位置信息，也避开 tsvector 的位置上限
+        connection.execute(
+            text("INSERT INTO history_search (history_id, terms) "
+                 "VALUES (:id, strip(to_tsvector('simple', :terms))) "
+                 "ON CONFLICT (history_id) DO UPDATE SET terms = EXCLUDED.terms"),
+            {'id': history_id, 'terms': document_terms(user_id, original_text, corrected_text)}
+        )
+
+    def remove(self, connection, history_id: int, user_id: int, original_text: str, corrected_text: str):
+        connection.execute(text('DELETE FROM history_search WHERE history_id = :id'), {'id': history_id})
+
+    def match(self, connection, user_id: int, terms, before_id: Optional[int], limit: int) -> List[int]:
+        parts = [_owner_token(user_id)]
+        for tokens, prefix in terms:
+            parts.extend(f"'{token}'" + (':*' if prefix else '') for token in tokens)
+        sql = "SELECT history_id FROM history_search WHERE terms @@ to_tsquery('simple', :query)"
+        if before_id is not None:
+            sql += ' AND history_id < :before_id'
+        sql += ' ORDER BY history_id DESC LIMIT :limit'
+        rows = connection.execute(text(sql), {'query': ' & '.join(parts), 'before_id': before_id, 'limit': limit})
+        return [row[0] for row in rows]
+
+
+_INDEXES = {'sqlite': SQLiteSearchIndex(), 'postgresql': PostgresSearchIndex()}
+
+# FTS5 不可用（SQLite 编译时未启用）时记录在此，检索直接报错而不影响写入
+_unavailable = set()
+
+
+def get_search_index(connection):
+    """当前数据库对应的检索索引，不支持时返回 None"""
+    dialect = connection.dialect.name
+    if dialect in _unavailable:
+        return None
+    return _INDEXES.get(dialect)
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_search_index(target, connection, **kw):
+    index = get_search_index(connection)
+    if index is None:
+        return
+    try:
+        index.ensure(connection)
+    except OperationalError as e:
+        logger.warning(f"Full-text search disabled: {e}")
+        _unavailable.add(connection.dialect.name)
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _drop_search_index(target, connection, **kw):
+    index = get_search_index(connection)
+    if index is not None:
+        index.drop(connection)
+
+
+@event.listens_for(ProofreadingHistory, 'after_insert')
+def _index_inserted_history(mapper, connection, target):
+    index = get_search_index(connection)
+    if index is not None:
+        index.add(connection, target.id, target.user_id, target.original_text, target.corrected_text)
+
+
+@event.listens_for(ProofreadingHistory, 'before_delete')
+@event.listens_for(ArchivedHistory, 'before_delete')
+def _unindex_deleted_history(mapper, connection, target):
+    index = get_search_index(connection)
+    if index is None:
+        return
+    texts = type(target).read_texts(connection, target.id)
+    if texts is not None:
+        index.remove(connection, target.id, target.user_id, *texts)
+
+
+def index_histories(connection, rows):
+    """
+    为批量写入的记录建立索引
+
+    Args:
+        rows: (id, user_id, 原文, 修正文本) 列表
+    """
+    index = get_search_index(connection)
+    if index is None:
+        return
+    for history_id, user_id, original_text, corrected_text in rows:
+        index.add(connection, history_id, user_id, original_text, corrected_text)
+
+
+def make_snippet(text_value: str, terms) -> Optional[Markup]:
+    """
+    截取第一个命中词附近的片段并高亮所有命中词
+
+    Returns:
+        Markup: 已转义的 HTML；正文中找不到任何查询词时返回 None
+    """
+    words = sorted({''.join(tokens[:1] + [t[-1] for t in tokens[1:]]) for tokens, _ in terms},
+                   key=len, reverse=True)
+    pattern = re.compile('|'.join(re.escape(word) for word in words), re.IGNORECASE)
+    first = pattern.search(text_value)
+    if first is None:
+        return None
+
+    start = max(0, first.start() - SNIPPET_BEFORE)
+    end = min(len(text_value), first.start() + SNIPPET_AFTER)
+    window = text_value[start:end]
+    parts = ['…' if start > 0 else '']
+    pos = 0
+    for match in pattern.finditer(window):
+        parts.append(str(escape(window[pos:match.start()])))
+        parts.append(f'<mark>{escape(match.group())}</mark>')
+        pos = match.end()
+    parts.append(str(escape(window[pos:])))
+    parts.append('…' if end < len(text_value) else '')
+    return Markup(' '.join(''.join(parts).split()))
+
+
+def search_history(user_id: int, query: str, cursor: Optional[str] = None,
+                   per_page: int = 10) -> Tuple[List[ProofreadingHistory], Optional[str]]:
+    """
+    检索用户的校对历史（含归档记录，按时间倒序，游标分页）
+
+    每条结果附带 snippet 属性（原文或修正文本中命中处的高亮片段）。
+
+    Args:
+        cursor: 上一页返回的游标（最后一条记录的 id）
+
+    Raises:
+        SearchError: 数据库不支持全文检索，或查询中没有可检索的文字
+
+    Returns:
+        tuple: (本页记录, 下一页游标；没有更多结果时为 None)
+    """
+    terms = parse_query(query)
+    if not terms:
+        raise SearchError('请输入要搜索的文字')
+
+    connection = db.session.connection()
+    index = get_search_index(connection)
+    if index is None:
+        raise SearchError('当前数据库不支持全文检索')
+
+    before_id = int(cursor) if cursor and cursor.isdigit() else None
+    ids = index.match(connection, user_id, terms, before_id, per_page + 1)
+    next_cursor = None
+    if len(ids) > per_page:
+        ids = ids[:per_page]
+        next_cursor = str(ids[-1])
+    if not ids:
+        return [], None
+
+    histories = ProofreadingHistory.query.filter(
+        ProofreadingHistory.id.in_(ids), ProofreadingHistory.user_id == user_id
+    ).all()
+    missing = set(ids) - {history.id for history in histories}
+    if missing:
+        histories += ArchivedHistory.query.filter(
+            ArchivedHistory.id.in_(missing), ArchivedHistory.user_id == user_id
+        ).all()
+    histories.sort(key=lambda history: history.id, reverse=True)
+    for history in histories:
+        history.snippet = make_snippet(history.original_text, terms) or \
+            make_snippet(history.corrected_text, terms) or history.preview
+    return histories, next_cursor
@@ -0,0 +1,106 @@
+"""
+灵犀校对平台 - 中文文本切分模块
+
+按段落、句子把长文档切分成不超过 token 预算的片段。所有片段都以
+原文中的字符区间表示，片段之间的空白保持原样，便于把各片段的校对结果
+按原顺序拼回，并把问题位置换算回原文偏移。
+"""
+
+import re
+from typing import List, NamedTuple
+
+from .ai_services.tokens import estimate_tokens
+
+# 句末标点（可跟随若干个右引号、右括号），或换行
+_SENTENCE_END = re.compile(r'[。！？；!?;…]+[”’」』）)》"\']*|\n')
+# 段落分隔：至少一个空行
+_PARAGRAPH_BREAK = re.compile(r'\n[ \t　]*\n\s*')
+
+
+class Span(NamedTuple):
+    """原文中的一个字符区间 [start, end)"""
+    start: int
+    end: int
+
+
+class Chunk(NamedTuple):
+    """待校对片段：原文区间及其内容（不含首尾空白）"""
+    start: int
+    end: int
+    text: str
+
+
+def split_paragraphs(text: str) -> List[Span]:
+    """按空行切分段落，返回去除首尾空白后的段落区间"""
+    spans = []
+    pos = 0
+    for match in _PARAGRAPH_BREAK.finditer(text):
+        spans.append(Span(pos, match.start()))
+        pos = match.end()
+    spans.append(Span(pos, len(text)))
+    return [span for span in (_strip_span(text, s) for s in spans) if span.end > span.start]
+
+
+def split_sentences(text: str, span: Span = None) -> List[Span]:
+    """在给定区间内按句末标点和换行切分句子"""
+    span = span or Span(0, len(text))
+    spans = []
+    pos = span.start
+    for match in _SENTENCE_END.finditer(text, span.start, span.end):
+        spans.append(Span(pos, match.end()))
+        pos = match.end()
+    if pos < span.end:
+        spans.append(Span(pos, span.end))
+    return [s for s in (_strip_span(text, s) for s in spans) if s.end > s.start]
+
+
+def chunk_text(text: str, max_tokens: int) -> List[Chunk]:
+    """
+    把文本切分成不超过 max_tokens 的片段
+
+    优先把完整段落合并到同一片段；单个段落超出预算时按句子切分，
+    单个句子仍超出预算时按字符硬切分。
+    """
+    pieces = []
+    for paragraph in split_paragraphs(text):
+        if estimate_tokens(text[paragraph.start:paragraph.end]) <= max_tokens:
+            pieces.append(paragraph)
+            continue
+        for sentence in split_sentences(text, paragraph):
+            if estimate_tokens(text[sentence.start:sentence.end]) <= max_tokens:
+                pieces.append(sentence)
+            else:
+                pieces.extend(_hard_split(text, sentence, max_tokens))
+
+    chunks = []
+    current = None
+    current_tokens = 0
+    for piece in pieces:
+        piece_tokens = estimate_tokens(text[piece.start:piece.end])
+        if current is not None and current_tokens + piece_tokens <= max_tokens:
+            current = Span(current.start, piece.end)
+            current_tokens += piece_tokens
+        else:
+            if current is not None:
+                chunks.append(Chunk(current.start, current.end, text[current.start:current.end]))
+            current = piece
+            current_tokens = piece_tokens
+    if current is not None:
+        chunks.append(Chunk(current.start, current.end, text[current.start:current.end]))
+    return chunks
+
+
+def _hard_split(text: str, span: Span, max_tokens: int) -> List[Span]:
+    """按字符数硬切分超长句子（每个字符至多约 1 个 token）"""
+    step = max(max_tokens, 1)
+    return [Span(start, min(start + step, span.end)) for start in range(span.start, span.end, step)]
+
+
+def _strip_span(text: str, span: Span) -> Span:
+    """去除区间首尾的空白字符"""
+    start, end = span
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return Span(start, end)
@@ -0,0 +1,157 @@
+"""
+灵犀校对平台 - 文本存储编码模块
+
+校对历史中的大文本在入库前编码：
+- 压缩：首字节为格式标记（原样 / zlib / zstd），较短的文本不压缩；
+- 差量：修正文本与原文通常只差几个字，存为相对原文的编辑列表，差量不划算时存全文；
+- 内容寻址：原文按 SHA-256 摘要存入 text_blob 表，相同原文只存一份。
+"""
+
+import difflib
+import hashlib
+import importlib.util
+import json
+import zlib
+from typing import List, Tuple
+
+# 压缩格式标记
+FORMAT_RAW = b'\x00'
+FORMAT_ZLIB = b'\x01'
+FORMAT_ZSTD = b'\x02'
+
+# 修正文本的存储方式标记
+KIND_FULL = b'F'
+KIND_DELTA = b'D'
+
+# 短于该字节数的文本压缩收益很小，原样存储
+COMPRESS_MIN_BYTES = 256
+
+# 行内做逐字比较的替换块长度上限，超过则整块替换（避免 SequenceMatcher 的平方复杂度）
+CHAR_DIFF_LIMIT = 4000
+
+# zstd 需要可选依赖 zstandard（pip install zstandard），未安装时只能使用 zlib
+ZSTD_AVAILABLE = importlib.util.find_spec('zstandard') is not None
+
+Edit = Tuple[int, int, str]
+
+
+def text_digest(text: str) -> str:
+    """文本内容的 SHA-256 摘要，用作 text_blob 的主键"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def pack_text(text: str, codec: str = 'zlib') -> bytes:
+    """
+    压缩文本
+
+    Args:
+        codec: zlib、zstd 或 none；zstd 不可用时退回 zlib
+
+    Returns:
+        bytes: 格式标记 + 数据；压缩后没有变小时原样存储
+    """
+    raw = text.encode('utf-8')
+    if codec == 'none' or len(raw) < COMPRESS_MIN_BYTES:
+        return FORMAT_RAW + raw
+
+    if codec == 'zstd' and ZSTD_AVAILABLE:
+        import zstandard
+        packed = FORMAT_ZSTD + zstandard.ZstdCompressor(level=10).compress(raw)
+    else:
+        packed = FORMAT_ZLIB + zlib.compress(raw, 6)
+    return packed if len(packed) <= len(raw) else FORMAT_RAW + raw
+
+
+def unpack_text(data: bytes) -> str:
+    """解压 pack_text() 的结果"""
+    data = bytes(data)
+    marker, payload = data[:1], data[1:]
+    if marker == FORMAT_RAW:
+        return payload.decode('utf-8')
+    if marker == FORMAT_ZLIB:
+        return zlib.decompress(payload).decode('utf-8')
+    if marker == FORMAT_ZSTD:
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError('数据使用 zstd 压缩，需要安装 zstandard')
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(payload).decode('utf-8')
+    raise ValueError(f'未知的文本存储格式: {marker!r}')
+
+
+def make_delta(original: str, corrected: str) -> List[Edit]:
+    """
+    计算把原文变为修正文本的编辑列表
+
+    先去掉相同的首尾，再按行比较定位改动的行块，最后在较短的块内逐字比较，
+    因此长文档的开销主要取决于改动量而不是全文长度。
+
+    Returns:
+        list: (start, end, replacement)，按 start 升序且互不重叠，位置为原文中的字符偏移
+    """
+    limit = min(len(original), len(corrected))
+    prefix = 0
+    while prefix < limit and original[prefix] == corrected[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and original[-1 - suffix] == corrected[-1 - suffix]:
+        suffix += 1
+
+    a_middle = original[prefix:len(original) - suffix]
+    b_middle = corrected[prefix:len(corrected) - suffix]
+    a_lines = a_middle.splitlines(keepends=True)
+    b_lines = b_middle.splitlines(keepends=True)
+    offsets = [prefix]
+    for line in a_lines:
+        offsets.append(offsets[-1] + len(line))
+
+    edits = []
+    matcher = difflib.SequenceMatcher(None, a_lines, b_lines)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        start, end = offsets[i1], offsets[i2]
+        old, new = original[start:end], ''.join(b_lines[j1:j2])
+        if tag == 'replace' and len(old) + len(new) <= CHAR_DIFF_LIMIT:
+            inner = difflib.SequenceMatcher(None, old, new, autojunk=False)
+            for inner_tag, k1, k2, l1, l2 in inner.get_opcodes():
+                if inner_tag != 'equal':
+                    edits.append((start + k1, start + k2, new[l1:l2]))
+        else:
+            edits.append((start, end, new))
+    return edits
+
+
+def apply_delta(original: str, edits) -> str:
+    """把 make_delta() 的编辑列表应用到原文"""
+    parts = []
+    pos = 0
+    for start, end, replacement in edits:
+        parts.append(original[pos:start])
+        parts.append(replacement)
+        pos = end
+    parts.append(original[pos:])
+    return ''.join(parts)
+
+
+def encode_corrected(original: str, corrected: str, codec: str = 'zlib') -> bytes:
+    """
+    编码修正文本：差量比全文短时存差量，否则存全文
+
+    Returns:
+        bytes: 存储方式标记 + pack_text() 的结果
+    """
+    delta = json.dumps(make_delta(original, corrected), ensure_ascii=False, separators=(',', ':'))
+    if len(delta) < len(corrected):
+        return KIND_DELTA + pack_text(delta, codec)
+    return KIND_FULL + pack_text(corrected, codec)
+
+
+def decode_corrected(original: str, data: bytes) -> str:
+    """解码 encode_corrected() 的结果"""
+    data = bytes(data)
+    kind, payload = data[:1], data[1:]
+    if kind == KIND_FULL:
+        return unpack_text(payload)
+    if kind == KIND_DELTA:
+        return apply_delta(original, json.loads(unpack_text(payload)))
+    raise ValueError(f'未知的修正文本存储方式: {kind!r}')
@@ -0,0 +1,179 @@
+"""
+灵犀校对平台 - 用户视图缓存模块
+
+每个已登录请求都要加载用户（Flask-Login 的 user_loader），校对请求还要查找API密钥、
+检查模型是否启用。这些数据很少变化，按用户缓存为只读视图（CachedUser / CachedAPIKey）：
+进程内 LRU，条目在 USER_CACHE_CHECK_SECONDS 秒内直接使用，之后读取一次 user.settings_version
+（单行主键查询），版本号未变则继续使用，变化时重新加载。
+
+API密钥的增删改在同一事务中递增 settings_version（见 models.py 中的 flush 事件），
+提交后本进程的缓存项立即失效，其他进程在一个检查周期内发现版本号变化。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from flask import current_app
+from flask_login import UserMixin
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from .models import db, APIKey, APIKeyMixin, User, UserModelsMixin
+
+
+class CachedAPIKey(APIKeyMixin):
+    """APIKey 的只读视图（含密文，解密结果由 DecryptedKeyCache 缓存）"""
+
+    def __init__(self, key_id: int, user_id: int, provider: str, encrypted_api_key: str,
+                 base_url: Optional[str], enabled_models: Optional[str]):
+        self.id = key_id
+        self.user_id = user_id
+        self.provider = provider
+        self.encrypted_api_key = encrypted_api_key
+        self.base_url = base_url
+        self.enabled_models = enabled_models
+        self._enabled = tuple(APIKeyMixin.get_enabled_models(self))
+
+    def get_enabled_models(self) -> list:
+        return list(self._enabled)
+
+    def __repr__(self):
+        return f'<CachedAPIKey {self.provider} for User {self.user_id}>'
+
+
+class CachedUser(UserModelsMixin, UserMixin):
+    """已登录用户的只读视图，作为 current_user 使用"""
+
+    def __init__(self, user_id: int, username: str, settings_version: int, api_keys: Tuple[CachedAPIKey, ...]):
+        self.id = user_id
+        self.username = username
+        self.settings_version = settings_version
+        self.api_keys = api_keys  # 按 id 排序
+        self._keys_by_provider: Dict[str, CachedAPIKey] = {}
+        for api_key in api_keys:
+            self._keys_by_provider.setdefault(api_key.provider, api_key)
+
+    def get_api_key_record(self, provider: str) -> Optional[CachedAPIKey]:
+        """该提供商的API密钥，未配置时返回 None"""
+        return self._keys_by_provider.get(provider)
+
+    def __repr__(self):
+        return f'<CachedUser {self.username}>'
+
+
+class UserCache:
+    """按用户ID缓存 CachedUser，以 settings_version 判断是否过期"""
+
+    def __init__(self, max_items: int = 4096, check_seconds: float = 5.0):
+        self.max_items = max_items
+        self.check_seconds = check_seconds
+        self._items: 'OrderedDict[int, Tuple[CachedUser, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[CachedUser]:
+        """
+        获取用户视图；用户不存在时返回 None
+
+        需要应用上下文。检查周期内不访问数据库。
+        """
+        with self._lock:
+            entry = self._items.get(user_id)
+            if entry is not None:
+                self._items.move_to_end(user_id)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+
+        users = User.__table__
+        version = db.session.execute(
+            select(users.c.settings_version).where(users.c.id == user_id)
+        ).scalar()
+        if version is None:
+            self.invalidate(user_id)
+            return None
+        view = entry[0] if entry is not None and entry[0].settings_version == version else _load_user(user_id)
+        if view is None:
+            return None
+        self._put(view)
+        return view
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._items.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def _put(self, view: CachedUser):
+        with self._lock:
+            self._items[view.id] = (view, time.monotonic() + self.check_seconds)
+            self._items.move_to_end(view.id)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+
+def _load_user(user_id: int) -> Optional[CachedUser]:
+    # 版本号随用户行先于密钥读取：加载期间若有修改，下次检查时版本号不同，会再加载一次
+    users = User.__table__
+    row = db.session.execute(
+        select(users.c.id, users.c.username, users.c.settings_version).where(users.c.id == user_id)
+    ).first()
+    if row is None:
+        return None
+    keys = APIKey.__table__
+    api_keys = tuple(
+        CachedAPIKey(key.id, user_id, key.provider, key.encrypted_api_key, key.base_url, key.enabled_models)
+        for key in db.session.execute(
+            select(keys.c.id, keys.c.provider, keys.c.encrypted_api_key, keys.c.base_url, keys.c.enabled_models)
+            .where(keys.c.user_id == user_id).order_by(keys.c.id)
+        )
+    )
+    return CachedUser(row.id, row.username, row.settings_version, api_keys)
+
+
+def invalidate_after_commit(session: Optional[Session], user_id: int):
+    """
+    立即并在事务提交后再次失效用户的缓存项（可以在 flush 事件中调用）
+
+    提交前另一个线程可能按旧数据重新加载，提交后的第二次失效保证本进程不会沿用旧视图。
+    """
+    cache = _cache
+    if cache is not None:
+        cache.invalidate(user_id)
+    if session is not None:
+        session.info.setdefault('invalidated_users', set()).add(user_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_users(session):
+    user_ids = session.info.pop('invalidated_users', None)
+    if user_ids and _cache is not None:
+        for user_id in user_ids:
+            _cache.invalidate(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_invalidated_users(session):
+    session.info.pop('invalidated_users', None)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_user_cache() -> UserCache:
+    """获取当前进程共享的 UserCache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                config = current_app.config
+                _cache = UserCache(config['USER_CACHE_MAX_ITEMS'], config['USER_CACHE_CHECK_SECONDS'])
+    return _cache
+
+
+def load_cached_user(user_id: int) -> Optional[CachedUser]:
+    """Flask-Login 的 user_loader"""
+    return get_user_cache().get(user_id)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+灵犀校对平台 - 运维管理命令
+"""
+
+import os
+import sys
+import argparse
+
+# 添加 lingxi 模块到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lingxi'))
+
+from lingxi.app import app
+from lingxi import maintenance
+
+
+def rotate_keys(args):
+    """用当前 ENCRYPTION_KEY 重新加密全部API密钥"""
+    with app.app_context():
+        stats = maintenance.rotate_api_keys(
+            app.config['ENCRYPTION_KEY'],
+            app.config['ENCRYPTION_KEY_PREVIOUS'],
+            batch_size=args.batch_size,
+            progress=lambda last_id, rotated: print(f"  已处理至 ID {last_id}，重新加密 {rotated} 条")
+        )
+    print(f"✓ 密钥轮换完成：重新加密 {stats['rotated']} 条，"
+          f"跳过 {stats['skipped']} 条，并发修改 {stats['conflicts']} 条")
+
+
+def migrate_history(args):
+    """把旧格式的校对历史转换为去重、差量与压缩存储"""
+    with app.app_context():
+        stats = maintenance.migrate_history_storage(
+            batch_size=args.batch_size,
+            codec=args.codec,
+            progress=lambda last_id, migrated: print(f"  已处理至 ID {last_id}，转换 {migrated} 条")
+        )
+    print(f"✓ 历史记录存储迁移完成：转换 {stats['migrated']} 条，并发修改 {stats['conflicts']} 条")
+
+
+def backfill_summaries(args):
+    """为已有的校对历史填充列表摘要与问题数"""
+    with app.app_context():
+        stats = maintenance.backfill_history_summaries(
+            batch_size=args.batch_size,
+            progress=lambda last_id, filled: print(f"  已处理至 ID {last_id}，填充 {filled} 条")
+        )
+    print(f"✓ 历史记录摘要回填完成：填充 {stats['filled']} 条")
+
+
+def rebuild_search(args):
+    """清空并重建校对历史的全文检索索引"""
+    with app.app_context():
+        stats = maintenance.rebuild_search_index(
+            batch_size=args.batch_size,
+            progress=lambda last_id, indexed: print(f"  已处理至 ID {last_id}，建立索引 {indexed} 条")
+        )
+    print(f"✓ 检索索引重建完成：{stats['indexed']} 条")
+
+
+def archive_history(args):
+    """按保留策略把旧的校对历史搬入归档表"""
+    def format_bytes(value):
+        return '未知' if value is None else f"{value / 1024 / 1024:.1f} MB"
+
+    with app.app_context():
+        try:
+            stats = maintenance.archive_histories(
+                retention_days=args.days if args.days is not None else app.config['HISTORY_RETENTION_DAYS'],
+                hot_rows_per_user=args.keep if args.keep is not None else app.config['HISTORY_HOT_ROWS_PER_USER'],
+                batch_size=args.batch_size,
+                vacuum=args.vacuum,
+                progress=lambda user_id, archived: print(f"  已处理至用户 {user_id}，归档 {archived} 条")
+            )
+        except ValueError as e:
+            print(f"✗ {e}")
+            sys.exit(1)
+    print(f"✓ 历史记录归档完成：归档 {stats['archived']} 条，在线表剩余 {stats['hot_rows']} 条")
+    print(f"  在线表占用 {format_bytes(stats['hot_bytes_before'])} → {format_bytes(stats['hot_bytes_after'])}，"
+          f"回收 {format_bytes(stats['reclaimed_bytes'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='灵犀校对平台运维管理命令')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    rotate = subparsers.add_parser('rotate-keys', help='用当前 ENCRYPTION_KEY 重新加密全部API密钥')
+    rotate.add_argument('--batch-size', type=int, default=100, help='每批处理的行数（默认 100）')
+    rotate.set_defaults(func=rotate_keys)
+
+    migrate = subparsers.add_parser('migrate-history-storage',
+                                    help='把旧格式的校对历史转换为去重、差量与压缩存储（先执行 flask db upgrade）')
+    migrate.add_argument('--batch-size', type=int, default=200, help='每批处理的行数（默认 200）')
+    migrate.add_argument('--codec', choices=['zlib', 'zstd', 'none'], help='压缩格式（默认取 HISTORY_COMPRESSION）')
+    migrate.set_defaults(func=migrate_history)
+
+    summaries = subparsers.add_parser('backfill-history-summaries',
+                                      help='为已有的校对历史填充列表摘要与问题数（先执行 flask db upgrade）')
+    summaries.add_argument('--batch-size', type=int, default=200, help='每批处理的行数（默认 200）')
+    summaries.set_defaults(func=backfill_summaries)
+
+    search = subparsers.add_parser('rebuild-search-index', help='清空并重建校对历史的全文检索索引')
+    search.add_argument('--batch-size', type=int, default=200, help='每批处理的行数（默认 200）')
+    search.set_defaults(func=rebuild_search)
+
+    archive = subparsers.add_parser('archive-history',
+                                    help='按保留策略把旧的校对历史搬入归档表（先执行 flask db upgrade）')
+    archive.add_argument('--days', type=int, help='在线表保留的天数（默认取 HISTORY_RETENTION_DAYS）')
+    archive.add_argument('--keep', type=int, help='每个用户在线表保留的最近条数（默认取 HISTORY_HOT_ROWS_PER_USER）')
+    archive.add_argument('--batch-size', type=int, default=200, help='每批处理的行数（默认 200）')
+    archive.add_argument('--vacuum', action='store_true', help='完成后整理数据库文件，把空出的空间还给文件系统')
+    archive.set_defaults(func=archive_history)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
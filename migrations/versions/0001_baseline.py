@@ -0,0 +1,59 @@
+"""baseline schema
+
+引入 Flask-Migrate 之前由 db.create_all() 创建的表结构。
+已有数据库先执行 `flask db stamp 0001_baseline` 标记为此版本，再 `flask db upgrade`。
+
+Revision ID: 0001_baseline
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_baseline'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(length=80), nullable=False),
+    sa.Column('password_hash', sa.String(length=120), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('username')
+    )
+    op.create_table('api_key',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('provider', sa.String(length=50), nullable=False),
+    sa.Column('encrypted_api_key', sa.Text(), nullable=False),
+    sa.Column('base_url', sa.String(length=200), nullable=True),
+    sa.Column('enabled_models', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('proofreading_history',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('original_text', sa.Text(), nullable=False),
+    sa.Column('corrected_text', sa.Text(), nullable=False),
+    sa.Column('issues_found', sa.Text(), nullable=True),
+    sa.Column('provider_used', sa.String(length=50), nullable=False),
+    sa.Column('model_used', sa.String(length=100), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('proofreading_history')
+    op.drop_table('api_key')
+    op.drop_table('user')
@@ -0,0 +1,56 @@
+"""proofreading job queue
+
+异步校对任务表。Worker 按 status 领取任务，超过租约的运行中任务重新入队。
+
+Revision ID: 0001a_proofreading_job
+Revises: 0001_baseline
+Create Date: 2026-10-18 09:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001a_proofreading_job'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 应用启动时的 db.create_all() 可能已经建好了该表
+    if not sa.inspect(op.get_bind()).has_table('proofreading_job'):
+        _create_proofreading_job_table()
+
+
+def _create_proofreading_job_table():
+    op.create_table('proofreading_job',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('text', sa.Text(), nullable=False),
+    sa.Column('provider', sa.String(length=50), nullable=False),
+    sa.Column('model', sa.String(length=100), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('corrected_text', sa.Text(), nullable=True),
+    sa.Column('issues_found', sa.Text(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('history_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['history_id'], ['proofreading_history.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_proofreading_job_created_at'), 'proofreading_job', ['created_at'], unique=False)
+    op.create_index(op.f('ix_proofreading_job_status'), 'proofreading_job', ['status'], unique=False)
+    op.create_index(op.f('ix_proofreading_job_user_id'), 'proofreading_job', ['user_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_proofreading_job_user_id'), table_name='proofreading_job')
+    op.drop_index(op.f('ix_proofreading_job_status'), table_name='proofreading_job')
+    op.drop_index(op.f('ix_proofreading_job_created_at'), table_name='proofreading_job')
+    op.drop_table('proofreading_job')
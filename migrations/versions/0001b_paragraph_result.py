@@ -0,0 +1,46 @@
+"""paragraph results for incremental proofreading
+
+按段落指纹保存的校对结果，修订稿再次校对时复用未改动段落的结果。
+
+Revision ID: 0001b_paragraph_result
+Revises: 0001a_proofreading_job
+Create Date: 2026-10-18 09:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001b_paragraph_result'
+down_revision = '0001a_proofreading_job'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 应用启动时的 db.create_all() 可能已经建好了该表
+    if not sa.inspect(op.get_bind()).has_table('paragraph_result'):
+        _create_paragraph_result_table()
+
+
+def _create_paragraph_result_table():
+    op.create_table('paragraph_result',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('history_id', sa.Integer(), nullable=False),
+    sa.Column('fingerprint', sa.String(length=64), nullable=False),
+    sa.Column('corrected_text', sa.Text(), nullable=False),
+    sa.Column('issues_found', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['history_id'], ['proofreading_history.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'fingerprint', name='uq_paragraph_result_user_fingerprint')
+    )
+    op.create_index(op.f('ix_paragraph_result_history_id'), 'paragraph_result', ['history_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_paragraph_result_history_id'), table_name='paragraph_result')
+    op.drop_table('paragraph_result')
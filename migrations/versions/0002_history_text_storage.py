@@ -0,0 +1,54 @@
+"""history text storage: content-addressed originals, corrected deltas, compression
+
+新增 text_blob 表与 proofreading_history 的存储列，旧的明文列改为可空并保留。
+升级后应用即按新格式写入、兼容读取旧行；旧行由 `python manage.py migrate-history-storage`
+在线分批转换，转换完成前不要删除旧列。
+
+Revision ID: 0002_history_text_storage
+Revises: 0001b_paragraph_result
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_history_text_storage'
+down_revision = '0001b_paragraph_result'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 应用启动时的 db.create_all() 可能已经建好了新表
+    if not sa.inspect(op.get_bind()).has_table('text_blob'):
+        op.create_table('text_blob',
+        sa.Column('digest', sa.String(length=64), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('digest')
+        )
+    with op.batch_alter_table('proofreading_history', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('original_digest', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('corrected_delta', sa.LargeBinary(), nullable=True))
+        batch_op.add_column(sa.Column('issues_data', sa.LargeBinary(), nullable=True))
+        batch_op.alter_column('original_text', existing_type=sa.Text(), nullable=True)
+        batch_op.alter_column('corrected_text', existing_type=sa.Text(), nullable=True)
+        batch_op.create_index(batch_op.f('ix_proofreading_history_original_digest'), ['original_digest'], unique=False)
+        batch_op.create_foreign_key('fk_proofreading_history_original_digest', 'text_blob',
+                                    ['original_digest'], ['digest'])
+
+
+def downgrade():
+    # 降级前需确保所有行仍有明文列（即尚未执行 migrate-history-storage，或已自行还原）
+    with op.batch_alter_table('proofreading_history', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_proofreading_history_original_digest', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_proofreading_history_original_digest'))
+        batch_op.alter_column('corrected_text', existing_type=sa.Text(), nullable=False)
+        batch_op.alter_column('original_text', existing_type=sa.Text(), nullable=False)
+        batch_op.drop_column('issues_data')
+        batch_op.drop_column('corrected_delta')
+        batch_op.drop_column('original_digest')
+    op.drop_table('text_blob')
@@ -0,0 +1,38 @@
+"""history keyset pagination: composite index and per-user history count
+
+新增 (user_id, created_at DESC, id DESC) 复合索引供游标分页使用，
+以及随增删维护的 user.history_count，升级时按现有数据回填一次。
+
+Revision ID: 0003_history_keyset_pagination
+Revises: 0002_history_text_storage
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_history_keyset_pagination'
+down_revision = '0002_history_text_storage'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('history_count', sa.Integer(), nullable=False, server_default='0'))
+
+    op.create_index('ix_proofreading_history_user_created', 'proofreading_history',
+                    ['user_id', sa.text('created_at DESC'), sa.text('id DESC')], unique=False)
+
+    op.execute(
+        'UPDATE "user" SET history_count = '
+        '(SELECT COUNT(*) FROM proofreading_history WHERE proofreading_history.user_id = "user".id)'
+    )
+
+
+def downgrade():
+    op.drop_index('ix_proofreading_history_user_created', table_name='proofreading_history')
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('history_count')
@@ -0,0 +1,32 @@
+"""history list summary: preview and issue count columns
+
+列表页只读取元数据，新增原文摘要 preview 与问题数 issue_count。
+新写入的行自动填充；已有行由 `python manage.py backfill-history-summaries` 在线分批回填，
+回填完成前这些行在列表中不显示摘要与问题数。
+
+Revision ID: 0004_history_list_summary
+Revises: 0003_history_keyset_pagination
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_history_list_summary'
+down_revision = '0003_history_keyset_pagination'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('proofreading_history', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('preview', sa.String(length=200), nullable=True))
+        batch_op.add_column(sa.Column('issue_count', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('proofreading_history', schema=None) as batch_op:
+        batch_op.drop_column('issue_count')
+        batch_op.drop_column('preview')
@@ -0,0 +1,43 @@
+"""history full-text search index
+
+SQLite 使用无内容 FTS5 表 history_fts，PostgreSQL 使用 history_search 表（tsvector + GIN）。
+新写入的记录自动建立索引；已有记录执行 `python manage.py rebuild-search-index` 建立索引。
+
+Revision ID: 0005_history_search_index
+Revises: 0004_history_list_summary
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_history_search_index'
+down_revision = '0004_history_list_summary'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS history_fts "
+            "USING fts5(owner, terms, content='', tokenize='unicode61')"
+        )
+    elif dialect == 'postgresql':
+        # 与 PostgresSearchIndex.ensure() 一致不设外键：归档的记录离开在线表后仍保留在索引中
+        op.execute(
+            'CREATE TABLE IF NOT EXISTS history_search ('
+            'history_id INTEGER PRIMARY KEY, '
+            'terms TSVECTOR NOT NULL)'
+        )
+        op.execute('CREATE INDEX IF NOT EXISTS ix_history_search_terms ON history_search USING GIN (terms)')
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute('DROP TABLE IF EXISTS history_fts')
+    elif dialect == 'postgresql':
+        op.execute('DROP TABLE IF EXISTS history_search')
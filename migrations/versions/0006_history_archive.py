@@ -0,0 +1,57 @@
+"""history archive: cold table for records past the retention policy
+
+新增 proofreading_history_archive 冷表，超出保留策略（HISTORY_RETENTION_DAYS、
+HISTORY_HOT_ROWS_PER_USER）的记录由 `python manage.py archive-history` 分批从在线表搬入。
+归档记录沿用原 id 并保留在全文检索索引中，PostgreSQL 的 history_search 因此不能以外键级联删除。
+
+Revision ID: 0006_history_archive
+Revises: 0005_history_search_index
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_history_archive'
+down_revision = '0005_history_search_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 应用启动时的 db.create_all() 可能已经建好了新表
+    if not sa.inspect(op.get_bind()).has_table('proofreading_history_archive'):
+        _create_archive_table()
+
+    if op.get_bind().dialect.name == 'postgresql':
+        # 早先版本的 0005 为 history_search 建了级联删除的外键
+        op.execute('ALTER TABLE history_search DROP CONSTRAINT IF EXISTS history_search_history_id_fkey')
+
+
+def _create_archive_table():
+    op.create_table(
+        'proofreading_history_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('original_digest', sa.String(length=64), nullable=False),
+        sa.Column('corrected_delta', sa.LargeBinary(), nullable=True),
+        sa.Column('issues_data', sa.LargeBinary(), nullable=True),
+        sa.Column('provider_used', sa.String(length=50), nullable=False),
+        sa.Column('model_used', sa.String(length=100), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('preview', sa.String(length=200), nullable=True),
+        sa.Column('issue_count', sa.Integer(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['original_digest'], ['text_blob.digest'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_proofreading_history_archive_user_created', 'proofreading_history_archive',
+                    ['user_id', sa.text('created_at DESC'), sa.text('id DESC')], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_proofreading_history_archive_user_created', table_name='proofreading_history_archive')
+    op.drop_table('proofreading_history_archive')
@@ -0,0 +1,54 @@
+"""model catalog: persisted AI model list with a version counter
+
+模型目录从进程内的 Config.AI_MODELS 移到 ai_model 表，升级时写入 Config.AI_MODELS 作为初始目录。
+model_catalog_version 只有一行版本号，每次修改目录时加一，各 Worker 据此重新加载快照。
+升级前通过 /api/models/add 等接口在进程内做的修改本来就不会持久化，需要重新添加。
+
+Revision ID: 0007_model_catalog
+Revises: 0006_history_archive
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from lingxi.catalog import initial_catalog_rows
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_model_catalog'
+down_revision = '0006_history_archive'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 应用启动时的 db.create_all() 可能已经建好并写入了初始目录
+    if sa.inspect(op.get_bind()).has_table('model_catalog_version'):
+        return
+
+    ai_model = op.create_table(
+        'ai_model',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('provider', sa.String(length=50), nullable=False),
+        sa.Column('model_id', sa.String(length=100), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('description', sa.String(length=200), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('provider', 'model_id', name='uq_ai_model_provider_model')
+    )
+    version = op.create_table(
+        'model_catalog_version',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(ai_model, initial_catalog_rows())
+    op.bulk_insert(version, [{'id': 1, 'version': 1}])
+
+
+def downgrade():
+    op.drop_table('model_catalog_version')
+    op.drop_table('ai_model')
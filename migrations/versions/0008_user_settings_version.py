@@ -0,0 +1,28 @@
+"""user settings version for the per-process user cache
+
+新增 user.settings_version：API密钥增删改时递增，各进程缓存的用户视图据此失效。
+
+Revision ID: 0008_user_settings_version
+Revises: 0007_model_catalog
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_user_settings_version'
+down_revision = '0007_model_catalog'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('settings_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('settings_version')
@@ -0,0 +1,67 @@
+"""
+灵犀校对平台 - 测试公共夹具
+
+已登录用户的测试基类与返回固定结果的AI服务，供各接口测试模块共用。
+导入本模块前不要导入 lingxi.app：数据库与缓存的环境变量需在应用创建前设置。
+"""
+
+import os
+import sys
+import unittest
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('CACHE_ENABLED', 'false')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lingxi'))
+
+from lingxi.app import app
+from lingxi.models import db, User, APIKey
+from lingxi.ai_services import BaseAIService, ProofreadingResult
+
+
+class FakeService(BaseAIService):
+    """返回固定结果的AI服务"""
+
+    def __init__(self):
+        super().__init__('sk-test')
+
+    def proofread(self, text):
+        return ProofreadingResult(text + '。', [{'type': '标点符号', 'original': text,
+                                                'corrected': text + '。', 'position': '句末',
+                                                'explanation': '缺少句号'}])
+
+
+class RecordingService(FakeService):
+    """把“错”改为“对”并记录实际发送文本的AI服务"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def proofread(self, text):
+        self.calls.append(text)
+        issues = [{'type': '错别字', 'original': '错', 'corrected': '对', 'position': '', 'explanation': ''}
+                  for _ in range(text.count('错'))]
+        return ProofreadingResult(text.replace('错', '对'), issues)
+
+
+class LoggedInTestCase(unittest.TestCase):
+    """已登录并配置了 OpenAI 密钥的用户"""
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            user = User(username='jobuser')
+            user.set_password('testpass123')
+            db.session.add(user)
+            db.session.commit()
+
+            api_key = APIKey(user_id=user.id, provider='openai')
+            api_key.set_api_key('sk-test', app.config['ENCRYPTION_KEY'])
+            db.session.add(api_key)
+            db.session.commit()
+
+        self.client.post('/login', data={'username': 'jobuser', 'password': 'testpass123'})
@@ -0,0 +1,538 @@
+"""
+灵犀校对平台 - AI服务模块测试
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lingxi'))
+
+from lingxi.ai_services.stream_parser import IncrementalIssueParser
+from lingxi.ai_services import BaseAIService
+from lingxi.ai_services.async_transport import AsyncHTTPTransport
+from lingxi.ai_services.breaker import CircuitBreaker
+from lingxi.ai_services.budget import OutputBudget, PromptTooLongError, join_continuation
+from lingxi.ai_services.deepseek_service import DeepSeekService
+from lingxi.ai_services.edits import apply_edits
+from lingxi.ai_services.json_extract import extract_json_object
+from lingxi.ai_services.ratelimit import RateLimiter, RateLimitTimeout, report_throttle
+from lingxi.ai_services.registry import ClientRegistry
+from lingxi.ai_services.transport import HTTPTransport
+from lingxi.async_proofreading import aproofread_texts
+
+
+SAMPLE_RESPONSE = '```json\n' + json.dumps({
+    'corrected_text': '今天天气很好。',
+    'issues': [
+        {'type': '错别字', 'original': '天器', 'corrected': '天气', 'position': '第1句',
+         'explanation': '"天器"应为"天气"，注意 {括号} 与 [方括号]'},
+        {'type': '标点符号', 'original': '好', 'corrected': '好。', 'position': '句末',
+         'explanation': '缺少句号'}
+    ]
+}, ensure_ascii=False, indent=2) + '\n```'
+
+
+class IncrementalIssueParserTestCase(unittest.TestCase):
+    """流式问题解析"""
+
+    def test_issues_emitted_as_they_close(self):
+        """每个问题对象闭合时立即产出，字符串中的括号不影响解析"""
+        parser = IncrementalIssueParser()
+        emitted = []
+        close_positions = []
+        for i, ch in enumerate(SAMPLE_RESPONSE):
+            issues = parser.feed(ch)
+            if issues:
+                close_positions.append(i)
+            emitted.extend(issues)
+
+        assert [issue['original'] for issue in emitted] == ['天器', '好']
+        # 第一个问题在整个响应结束前就已产出
+        assert close_positions[0] < SAMPLE_RESPONSE.index('"标点符号"')
+
+    def test_nested_arrays_outside_issues_ignored(self):
+        """只解析顶层 issues 数组中的对象"""
+        parser = IncrementalIssueParser()
+        text = '{"meta": [{"x": 1}], "issues": [{"type": "a"}], "corrected_text": "b"}'
+        assert parser.feed(text) == [{'type': 'a'}]
+
+
+class JsonExtractTestCase(unittest.TestCase):
+    """从模型输出中提取JSON对象"""
+
+    def test_fenced_response_with_chatter(self):
+        text = '好的，以下是结果 {仅供参考}：\n' + SAMPLE_RESPONSE + '\n如需 {更多} 帮助请告诉我。'
+        data = extract_json_object(text)
+        assert data['corrected_text'] == '今天天气很好。'
+        assert len(data['issues']) == 2
+
+    def test_first_of_multiple_objects(self):
+        assert extract_json_object('{"a": "}{"} {"b": 2}') == {'a': '}{'}
+
+    def test_model_glitches(self):
+        text = '{"corrected_text": "第一行\n第二行", "issues": [{"type": "x",},],}'
+        assert extract_json_object(text) == {'corrected_text': '第一行\n第二行', 'issues': [{'type': 'x'}]}
+
+    def test_unparseable(self):
+        for text in ('没有JSON', '{"corrected_text": "被截断', '[1, 2]'):
+            with self.assertRaises(ValueError):
+                extract_json_object(text)
+
+
+class EditsService(BaseAIService):
+    """按修改列表格式返回固定结果的AI服务"""
+
+    def __init__(self, response):
+        super().__init__('sk-test')
+        self.response_format = 'edits'
+        self.response = response
+        self.prompts = []
+
+    def _complete(self, prompt):
+        self.prompts.append(prompt)
+        return self.response
+
+
+class EditListTestCase(unittest.TestCase):
+    """修改列表格式"""
+
+    def test_apply_edits_uses_anchor_for_repeated_fragment(self):
+        text = '他在在家，我在在学校。'
+        corrected, issues, rejected = apply_edits(text, [
+            {'before': '我', 'original': '在在', 'corrected': '在', 'type': '语法错误'},
+            {'before': '他', 'original': '在在', 'corrected': '在', 'type': '语法错误'},
+        ])
+        assert corrected == '他在家，我在学校。'
+        assert [issue['offset'] for issue in issues] == [1, 6]
+        assert rejected == 0
+
+    def test_invalid_and_overlapping_edits_dropped(self):
+        text = '今天天器很好'
+        corrected, issues, rejected = apply_edits(text, [
+            {'original': '天器', 'corrected': '天气'},
+            {'original': '器很', 'corrected': '气很'},  # 与上一条重叠
+            {'original': '不存在', 'corrected': '存在'},
+            {'original': '', 'corrected': '。'},
+            {'original': '好', 'corrected': '好'},
+            '不是对象',
+        ])
+        assert corrected == '今天天气很好'
+        assert len(issues) == 1 and issues[0]['offset'] == 2
+        assert rejected == 5
+
+    def test_service_rebuilds_corrected_text(self):
+        service = EditsService('{"edits": [{"before": "天", "original": "器", "corrected": "气",'
+                               ' "type": "错别字", "explanation": "同音字"}]}')
+        result = service.proofread('今天天器很好')
+        assert '"edits"' in service.prompts[0]
+        assert not result.is_error
+        assert result.corrected_text == '今天天气很好'
+        assert result.issues[0]['original'] == '器'
+        assert result.issues[0]['offset'] == 3
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """前 fail_count 次请求返回 429，之后返回 JSON"""
+
+    protocol_version = 'HTTP/1.1'
+    fail_count = 0
+    seen = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        type(self).seen += 1
+        if type(self).seen <= type(self).fail_count:
+            status, body = 429, b'{}'
+        else:
+            status, body = 200, b'{"ok": true}'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if status == 429:
+            self.send_header('Retry-After', '0')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class LocalServerTestCase(unittest.TestCase):
+    """在本地端口运行 FlakyHandler"""
+
+    def setUp(self):
+        FlakyHandler.seen = 0
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FlakyHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}/v1/chat'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class HTTPTransportTestCase(LocalServerTestCase):
+    """共享HTTP传输：重试与连接复用"""
+
+    def setUp(self):
+        super().setUp()
+        self.transport = HTTPTransport(max_retries=2, backoff_base=0)
+
+    def tearDown(self):
+        self.transport.close()
+        super().tearDown()
+
+    def test_retries_on_429(self):
+        FlakyHandler.fail_count = 2
+        assert self.transport.post_json('test', self.url, {}, {}) == {'ok': True}
+        assert self.transport.stats()['retries'] == 2
+
+    def test_gives_up_after_max_retries(self):
+        FlakyHandler.fail_count = 5
+        with self.assertRaises(Exception):
+            self.transport.post_json('test', self.url, {}, {})
+        assert FlakyHandler.seen == 3
+
+    def test_connections_reused(self):
+        FlakyHandler.fail_count = 0
+        for _ in range(5):
+            self.transport.post_json('test', self.url, {}, {})
+        stats = self.transport.stats()
+        assert stats['new_connections'] == 1
+        assert stats['reused_connections'] == 4
+
+
+class AsyncTransportTestCase(LocalServerTestCase):
+    """异步HTTP传输"""
+
+    def test_async_retries_on_429(self):
+        FlakyHandler.fail_count = 2
+
+        async def run():
+            transport = AsyncHTTPTransport(max_retries=2, backoff_base=0)
+            try:
+                return await transport.post_json('test', self.url, {}, {}), transport.stats()
+            finally:
+                await transport.aclose()
+
+        body, stats = asyncio.run(run())
+        assert body == {'ok': True}
+        assert stats['retries'] == 2
+
+
+class OutputBudgetTestCase(unittest.TestCase):
+    """按输入规模与上下文窗口确定输出参数"""
+
+    def messages(self, text):
+        return [{'role': 'system', 'content': BaseAIService.SYSTEM_MESSAGE},
+                {'role': 'user', 'content': BaseAIService.PROOFREADING_PROMPT.format(text=text)}]
+
+    def test_max_tokens_follows_input(self):
+        budget = OutputBudget()
+        short = budget.plan('deepseek-chat', self.messages('今天天器很好。'))
+        long = budget.plan('deepseek-chat', self.messages('今天天器很好。' * 400))
+        edits = budget.plan('deepseek-chat', self.messages('今天天器很好。' * 400), 'edits')
+        assert short.max_tokens < 2000 < long.max_tokens
+        assert edits.max_tokens < long.max_tokens
+        assert short.read_timeout < long.read_timeout
+
+    def test_capped_by_context_window(self):
+        budget = OutputBudget()
+        plan = budget.plan('gpt-4', self.messages('天' * 3000))
+        # gpt-4 的分词器每个汉字约 1.5 个 token，输入约 4800 tokens，剩余空间小于按比例估算的输出
+        assert plan.max_tokens < 8192 - 4500
+        with self.assertRaises(PromptTooLongError):
+            budget.plan('gpt-4', self.messages('天' * 6000))
+        # 覆盖配置中的上下文窗口优先
+        assert OutputBudget(model_limits={'gpt-4': (128000, 4096)}).plan('gpt-4', self.messages('天' * 6000))
+
+    def test_join_continuation_drops_repeated_tail(self):
+        output = '{"corrected_text": "今天天气很好，我们去公园散步'
+        assert join_continuation(output, '```json\n我们去公园散步。", "issues": []}') == \
+            '{"corrected_text": "今天天气很好，我们去公园散步。", "issues": []}'
+        assert join_continuation('abc', 'abcdef') == 'abcabcdef'  # 重叠过短，不视为重复
+
+
+class TruncatingHandler(BaseHTTPRequestHandler):
+    """按顺序返回 RESPONSES 中的 (内容, finish_reason)，记录每次请求的参数"""
+
+    RESPONSES = []
+    requests = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        type(self).requests.append(body)
+        content, finish_reason = type(self).RESPONSES[len(type(self).requests) - 1]
+        if body.get('stream'):
+            chunks = [content[:5], content[5:]]
+            payload = ''.join(
+                'data: ' + json.dumps({'choices': [{'delta': {'content': chunk},
+                                                    'finish_reason': finish_reason if i == 1 else None}]}) + '\n\n'
+                for i, chunk in enumerate(chunks)
+            ) + 'data: [DONE]\n\n'
+            data, content_type = payload.encode(), 'text/event-stream'
+        else:
+            data = json.dumps({'choices': [{'message': {'content': content}, 'finish_reason': finish_reason}]}).encode()
+            content_type = 'application/json'
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+FULL_OUTPUT = json.dumps({'corrected_text': '今天天气很好。', 'issues': [
+    {'type': '错别字', 'original': '天器', 'corrected': '天气', 'position': '第1句', 'explanation': '"天器"应为"天气"'}
+]}, ensure_ascii=False)
+
+
+@mock.patch('lingxi.ai_services.base.get_rate_limiter', return_value=None)
+class ContinuationTestCase(unittest.TestCase):
+    """输出被截断时续写"""
+
+    def setUp(self):
+        TruncatingHandler.requests = []
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), TruncatingHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.service = DeepSeekService('sk-test')
+        self.service.base_url = f'http://127.0.0.1:{self.server.server_port}/v1/chat/completions'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_truncated_output_continued(self, _):
+        TruncatingHandler.RESPONSES = [(FULL_OUTPUT[:30], 'length'), (FULL_OUTPUT[20:], 'stop')]
+        result = self.service.proofread('今天天器很好。')
+        assert not result.is_error
+        assert result.corrected_text == '今天天气很好。' and len(result.issues) == 1
+
+        first, second = TruncatingHandler.requests
+        assert first['max_tokens'] < 2000 and first['response_format'] == {'type': 'json_object'}
+        # 续写请求带上已输出的内容，且不启用 JSON 模式
+        assert second['messages'][-2] == {'role': 'assistant', 'content': FULL_OUTPUT[:30]}
+        assert 'response_format' not in second
+
+    def test_streaming_continued(self, _):
+        TruncatingHandler.RESPONSES = [(FULL_OUTPUT[:30], 'length'), (FULL_OUTPUT[30:], 'stop')]
+        events = list(self.service.proofread_stream('今天天器很好。'))
+        assert [event for event, _ in events] == ['issue', 'result']
+        assert events[-1][1].corrected_text == '今天天气很好。'
+
+    def test_gives_up_after_max_continuations(self, _):
+        TruncatingHandler.RESPONSES = [('{"corrected_text": "今天', 'length')] * 3
+        result = self.service.proofread('今天天器很好。')
+        assert result.is_error and '截断' in result.issues[0]['explanation']
+        assert len(TruncatingHandler.requests) == 3
+
+    def test_oversized_input_rejected_before_request(self, _):
+        result = self.service.proofread('天' * 70000)
+        assert result.is_error and result.issues[0]['type'] == '输入过长'
+        assert TruncatingHandler.requests == []
+
+
+class SlowAsyncService(BaseAIService):
+    """每次调用耗时 0.2 秒的异步AI服务"""
+
+    def __init__(self):
+        super().__init__('sk-test')
+
+    async def _acomplete(self, prompt):
+        await asyncio.sleep(0.2)
+        text = prompt.rsplit('待校对文本：\n', 1)[1].rstrip('\n')
+        return json.dumps({'corrected_text': text.replace('错', '对'), 'issues': []}, ensure_ascii=False)
+
+
+class AsyncProofreadingTestCase(unittest.TestCase):
+    """异步校对路径"""
+
+    @mock.patch('lingxi.ai_services.base.get_rate_limiter', return_value=None)
+    def test_many_calls_in_flight_on_one_loop(self, _):
+        texts = [f'第{i}条有错' for i in range(200)]
+        started = time.monotonic()
+        results = asyncio.run(aproofread_texts(SlowAsyncService(), 'test', texts, 800, 200))
+        # 200 个调用同时在途，总耗时接近单次调用而不是 200 倍
+        assert time.monotonic() - started < 2
+        assert [result.corrected_text for result in results] == [f'第{i}条有对' for i in range(200)]
+
+
+class FakeClient:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ClientRegistryTestCase(unittest.TestCase):
+    """SDK 客户端注册表"""
+
+    def test_reuses_client_per_key(self):
+        registry = ClientRegistry(max_size=4)
+        first = registry.get('openai', 'sk-a', None, FakeClient)
+        assert registry.get('openai', 'sk-a', None, FakeClient) is first
+        assert registry.get('openai', 'sk-b', None, FakeClient) is not first
+        assert registry.get('custom_openai', 'sk-a', 'https://example.com/v1', FakeClient) is not first
+        assert registry.stats() == {'size': 3, 'hits': 1, 'misses': 3}
+
+    def test_lru_eviction_defers_close_until_idle(self):
+        registry = ClientRegistry(max_size=2)
+        oldest = registry.get('openai', 'sk-1', None, FakeClient)
+        registry.get('openai', 'sk-2', None, FakeClient)
+        registry.get('openai', 'sk-3', None, FakeClient)
+        # 被淘汰的客户端可能仍在其他线程的请求中使用
+        assert registry.stats()['size'] == 2 and not oldest.closed
+        assert registry.evict_idle() == 0 and not oldest.closed
+
+        registry.idle_seconds = -1
+        assert registry.evict_idle() == 3
+        assert registry.stats()['size'] == 0 and oldest.closed
+
+
+class CircuitBreakerTestCase(unittest.TestCase):
+    """熔断器状态转换"""
+
+    def test_trips_probes_and_recovers(self):
+        breaker = CircuitBreaker(min_calls=4, error_rate=0.5, open_seconds=0.05)
+        for success in (True, False, True, False):
+            assert breaker.allow()
+            breaker.record(success, 0.1)
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow()
+
+        time.sleep(0.06)
+        assert breaker.allow()
+        assert not breaker.allow()  # 半开状态只放行一个探测请求
+        breaker.record(False, 0.1)
+        assert breaker.state == CircuitBreaker.OPEN
+
+        time.sleep(0.06)
+        assert breaker.allow()
+        breaker.record(True, 0.1)
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_limiter_timeout_returns_half_open_probe(self):
+        """半开状态下限流排队超时，探测名额归还，之后的调用仍可以探测并恢复"""
+        breaker = CircuitBreaker(min_calls=1, error_rate=0.5, open_seconds=0)
+        breaker.record(False, 0.1)
+        service = EditsService('{"edits": []}')
+        service.get_circuit_breaker = lambda: breaker
+
+        limiter = mock.Mock()
+        limiter.slot.side_effect = RateLimitTimeout('排队超时')
+        with mock.patch('lingxi.ai_services.base.get_rate_limiter', return_value=limiter):
+            assert service.proofread('今天天气很好').is_error
+        assert breaker.available()
+
+        with mock.patch('lingxi.ai_services.base.get_rate_limiter', return_value=None):
+            assert not service.proofread('今天天气很好').is_error
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_abandoned_stream_returns_half_open_probe(self):
+        breaker = CircuitBreaker(min_calls=1, error_rate=0.5, open_seconds=0)
+        breaker.record(False, 0.1)
+        service = EditsService('{"edits": [{"original": "器", "corrected": "气"}]}')
+        service.get_circuit_breaker = lambda: breaker
+        service.supports_streaming = lambda: True
+        service._stream_completion = lambda prompt: iter([service.response[:20], service.response[20:]])
+
+        with mock.patch('lingxi.ai_services.base.get_rate_limiter', return_value=None):
+            stream = service.proofread_stream('今天天器很好')
+            assert next(stream)[0] == 'issue'
+            stream.close()
+        assert breaker.state == CircuitBreaker.HALF_OPEN and breaker.available()
+
+    def test_slow_calls_trip(self):
+        breaker = CircuitBreaker(min_calls=2, slow_call_seconds=1, slow_call_rate=1.0)
+        breaker.record(True, 2)
+        breaker.record(True, 3)
+        assert breaker.state == CircuitBreaker.OPEN
+
+
+class RateLimiterTestCase(unittest.TestCase):
+    """跨进程限流器"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'ratelimit.sqlite3')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_token_bucket_queues_instead_of_failing(self):
+        limiter = RateLimiter(self.path, rate=10, burst=1)
+        started = time.monotonic()
+        for _ in range(3):
+            with limiter.slot('openai', 'sk-a'):
+                pass
+        assert time.monotonic() - started >= 0.15
+
+    def test_concurrency_shared_between_workers(self):
+        # 两个实例打开同一个文件，模拟同一主机上的两个 worker
+        first = RateLimiter(self.path, initial_concurrency=1)
+        second = RateLimiter(self.path, initial_concurrency=1, max_wait=0.1)
+        with first.slot('openai', 'sk-a'):
+            with self.assertRaises(RateLimitTimeout):
+                with second.slot('openai', 'sk-a'):
+                    pass
+            with second.slot('openai', 'sk-b'):
+                pass
+
+    def test_aimd_and_retry_after(self):
+        limiter = RateLimiter(self.path, rate=1000, initial_concurrency=4)
+        with limiter.slot('openai', 'sk-a'):
+            report_throttle('0.2')
+        state = next(iter(limiter.snapshot().values()))
+        assert state['concurrency'] == 2
+        assert state['blocked_seconds'] > 0
+
+        started = time.monotonic()
+        with limiter.slot('openai', 'sk-a'):
+            pass
+        assert time.monotonic() - started >= 0.15
+        assert next(iter(limiter.snapshot().values()))['concurrency'] == 2.5
+
+    def test_async_slot_does_not_block_event_loop(self):
+        """其他进程持有写锁时，aslot 在线程中等待，事件循环上的其他协程照常运行"""
+        limiter = RateLimiter(self.path)
+        holder = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        holder.execute('BEGIN IMMEDIATE')
+        threading.Timer(0.3, lambda: holder.execute('COMMIT')).start()
+
+        async def run():
+            gaps = []
+
+            async def ticker():
+                last = time.monotonic()
+                while True:
+                    await asyncio.sleep(0.01)
+                    now = time.monotonic()
+                    gaps.append(now - last)
+                    last = now
+
+            task = asyncio.ensure_future(ticker())
+            async with limiter.aslot('openai', 'sk-a'):
+                pass
+            task.cancel()
+            return gaps
+
+        gaps = asyncio.run(run())
+        holder.close()
+        assert len(gaps) > 10 and max(gaps) < 0.15
+        assert next(iter(limiter.snapshot().values()))['in_flight'] == 0
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+灵犀校对平台 - 批量校对测试
+"""
+
+import json
+import unittest
+from unittest import mock
+
+from helpers import LoggedInTestCase, RecordingService
+from lingxi.app import app
+from lingxi.models import ProofreadingHistory
+from lingxi.ai_services import BaseAIService
+
+
+class PackingService(BaseAIService):
+    """按提示词中的JSON数组逐条返回结果的AI服务，记录请求次数"""
+
+    def __init__(self):
+        super().__init__('sk-test')
+        self.prompts = []
+
+    def _complete(self, prompt):
+        self.prompts.append(prompt)
+        items = json.loads(prompt.rsplit('待校对文本：', 1)[1])
+        return json.dumps({'items': [
+            {'id': item['id'], 'corrected_text': item['text'].replace('错', '对'),
+             'issues': [{'type': '错别字', 'original': '错', 'corrected': '对'}] * item['text'].count('错')}
+            for item in items
+        ]}, ensure_ascii=False)
+
+
+class BatchProofreadingTestCase(LoggedInTestCase):
+    """批量校对接口"""
+
+    def batch(self, texts, service, **extra):
+        with mock.patch('lingxi.proofreading.get_ai_service', return_value=service):
+            return self.client.post('/api/proofread/batch', json={
+                'texts': texts, 'provider': 'openai', 'model': 'gpt-4o', **extra
+            })
+
+    def test_results_in_input_order_with_item_errors(self):
+        texts = [f'标题{i}有错' for i in range(20)]
+        texts[3] = '   '
+        rv = self.batch(texts, RecordingService())
+        assert rv.status_code == 200
+
+        data = rv.get_json()
+        assert data['succeeded'] == 19 and data['failed'] == 1
+        assert [item['index'] for item in data['results']] == list(range(20))
+        assert 'error' in data['results'][3]
+        assert data['results'][5]['corrected_text'] == '标题5有对'
+
+        with app.app_context():
+            assert ProofreadingHistory.query.count() == 19
+
+    def test_packing_reduces_request_count(self):
+        service = PackingService()
+        rv = self.batch([f'第{i}条说明有错' for i in range(10)], service, pack=True)
+        data = rv.get_json()
+
+        assert len(service.prompts) == 1
+        assert [item['corrected_text'] for item in data['results']] == [f'第{i}条说明有对' for i in range(10)]
+        assert data['results'][0]['issues'][0]['offset'] == 6
+
+    def test_too_many_items(self):
+        rv = self.batch(['a'] * (app.config['BATCH_MAX_ITEMS'] + 1), RecordingService())
+        assert rv.status_code == 413
+
+    def test_async_upstream_path(self):
+        app.config['ASYNC_UPSTREAM_ENABLED'] = True
+        try:
+            data = self.batch([f'第{i}条有错' for i in range(5)], AsyncEchoService()).get_json()
+        finally:
+            app.config['ASYNC_UPSTREAM_ENABLED'] = False
+        assert [item['corrected_text'] for item in data['results']] == [f'第{i}条有对' for i in range(5)]
+        assert data['results'][0]['issues'][0]['offset'] == 4
+
+
+class AsyncEchoService(BaseAIService):
+    """只实现异步调用的AI服务"""
+
+    def __init__(self):
+        super().__init__('sk-async')
+
+    async def _acomplete(self, prompt):
+        text = prompt.rsplit('待校对文本：\n', 1)[1].rstrip('\n')
+        return json.dumps({'corrected_text': text.replace('错', '对'),
+                           'issues': [{'type': '错别字', 'original': '错', 'corrected': '对'}]}, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+灵犀校对平台 - 故障转移测试
+"""
+
+import unittest
+from unittest import mock
+
+from helpers import LoggedInTestCase, RecordingService
+from lingxi.app import app
+from lingxi.models import db, User, APIKey, ProofreadingHistory
+
+
+class FailingService(RecordingService):
+    """指定提供商（默认 OpenAI）的调用总是失败的AI服务"""
+
+    def __init__(self, provider, failing=('openai',)):
+        super().__init__()
+        self.PROVIDER = provider
+        self.failing = failing
+
+    def proofread(self, text):
+        if self.PROVIDER in self.failing:
+            return self._create_error_result(text, "API错误", "upstream down")
+        return super().proofread(text)
+
+
+class FailoverTestCase(LoggedInTestCase):
+    """主提供商失败时改用用户的其他密钥"""
+
+    def setUp(self):
+        super().setUp()
+        with app.app_context():
+            api_key = APIKey(user_id=User.query.one().id, provider='deepseek')
+            api_key.set_api_key('sk-deepseek', app.config['ENCRYPTION_KEY'])
+            db.session.add(api_key)
+            db.session.commit()
+
+    def proofread(self, failing=('openai',), **overrides):
+        def build(provider, api_key, base_url, model):
+            return FailingService(provider, failing)
+
+        payload = {'text': '这里有错', 'provider': 'openai', 'model': 'gpt-4o'}
+        payload.update(overrides)
+        with mock.patch('lingxi.proofreading.get_ai_service', side_effect=build):
+            return self.client.post('/api/proofread', json=payload)
+
+    def test_fails_over_to_other_provider(self):
+        data = self.proofread().get_json()
+        assert data['provider'] == 'deepseek'
+        assert data['corrected_text'] == '这里有对'
+
+        with app.app_context():
+            assert ProofreadingHistory.query.one().provider_used == 'deepseek'
+
+    def test_hedged_request_fails_over(self):
+        """主模型与对冲目标都失败时同样改用其他密钥"""
+        with app.app_context():
+            api_key = APIKey(user_id=User.query.one().id, provider='qwen')
+            api_key.set_api_key('sk-qwen', app.config['ENCRYPTION_KEY'])
+            db.session.add(api_key)
+            db.session.commit()
+
+        data = self.proofread(failing=('openai', 'deepseek'), hedge=True).get_json()
+        assert data['provider'] == 'qwen'
+        assert data['corrected_text'] == '这里有对'
+
+    def test_error_when_no_backup(self):
+        app.config['FAILOVER_ENABLED'] = False
+        try:
+            rv = self.proofread()
+        finally:
+            app.config['FAILOVER_ENABLED'] = True
+        assert rv.status_code == 502
+        assert 'upstream down' in rv.get_json()['error']
+
+        with app.app_context():
+            assert ProofreadingHistory.query.count() == 0
+
+
+if __name__ == '__main__':
+    unittest.main()
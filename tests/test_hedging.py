@@ -0,0 +1,68 @@
+"""
+灵犀校对平台 - 对冲请求测试
+"""
+
+import time
+import unittest
+from unittest import mock
+
+from helpers import LoggedInTestCase, RecordingService
+from lingxi.app import app
+from lingxi.models import ProofreadingHistory
+
+
+class ModelService(RecordingService):
+    """按模型区分响应速度的AI服务"""
+
+    PROVIDER = 'openai'
+
+    def __init__(self, model, delay):
+        super().__init__()
+        self.model = model
+        self.delay = delay
+
+    def get_model(self):
+        return self.model
+
+    def proofread(self, text):
+        time.sleep(self.delay)
+        return super().proofread(text)
+
+
+class HedgedProofreadingTestCase(LoggedInTestCase):
+    """对冲请求"""
+
+    def proofread(self, delays):
+        def build(provider, api_key, base_url, model):
+            return ModelService(model, delays.get(model, 0))
+
+        with mock.patch('lingxi.proofreading.get_ai_service', side_effect=build):
+            return self.client.post('/api/proofread', json={
+                'text': '这里有错', 'provider': 'openai', 'model': 'gpt-4o', 'hedge': True
+            })
+
+    def setUp(self):
+        super().setUp()
+        app.config['HEDGE_DEFAULT_DELAY'] = 0.05
+
+    def tearDown(self):
+        app.config['HEDGE_DEFAULT_DELAY'] = 10.0
+
+    def test_slow_primary_is_hedged(self):
+        rv = self.proofread({'gpt-4o': 1.0})
+        data = rv.get_json()
+        assert data['hedged'] is True
+        assert data['model'] == 'gpt-4-turbo'
+        assert data['corrected_text'] == '这里有对'
+
+        with app.app_context():
+            assert ProofreadingHistory.query.one().model_used == 'gpt-4-turbo'
+
+    def test_fast_primary_not_hedged(self):
+        data = self.proofread({}).get_json()
+        assert data['hedged'] is False
+        assert data['model'] == 'gpt-4o'
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+灵犀校对平台 - 校对历史归档测试
+"""
+
+import json
+import unittest
+from datetime import datetime
+
+from sqlalchemy import text
+
+from helpers import LoggedInTestCase
+from lingxi.app import app
+from lingxi.models import db, User, ProofreadingHistory, ArchivedHistory
+from lingxi.maintenance import archive_histories
+from lingxi.proofreading import save_history
+from lingxi.history import history_page
+from lingxi.search import search_history
+from lingxi.ai_services import ProofreadingResult
+
+
+class HistoryArchiveTestCase(LoggedInTestCase):
+    """按保留策略归档校对历史"""
+
+    def setUp(self):
+        super().setUp()
+        with app.app_context():
+            for day in range(1, 6):
+                save_history(1, f'第{day}篇关于归档的文章', ProofreadingResult(f'第{day}篇关于归档的文章。', []),
+                             'openai', 'gpt-4o')
+                history = ProofreadingHistory.query.order_by(ProofreadingHistory.id.desc()).first()
+                history.created_at = datetime(2026, 1, day)
+            db.session.commit()
+
+    def test_archived_rows_stay_readable(self):
+        with app.app_context():
+            stats = archive_histories(hot_rows_per_user=2, batch_size=2)
+            assert stats['archived'] == 3 and stats['hot_rows'] == 2
+            assert ArchivedHistory.query.count() == 3
+            assert db.session.get(User, 1).history_count == 5
+
+            items, cursor = history_page(1, per_page=4)
+            assert [item.preview for item in items] == [f'第{day}篇关于归档的文章' for day in (5, 4, 3, 2)]
+            items, cursor = history_page(1, cursor, per_page=4)
+            assert [item.preview for item in items] == ['第1篇关于归档的文章'] and cursor is None
+
+            archived_id = ArchivedHistory.query.order_by(ArchivedHistory.id).first().id
+            results, _ = search_history(1, '第1篇')
+            assert [history.id for history in results] == [archived_id]
+
+        rv = self.client.get(f'/api/history/{archived_id}')
+        assert rv.get_json()['corrected_text'] == '第1篇关于归档的文章。'
+        rv = self.client.get('/history/export')
+        rows = [json.loads(line) for line in rv.get_data(as_text=True).splitlines()]
+        assert [row['created_at'][:10] for row in rows] == [f'2026-01-0{day}' for day in range(1, 6)]
+
+    def test_retention_days_and_rerun(self):
+        with app.app_context():
+            stats = archive_histories(retention_days=1)
+            # 最新的一行始终留在在线表
+            assert stats['archived'] == 4 and stats['hot_rows'] == 1
+            assert archive_histories(retention_days=1)['archived'] == 0
+            with self.assertRaises(ValueError):
+                archive_histories()
+
+    def test_batch_changing_concurrently_is_skipped(self):
+        with app.app_context():
+            # 每次删除都漏掉最早的一行，模拟该批记录一直被并发修改
+            first_id = ProofreadingHistory.query.order_by(ProofreadingHistory.id).first().id
+            db.session.execute(text(
+                f'CREATE TRIGGER keep_first BEFORE DELETE ON proofreading_history '
+                f'WHEN OLD.id = {first_id} BEGIN SELECT RAISE(IGNORE); END'
+            ))
+            db.session.commit()
+
+            stats = archive_histories(retention_days=1)
+            assert stats['archived'] == 0 and stats['hot_rows'] == 5
+            assert ArchivedHistory.query.count() == 0
+
+
+if __name__ == '__main__':
+    unittest.main()
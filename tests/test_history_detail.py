@@ -0,0 +1,57 @@
+"""
+灵犀校对平台 - 校对历史详情测试
+"""
+
+import unittest
+
+from helpers import LoggedInTestCase
+from lingxi.app import app
+from lingxi.models import db, User, ProofreadingHistory
+from lingxi.maintenance import backfill_history_summaries
+from lingxi.proofreading import save_history
+from lingxi.ai_services import ProofreadingResult
+
+
+class HistoryDetailTestCase(LoggedInTestCase):
+    """历史列表只含元数据，全文按条加载"""
+
+    def test_list_excludes_full_text(self):
+        text = '很长的原文。' * 2000
+        with app.app_context():
+            history_id = save_history(1, text, ProofreadingResult(text + '完', [{'type': '标点符号'}]),
+                                      'openai', 'gpt-4o').id
+
+        rv = self.client.get('/history')
+        assert len(rv.data) < 20000
+        assert '1 个问题' in rv.get_data(as_text=True)
+
+        data = self.client.get(f'/api/history/{history_id}').get_json()
+        assert data['original_text'] == text
+        assert data['corrected_text'] == text + '完'
+        assert data['issues'] == [{'type': '标点符号'}]
+
+    def test_other_users_history_hidden(self):
+        with app.app_context():
+            other = User(username='other')
+            other.set_password('x')
+            db.session.add(other)
+            db.session.commit()
+            history_id = save_history(other.id, '别人的', ProofreadingResult('别人的', []), 'openai', 'gpt-4o').id
+
+        assert self.client.get(f'/api/history/{history_id}').status_code == 404
+
+    def test_backfill_summaries(self):
+        with app.app_context():
+            db.session.execute(ProofreadingHistory.__table__.insert(), [{
+                'user_id': 1, 'original_text': '旧记录', 'corrected_text': '旧记录。',
+                'issues_found': '[{}, {}]', 'provider_used': 'openai', 'model_used': 'gpt-4o'
+            }])
+            db.session.commit()
+
+            assert backfill_history_summaries() == {'filled': 1}
+            history = ProofreadingHistory.query.one()
+            assert (history.preview, history.issue_count) == ('旧记录', 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
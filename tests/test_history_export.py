@@ -0,0 +1,55 @@
+"""
+灵犀校对平台 - 校对历史导出测试
+"""
+
+import csv
+import gzip
+import io
+import json
+import unittest
+from datetime import datetime
+
+from helpers import LoggedInTestCase
+from lingxi.app import app
+from lingxi.models import db, ProofreadingHistory
+from lingxi.proofreading import save_history
+from lingxi.ai_services import ProofreadingResult
+
+
+class HistoryExportTestCase(LoggedInTestCase):
+    """校对历史流式导出"""
+
+    def setUp(self):
+        super().setUp()
+        with app.app_context():
+            save_history(1, '第一篇', ProofreadingResult('第一篇。', [{'type': '标点符号'}]), 'openai', 'gpt-4o')
+            save_history(1, '第二篇', ProofreadingResult('第二篇。', []), 'deepseek', 'deepseek-chat')
+            history = ProofreadingHistory.query.filter_by(provider_used='openai').one()
+            history.created_at = datetime(2026, 1, 15, 8, 0)
+            db.session.commit()
+
+    def test_ndjson_with_filters(self):
+        rv = self.client.get('/history/export')
+        assert rv.mimetype == 'application/x-ndjson'
+        rows = [json.loads(line) for line in rv.get_data(as_text=True).splitlines()]
+        assert [row['original_text'] for row in rows] == ['第一篇', '第二篇']
+        assert rows[0]['corrected_text'] == '第一篇。' and rows[0]['issues'] == [{'type': '标点符号'}]
+
+        rv = self.client.get('/history/export?start=2026-01-15&end=2026-01-15')
+        assert [json.loads(line)['id'] for line in rv.get_data(as_text=True).splitlines()] == [rows[0]['id']]
+        rv = self.client.get('/history/export?model=deepseek-chat')
+        assert len(rv.get_data(as_text=True).splitlines()) == 1
+        assert self.client.get('/history/export?start=yesterday').status_code == 400
+
+    def test_gzip_csv(self):
+        rv = self.client.get('/history/export?format=csv&gzip=1')
+        assert rv.mimetype == 'application/gzip'
+        assert '.csv.gz' in rv.headers['Content-Disposition']
+        content = gzip.decompress(rv.data).decode('utf-8-sig')
+        rows = list(csv.DictReader(io.StringIO(content)))
+        assert [row['corrected_text'] for row in rows] == ['第一篇。', '第二篇。']
+        assert json.loads(rows[0]['issues']) == [{'type': '标点符号'}]
+
+
+if __name__ == '__main__':
+    unittest.main()
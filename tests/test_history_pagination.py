@@ -0,0 +1,56 @@
+"""
+灵犀校对平台 - 校对历史分页测试
+"""
+
+import unittest
+
+from helpers import LoggedInTestCase
+from lingxi.app import app
+from lingxi.models import db, User, ProofreadingHistory
+from lingxi.proofreading import save_history, save_histories
+from lingxi.history import decode_cursor, history_page
+from lingxi.ai_services import ProofreadingResult
+
+
+class HistoryPaginationTestCase(LoggedInTestCase):
+    """校对历史的游标分页与条数统计"""
+
+    def test_keyset_pages_cover_all_rows(self):
+        with app.app_context():
+            result = ProofreadingResult('正文。', [])
+            for index in range(13):
+                save_history(1, f'第{index}条', result, 'openai', 'gpt-4o')
+            # 批量插入的行时间戳相同，靠 id 区分先后
+            save_histories(1, [(f'批量{index}', result) for index in range(12)], 'openai', 'gpt-4o')
+            assert db.session.get(User, 1).history_count == 25
+
+            seen, cursor = [], None
+            while True:
+                items, cursor = history_page(1, cursor, per_page=10)
+                seen.extend(h.id for h in items)
+                if cursor is None:
+                    break
+            assert len(seen) == 25 and len(set(seen)) == 25
+            assert seen[0] == max(seen)
+
+            db.session.delete(db.session.get(ProofreadingHistory, seen[0]))
+            db.session.commit()
+            assert db.session.get(User, 1).history_count == 24
+
+    def test_page_links(self):
+        with app.app_context():
+            for index in range(12):
+                save_history(1, f'第{index}条', ProofreadingResult('正文。', []), 'openai', 'gpt-4o')
+
+        page = self.client.get('/history').get_data(as_text=True)
+        assert '共 12 条' in page and '回到最新' not in page
+        cursor = page.split('cursor=')[1].split('"')[0]
+        assert decode_cursor(cursor) is not None
+
+        page = self.client.get(f'/history?cursor={cursor}').get_data(as_text=True)
+        assert page.count('查看详情') == 2 and '加载更多' not in page
+        assert self.client.get('/history?cursor=bogus').status_code == 200
+
+
+if __name__ == '__main__':
+    unittest.main()
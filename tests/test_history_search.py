@@ -0,0 +1,69 @@
+"""
+灵犀校对平台 - 校对历史搜索测试
+"""
+
+import unittest
+
+from helpers import LoggedInTestCase
+from lingxi.app import app
+from lingxi.models import db, User, ProofreadingHistory
+from lingxi.maintenance import rebuild_search_index
+from lingxi.proofreading import save_history, save_histories
+from lingxi.search import search_history
+from lingxi.ai_services import ProofreadingResult
+
+
+class HistorySearchTestCase(LoggedInTestCase):
+    """校对历史全文检索"""
+
+    def save(self, text, corrected=None, user_id=1):
+        return save_history(user_id, text, ProofreadingResult(corrected or text, []), 'openai', 'gpt-4o').id
+
+    def test_cjk_search_with_snippets(self):
+        with app.app_context():
+            park = self.save('上个月我们去公园散步，天气很好。')
+            self.save('今天下雨了，我们在家看书。')
+            fixed = self.save('这篇文章有个措别字。', '这篇文章有个错别字。')
+
+            items, cursor = search_history(1, '天气很好')
+            assert [h.id for h in items] == [park] and cursor is None
+            assert '<mark>天气很好</mark>' in items[0].snippet
+
+            # 单字、多个词同时出现、只出现在修正文本中
+            assert {h.id for h in search_history(1, '我们')[0]} == {park, park + 1}
+            assert [h.id for h in search_history(1, '公园 散步')[0]] == [park]
+            assert [h.id for h in search_history(1, '错别字')[0]] == [fixed]
+            assert search_history(1, '公园 下雨')[0] == []
+
+    def test_scoped_to_user_and_paginated(self):
+        with app.app_context():
+            other = User(username='other')
+            other.set_password('x')
+            db.session.add(other)
+            db.session.commit()
+            self.save('其他用户的公园', user_id=other.id)
+            ids = [self.save(f'第{index}次去公园') for index in range(12)]
+
+            items, cursor = search_history(1, '公园', per_page=10)
+            rest, end = search_history(1, '公园', cursor, per_page=10)
+            assert [h.id for h in items + rest] == ids[::-1] and end is None
+
+    def test_index_follows_deletes_and_rebuild(self):
+        with app.app_context():
+            history_id = self.save('要删除的记录')
+            db.session.delete(db.session.get(ProofreadingHistory, history_id))
+            db.session.commit()
+            assert search_history(1, '删除')[0] == []
+
+            save_histories(1, [('批量写入的记录', ProofreadingResult('批量写入的记录。', []))], 'openai', 'gpt-4o')
+            assert len(search_history(1, '批量')[0]) == 1
+            assert rebuild_search_index(batch_size=1) == {'indexed': 1}
+            assert len(search_history(1, '批量')[0]) == 1
+
+        rv = self.client.get('/history?q=批量')
+        assert '<mark>批量</mark>' in rv.get_data(as_text=True)
+        assert self.client.get('/api/history/search?q=').status_code == 400
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+"""
+灵犀校对平台 - 校对历史存储测试
+"""
+
+import json
+import unittest
+
+from helpers import LoggedInTestCase
+from lingxi.app import app
+from lingxi.models import db, ProofreadingHistory, TextBlob
+from lingxi.maintenance import migrate_history_storage
+from lingxi.proofreading import save_history, save_histories
+from lingxi.textstore import apply_delta, make_delta
+from lingxi.ai_services import ProofreadingResult
+
+
+class HistoryStorageTestCase(LoggedInTestCase):
+    """校对历史的去重、差量与压缩存储"""
+
+    original = ''.join(f'第{i}段：今天天气很好我们去公园玩吧\n' for i in range(100))
+
+    def corrected(self):
+        return self.original.replace('很好', '很好，', 3)
+
+    def test_delta_round_trip(self):
+        corrected = self.corrected() + '结尾'
+        edits = make_delta(self.original, corrected)
+        assert len(edits) == 4
+        assert apply_delta(self.original, edits) == corrected
+
+    def test_accessors_return_plain_strings(self):
+        with app.app_context():
+            result = ProofreadingResult(self.corrected(), [{'type': '标点符号'}])
+            history_id = save_history(1, self.original, result, 'openai', 'gpt-4o').id
+            save_histories(1, [(self.original, result), ('短文本', ProofreadingResult('短文本。', []))],
+                           'openai', 'gpt-4o')
+            db.session.expire_all()
+
+            history = db.session.get(ProofreadingHistory, history_id)
+            assert history.original_text == self.original
+            assert history.corrected_text == self.corrected()
+            assert json.loads(history.issues_found) == [{'type': '标点符号'}]
+            assert len(history.corrected_delta) < 200
+            # 相同原文只存一份
+            assert TextBlob.query.count() == 2
+            assert [h.corrected_text for h in ProofreadingHistory.query.order_by(ProofreadingHistory.id)][1:] == \
+                [self.corrected(), '短文本。']
+
+    def test_migrate_legacy_rows(self):
+        with app.app_context():
+            db.session.execute(ProofreadingHistory.__table__.insert(), [{
+                'user_id': 1, 'original_text': self.original, 'corrected_text': self.corrected(),
+                'issues_found': '[]', 'provider_used': 'openai', 'model_used': 'gpt-4o'
+            }] * 3)
+            db.session.commit()
+            assert ProofreadingHistory.query.first().corrected_text == self.corrected()
+
+            stats = migrate_history_storage(batch_size=2)
+            assert stats == {'migrated': 3, 'conflicts': 0}
+            assert migrate_history_storage()['migrated'] == 0
+            db.session.expire_all()
+
+            for history in ProofreadingHistory.query.all():
+                assert history.legacy_original_text is None
+                assert history.original_text == self.original
+                assert history.corrected_text == self.corrected()
+                assert history.issues_found == '[]'
+            assert TextBlob.query.count() == 1
+
+
+if __name__ == '__main__':
+    unittest.main()
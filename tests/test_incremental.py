@@ -0,0 +1,54 @@
+"""
+灵犀校对平台 - 增量校对测试
+"""
+
+import unittest
+from unittest import mock
+
+from helpers import LoggedInTestCase, RecordingService
+
+
+class IncrementalProofreadingTestCase(LoggedInTestCase):
+    """修订稿再次校对时只发送改动过的段落"""
+
+    def proofread(self, text, service):
+        with mock.patch('lingxi.proofreading.get_ai_service', return_value=service):
+            return self.client.post('/api/proofread', json={
+                'text': text, 'provider': 'openai', 'model': 'gpt-4o'
+            })
+
+    def test_only_changed_paragraphs_sent(self):
+        first = RecordingService()
+        rv = self.proofread('第一段有错\n\n第二段\n\n第三段有错', first)
+        assert rv.status_code == 200
+        assert rv.headers['X-Reused-Paragraphs'] == '0'
+        assert len(first.calls) == 1
+
+        second = RecordingService()
+        text = '第一段有错\n\n第二段改错\n\n第三段有错'
+        rv = self.proofread(text, second)
+        assert rv.status_code == 200
+        assert rv.headers['X-Reused-Paragraphs'] == '2'
+        assert second.calls == ['第二段改错']
+
+        data = rv.get_json()
+        assert data['corrected_text'] == text.replace('错', '对')
+        assert [issue['offset'] for issue in data['issues']] == [i for i, c in enumerate(text) if c == '错']
+
+    def test_paragraph_differing_in_line_endings_not_reused(self):
+        rv = self.proofread('第一行\n有错', RecordingService())
+        assert rv.status_code == 200
+
+        second = RecordingService()
+        text = '第一行 \r\n有错'
+        rv = self.proofread(text, second)
+        assert rv.status_code == 200
+        assert second.calls == [text]
+
+        data = rv.get_json()
+        assert data['corrected_text'] == text.replace('错', '对')
+        assert [issue['offset'] for issue in data['issues']] == [text.index('错')]
+
+
+if __name__ == '__main__':
+    unittest.main()
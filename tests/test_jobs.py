@@ -0,0 +1,93 @@
+"""
+灵犀校对平台 - 异步校对任务测试
+"""
+
+import unittest
+from unittest import mock
+
+from helpers import FakeService, LoggedInTestCase
+from lingxi.app import app
+from lingxi.models import db, ProofreadingJob, ProofreadingHistory
+from lingxi.jobs import JobWorker
+
+
+class JobQueueTestCase(LoggedInTestCase):
+    """异步任务提交、领取与执行"""
+
+    def submit(self, **overrides):
+        payload = {'text': '你好', 'provider': 'openai', 'model': 'gpt-4o', 'async': True}
+        payload.update(overrides)
+        return self.client.post('/api/proofread', json=payload)
+
+    def test_submit_returns_job_id(self):
+        """提交后立即返回任务ID，结果尚未就绪"""
+        rv = self.submit()
+        assert rv.status_code == 202
+        job_id = rv.get_json()['job_id']
+
+        rv = self.client.get(f'/api/proofread/jobs/{job_id}/result')
+        assert rv.status_code == 202
+        assert rv.get_json()['status'] == ProofreadingJob.STATUS_PENDING
+
+    def test_submit_validates_model(self):
+        """模型不可用时在提交阶段直接报错"""
+        rv = self.submit(model='not-a-model')
+        assert rv.status_code == 400
+
+    def test_worker_runs_job(self):
+        """Worker 执行任务后可以取回结果，并写入历史"""
+        job_id = self.submit().get_json()['job_id']
+        worker = JobWorker(app, max_workers=1)
+
+        with mock.patch('lingxi.proofreading.get_ai_service', return_value=FakeService()):
+            with app.app_context():
+                assert worker.claim_next_job() == job_id
+                assert worker.claim_next_job() is None
+            worker._slots.acquire()
+            worker.run_job(job_id)
+
+        rv = self.client.get(f'/api/proofread/jobs/{job_id}/result')
+        assert rv.status_code == 200
+        assert rv.get_json()['corrected_text'] == '你好。'
+
+        with app.app_context():
+            job = db.session.get(ProofreadingJob, job_id)
+            assert job.status == ProofreadingJob.STATUS_SUCCEEDED
+            assert db.session.get(ProofreadingHistory, job.history_id) is not None
+
+    def test_upstream_error_fails_job(self):
+        """上游调用失败时任务标记为失败，不把原文当作结果"""
+        job_id = self.submit().get_json()['job_id']
+        worker = JobWorker(app, max_workers=1)
+        service = FakeService()
+        service.proofread = lambda text: service._create_error_result(text, "API错误", "upstream down")
+
+        with mock.patch('lingxi.proofreading.get_ai_service', return_value=service):
+            with app.app_context():
+                worker.claim_next_job()
+            worker._slots.acquire()
+            worker.run_job(job_id)
+
+        rv = self.client.get(f'/api/proofread/jobs/{job_id}/result')
+        assert rv.status_code == 500
+        assert 'upstream down' in rv.get_json()['error']
+
+        with app.app_context():
+            job = db.session.get(ProofreadingJob, job_id)
+            assert job.status == ProofreadingJob.STATUS_FAILED
+            assert job.corrected_text is None and job.history_id is None
+
+    def test_stale_job_requeued(self):
+        """超过租约的运行中任务会被重新入队"""
+        job_id = self.submit().get_json()['job_id']
+        worker = JobWorker(app, max_workers=1)
+        worker.lease_seconds = -1
+
+        with app.app_context():
+            worker.claim_next_job()
+            assert worker.requeue_stale_jobs() == 1
+            assert db.session.get(ProofreadingJob, job_id).status == ProofreadingJob.STATUS_PENDING
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+"""
+灵犀校对平台 - API密钥轮换测试
+"""
+
+import base64
+import unittest
+
+from helpers import LoggedInTestCase
+from lingxi.app import app
+from lingxi.models import db, APIKey, CryptoHelper
+from lingxi.maintenance import rotate_api_keys
+
+
+class APIKeyRotationTestCase(LoggedInTestCase):
+    """API密钥解密缓存与在线轮换"""
+
+    def test_cache_follows_key_updates(self):
+        with app.app_context():
+            record = APIKey.query.first()
+            assert record.get_api_key(app.config['ENCRYPTION_KEY']) == 'sk-test'
+            # 命中缓存时不再解密
+            assert record.get_api_key('wrong-password') == 'sk-test'
+
+            record.set_api_key('sk-new', app.config['ENCRYPTION_KEY'])
+            db.session.commit()
+            assert record.get_api_key(app.config['ENCRYPTION_KEY']) == 'sk-new'
+
+    def test_rotate_keys(self):
+        old = app.config['ENCRYPTION_KEY']
+        with app.app_context():
+            # 旧格式：Fernet 令牌外再包一层 base64
+            legacy = CryptoHelper.encrypt_api_key('sk-legacy', old).encode()
+            db.session.add(APIKey(user_id=1, provider='deepseek',
+                                  encrypted_api_key=base64.urlsafe_b64encode(legacy).decode()))
+            db.session.commit()
+
+            stats = rotate_api_keys('new-password', (old,), batch_size=1)
+            assert stats == {'rotated': 2, 'skipped': 0, 'conflicts': 0}
+            assert rotate_api_keys('new-password', (old,))['skipped'] == 2
+
+            values = [CryptoHelper.decrypt_api_key(k.encrypted_api_key, 'new-password')
+                      for k in APIKey.query.order_by(APIKey.id)]
+            assert values == ['sk-test', 'sk-legacy']
+
+
+if __name__ == '__main__':
+    unittest.main()
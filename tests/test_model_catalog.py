@@ -0,0 +1,50 @@
+"""
+灵犀校对平台 - 模型目录测试
+"""
+
+import unittest
+
+from helpers import LoggedInTestCase
+from lingxi.app import app
+from lingxi.catalog import ModelCatalog, get_model_catalog
+
+
+class ModelCatalogTestCase(LoggedInTestCase):
+    """数据库中的模型目录"""
+
+    def tearDown(self):
+        get_model_catalog().invalidate()
+
+    def test_changes_reach_other_workers(self):
+        rv = self.client.post('/api/models/add', json={
+            'provider': 'openai', 'model_id': 'gpt-4.1', 'model_name': 'GPT-4.1'
+        })
+        assert rv.status_code == 200
+        assert self.client.post('/api/models/add', json={
+            'provider': 'openai', 'model_id': 'gpt-4.1', 'model_name': 'GPT-4.1'
+        }).status_code == 400
+
+        rv = self.client.get('/api/models/openai')
+        assert rv.get_json()['models'][-1]['id'] == 'gpt-4.1'
+        assert self.client.get('/api/models/openai',
+                               headers={'If-None-Match': rv.headers['ETag']}).status_code == 304
+
+        with app.app_context():
+            # 另一个 Worker 进程中的目录
+            other = ModelCatalog(check_seconds=60)
+            version = other.snapshot().version
+            assert other.snapshot().get_model('openai', 'gpt-4.1')['name'] == 'GPT-4.1'
+            get_model_catalog().update_model('openai', 'gpt-4.1', model_name='GPT-4.1 (2025)')
+            assert other.snapshot().version == version  # 检查周期内沿用旧快照
+            other.invalidate()
+            assert other.snapshot().get_model('openai', 'gpt-4.1')['name'] == 'GPT-4.1 (2025)'
+
+        assert self.client.post('/api/models/remove', json={
+            'provider': 'openai', 'model_id': 'gpt-4.1'
+        }).status_code == 200
+        ids = [model['model_id'] for model in self.client.get('/api/user/models').get_json()['models']]
+        assert 'gpt-4o' in ids and 'gpt-4.1' not in ids
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+"""
+灵犀校对平台 - 校对流程测试
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lingxi'))
+
+from flask import Flask
+
+from lingxi.ai_services import BaseAIService, ProofreadingResult
+from lingxi import concurrency
+from lingxi.cache import ProofreadingCache, make_cache_key, rebase_cached_result, to_cached_result
+from lingxi.chunking import merge_chunk_results, proofread_chunked
+from lingxi.segmenter import chunk_text, split_paragraphs, split_sentences
+
+
+class ProofreadingCacheTestCase(unittest.TestCase):
+    """两级结果缓存"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, 'cache.db')
+        self.cache = ProofreadingCache(memory_items=2, ttl_seconds=60,
+                                       db_path=self.db_path, disk_max_bytes=1024 * 1024)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_key_ignores_only_surrounding_whitespace(self):
+        """只有首尾空白不同的文本命中同一个键；换行符或行尾空白不同、模型不同则不同"""
+        key = make_cache_key('  你好\n世界\n', 'openai', 'gpt-4o', 'v1')
+        assert key == make_cache_key('你好\n世界', 'openai', 'gpt-4o', 'v1')
+        assert key != make_cache_key('你好\r\n世界', 'openai', 'gpt-4o', 'v1')
+        assert key != make_cache_key('你好 \n世界', 'openai', 'gpt-4o', 'v1')
+        assert key != make_cache_key('你好\n世界', 'openai', 'gpt-4', 'v1')
+        assert key != make_cache_key('你好\n世界', 'openai', 'gpt-4o', 'v2')
+
+    def test_hit_is_rebased_onto_submitted_text(self):
+        """命中时修正文本保留本次提交的首尾空白，问题偏移相对本次提交的文本"""
+        stored = to_cached_result('错字\n', ProofreadingResult('对字\n', [{'original': '错', 'offset': 0}]))
+        self.cache.set('k1', stored)
+
+        text = '  错字\n\n'
+        result = rebase_cached_result(text, self.cache.get('k1'))
+
+        assert result.corrected_text == '  对字\n\n'
+        assert result.issues[0]['offset'] == 2
+        assert text[result.issues[0]['offset']] == '错'
+        assert result.from_cache
+
+    def test_disk_tier_survives_new_process(self):
+        """内存层被淘汰或进程重启后仍可从磁盘层命中"""
+        self.cache.set('k1', ProofreadingResult('修正后', [{'type': '错别字'}]))
+        fresh = ProofreadingCache(memory_items=2, ttl_seconds=60,
+                                  db_path=self.db_path, disk_max_bytes=1024 * 1024)
+
+        result = fresh.get('k1')
+        assert result.corrected_text == '修正后'
+        assert result.from_cache
+        assert fresh.stats['disk_hits'] == 1
+
+        fresh.get('k1')
+        assert fresh.stats['memory_hits'] == 1
+
+    def test_error_results_not_cached(self):
+        """AI调用失败的结果不写入缓存"""
+        self.cache.set('k1', ProofreadingResult('原文', [], is_error=True))
+        assert self.cache.get('k1') is None
+
+    def test_expired_entries_evicted(self):
+        """过期条目视为未命中"""
+        cache = ProofreadingCache(memory_items=2, ttl_seconds=-1,
+                                  db_path=self.db_path, disk_max_bytes=1024 * 1024)
+        cache.set('k1', ProofreadingResult('修正后', []))
+        assert cache.get('k1') is None
+
+    def test_size_eviction(self):
+        """磁盘层超出大小上限时淘汰最久未访问的条目"""
+        cache = ProofreadingCache(memory_items=1, ttl_seconds=60,
+                                  db_path=self.db_path, disk_max_bytes=200)
+        for i in range(5):
+            cache.set(f'k{i}', ProofreadingResult('字' * 30, []))
+            time.sleep(0.01)
+        cache.disk.evict()
+
+        assert cache.disk.get('k0') is None
+        assert cache.disk.get('k4') is not None
+
+
+
+class SlowEchoService(BaseAIService):
+    """把每个"错"字改为"对"，并记录最大并发数"""
+
+    def __init__(self):
+        super().__init__('test-key')
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def proofread(self, text):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.05)
+        with self.lock:
+            self.in_flight -= 1
+        issues = [{'type': '错别字', 'original': '错', 'corrected': '对'}] * text.count('错')
+        return ProofreadingResult(text.replace('错', '对'), issues)
+
+
+class SegmenterTestCase(unittest.TestCase):
+    """中文段落、句子切分与分片"""
+
+    TEXT = '第一段第一句。第一段“第二句！”\n\n  第二段；还有内容？\n\n第三段没有句号'
+
+    def test_split_paragraphs(self):
+        paragraphs = [self.TEXT[s:e] for s, e in split_paragraphs(self.TEXT)]
+        assert paragraphs == ['第一段第一句。第一段“第二句！”', '第二段；还有内容？', '第三段没有句号']
+
+    def test_split_sentences_keeps_closing_quotes(self):
+        first = split_paragraphs(self.TEXT)[0]
+        sentences = [self.TEXT[s:e] for s, e in split_sentences(self.TEXT, first)]
+        assert sentences == ['第一段第一句。', '第一段“第二句！”']
+
+    def test_chunks_cover_text_within_budget(self):
+        """片段按原文顺序排列、互不重叠，且不超过预算"""
+        text = '\n\n'.join('这是一个用于测试切分的句子。' * 5 for _ in range(6))
+        chunks = chunk_text(text, max_tokens=40)
+
+        assert len(chunks) > 1
+        for chunk in chunks:
+            assert text[chunk.start:chunk.end] == chunk.text
+            assert len(chunk.text) <= 40
+        for previous, current in zip(chunks, chunks[1:]):
+            assert previous.end <= current.start
+        gaps = [text[a.end:b.start] for a, b in zip(chunks, chunks[1:])]
+        assert all(not gap.strip() for gap in gaps)
+        assert chunks[0].start == 0 and chunks[-1].end == len(text)
+
+
+class ChunkedProofreadingTestCase(unittest.TestCase):
+    """分片并发校对与结果合并"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config.update(CHUNK_MAX_TOKENS=30, FANOUT_MAX_WORKERS=8, FANOUT_PER_PROVIDER=2)
+        # 共享线程池按首次使用时的配置创建，这里确保使用本用例的并发上限
+        concurrency._executor = None
+
+    def test_merge_rebases_offsets(self):
+        """修正文本按原顺序拼接，问题偏移换算到整篇文档"""
+        text = '第一段有个错字。\n\n第二段也有错字。'
+        service = SlowEchoService()
+        chunks = chunk_text(text, max_tokens=10)
+        merged = merge_chunk_results(text, chunks, [service.proofread(c.text) for c in chunks])
+
+        assert merged.corrected_text == text.replace('错', '对')
+        assert [issue['offset'] for issue in merged.issues] == [text.index('错'), text.rindex('错')]
+
+    def test_parallel_fan_out_bounded_per_provider(self):
+        text = '\n\n'.join(f'第{i}段内容有一个错字需要修改。' for i in range(10))
+        service = SlowEchoService()
+
+        with self.app.app_context():
+            result = proofread_chunked(service, 'test-provider', text)
+
+        assert result.corrected_text == text.replace('错', '对')
+        assert len(result.issues) == 10
+        assert service.max_in_flight == 2
+
+
+if __name__ == '__main__':
+    unittest.main()
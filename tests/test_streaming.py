@@ -0,0 +1,75 @@
+"""
+灵犀校对平台 - 流式校对接口测试
+"""
+
+import json
+import unittest
+from unittest import mock
+
+from helpers import FakeService, LoggedInTestCase
+from lingxi.app import app
+from lingxi.models import ParagraphResult, ProofreadingHistory
+
+
+def parse_sse(body):
+    """把 Server-Sent Events 正文解析为 (事件名, 数据) 列表"""
+    events = []
+    for block in body.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+class StreamingProofreadingTestCase(LoggedInTestCase):
+    """流式校对接口逐个推送问题并保存历史"""
+
+    def test_issue_and_done_events(self):
+        with mock.patch('lingxi.proofreading.get_ai_service', return_value=FakeService()):
+            rv = self.client.post('/api/proofread/stream', json={
+                'text': '你好', 'provider': 'openai', 'model': 'gpt-4o'
+            })
+            body = rv.get_data(as_text=True)
+
+        assert rv.status_code == 200
+        assert rv.mimetype == 'text/event-stream'
+        assert rv.headers['X-Cache'] == 'MISS'
+
+        events = parse_sse(body)
+        assert [event for event, _ in events] == ['issue', 'done']
+        assert events[0][1]['corrected'] == '你好。'
+        assert events[0][1]['explanation'] == '缺少句号'
+        assert events[1][1]['corrected_text'] == '你好。'
+        assert [issue['type'] for issue in events[1][1]['issues']] == ['标点符号']
+
+        with app.app_context():
+            history = ProofreadingHistory.query.one()
+            assert history.original_text == '你好'
+            assert history.corrected_text == '你好。'
+
+    def test_upstream_error_ends_with_error_event(self):
+        service = FakeService()
+        service.proofread = lambda text: service._create_error_result(text, "API错误", "upstream down")
+        with mock.patch('lingxi.proofreading.get_ai_service', return_value=service):
+            rv = self.client.post('/api/proofread/stream', json={
+                'text': '你好', 'provider': 'openai', 'model': 'gpt-4o'
+            })
+            body = rv.get_data(as_text=True)
+
+        events = parse_sse(body)
+        assert [event for event, _ in events] == ['error']
+        assert 'upstream down' in events[0][1]['error']
+
+        with app.app_context():
+            assert ProofreadingHistory.query.count() == 0
+            assert ParagraphResult.query.count() == 0
+
+    def test_validation_error_before_stream(self):
+        rv = self.client.post('/api/proofread/stream', json={
+            'text': '', 'provider': 'openai', 'model': 'gpt-4o'
+        })
+        assert rv.status_code == 400
+        assert 'error' in rv.get_json()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+灵犀校对平台 - 文件上传校对测试
+"""
+
+import io
+import unittest
+import zipfile
+from unittest import mock
+
+from helpers import LoggedInTestCase, RecordingService
+from lingxi.app import app
+
+
+DOCX_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+    '<w:p><w:r><w:rPr><w:b/></w:rPr><w:t>标题有</w:t></w:r><w:r><w:t>错</w:t></w:r></w:p>'
+    '<w:p><w:r><w:t>这一段没有问题</w:t></w:r></w:p>'
+    '<w:tbl><w:tr><w:tc><w:p><w:r><w:t>表格里也有错</w:t></w:r></w:p></w:tc></w:tr></w:tbl>'
+    '</w:body></w:document>'
+)
+
+
+class DocumentUploadTestCase(LoggedInTestCase):
+    """上传文件校对"""
+
+    def upload(self, filename, content, service):
+        with mock.patch('lingxi.proofreading.get_ai_service', return_value=service):
+            return self.client.post('/api/proofread/upload', data={
+                'file': (io.BytesIO(content), filename), 'provider': 'openai', 'model': 'gpt-4o'
+            }, content_type='multipart/form-data')
+
+    def test_large_text_file(self):
+        """超过内存阈值的文本文件以 mmap 读取，段落分隔原样保留"""
+        paragraphs = [f'第{i}段有错。' for i in range(300)]
+        content = '\r\n\r\n'.join(paragraphs).encode('utf-8')
+        app.config['UPLOAD_SPOOL_MAX_MEMORY'] = 1024
+        try:
+            rv = self.upload('长文.txt', content, RecordingService())
+        finally:
+            app.config['UPLOAD_SPOOL_MAX_MEMORY'] = 1024 * 1024
+
+        assert rv.status_code == 200
+        assert rv.headers['X-Issues-Found'] == '300'
+        assert rv.data == content.decode('utf-8').replace('错', '对').encode('utf-8')
+
+    def test_markdown_code_blocks_untouched(self):
+        content = '# 标题有错\n\n```\nprint("错")\n\nx = "错"\n```\n\n正文有错\n'.encode('utf-8')
+        rv = self.upload('说明.md', content, RecordingService())
+        assert rv.data.decode('utf-8') == '# 标题有对\n\n```\nprint("错")\n\nx = "错"\n```\n\n正文有对\n'
+
+    def test_docx_round_trip(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as docx:
+            docx.writestr('[Content_Types].xml', '<Types/>')
+            docx.writestr('word/document.xml', DOCX_XML)
+
+        rv = self.upload('报告.docx', buffer.getvalue(), RecordingService())
+        assert rv.status_code == 200
+        assert rv.headers['X-Issues-Found'] == '2'
+
+        with zipfile.ZipFile(io.BytesIO(rv.data)) as docx:
+            assert docx.read('[Content_Types].xml') == b'<Types/>'
+            xml = docx.read('word/document.xml').decode('utf-8')
+        assert '<w:t xml:space="preserve">标题有对</w:t></w:r><w:r><w:t xml:space="preserve"/>' in xml
+        assert '<w:b/>' in xml
+        assert '<w:t>这一段没有问题</w:t>' in xml
+        assert '表格里也有对' in xml
+
+    def test_unsupported_type(self):
+        rv = self.upload('图片.png', b'\x89PNG', RecordingService())
+        assert rv.status_code == 400
+
+
+if __name__ == '__main__':
+    unittest.main()
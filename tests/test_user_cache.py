@@ -0,0 +1,56 @@
+"""
+灵犀校对平台 - 用户缓存测试
+"""
+
+import re
+import unittest
+from unittest import mock
+
+from sqlalchemy import event as sqlalchemy_event
+
+from helpers import FakeService, LoggedInTestCase
+from lingxi.app import app
+from lingxi.models import db
+from lingxi.usercache import UserCache
+
+
+class UserCacheTestCase(LoggedInTestCase):
+    """按用户缓存的只读视图"""
+
+    def proofread(self, text):
+        with mock.patch('lingxi.proofreading.get_ai_service', return_value=FakeService()):
+            return self.client.post('/api/proofread', json={'text': text, 'provider': 'openai', 'model': 'gpt-4o'})
+
+    def test_hot_path_skips_user_and_key_queries(self):
+        assert self.proofread('预热').status_code == 200
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        sqlalchemy_event.listen(engine, 'before_cursor_execute', record)
+        try:
+            assert self.proofread('第二次校对').status_code == 200
+        finally:
+            sqlalchemy_event.remove(engine, 'before_cursor_execute', record)
+        assert statements
+        assert not [s for s in statements if re.search(r'FROM "?(user|api_key)"?\b', s)]
+
+    def test_key_changes_invalidate_views(self):
+        with app.app_context():
+            # 另一个 Worker 进程中的缓存
+            other = UserCache(check_seconds=0)
+            assert [key.provider for key in other.get(1).api_keys] == ['openai']
+            key_id = other.get(1).api_keys[0].id
+
+        self.client.get(f'/delete_api_key/{key_id}')
+        rv = self.proofread('你好')
+        assert rv.status_code == 400 and 'openai' in rv.get_json()['error']
+        with app.app_context():
+            assert other.get(1).api_keys == ()
+
+
+if __name__ == '__main__':
+    unittest.main()
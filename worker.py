@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+灵犀校对平台 - 异步校对任务 Worker
+从数据库领取 /api/proofread 提交的异步任务，在线程池中执行AI校对
+"""
+
+import os
+import sys
+import signal
+import argparse
+
+# 添加 lingxi 模块到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lingxi'))
+
+from lingxi.app import app
+from lingxi.jobs import JobWorker
+
+
+def main():
+    parser = argparse.ArgumentParser(description='灵犀校对平台异步任务 Worker')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='执行线程数（默认读取 JOB_WORKERS）')
+    parser.add_argument('--poll-interval', type=float, default=None,
+                        help='空闲时轮询数据库的间隔秒数（默认读取 JOB_POLL_INTERVAL）')
+    args = parser.parse_args()
+
+    worker = JobWorker(app, max_workers=args.threads, poll_interval=args.poll_interval)
+
+    def handle_signal(signum, frame):
+        print("\n正在停止 Worker，等待执行中的任务完成...")
+        worker.request_stop()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    print(f"启动校对任务 Worker，执行线程数: {worker.max_workers}")
+    worker.run_forever()
+    worker.stop(wait=True)
+    print("Worker 已停止")
+
+
+if __name__ == '__main__':
+    main()